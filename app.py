@@ -3,13 +3,23 @@ from flask import Flask
 from flask_cors import CORS
 from flask_jwt_extended import JWTManager
 from flask_restful import Api
-from decouple import config
-from modelos import db
+from decouple import config as config_entorno
+from compresion import registrar_compresion
+from configuracion import configurar_base_datos
+from instrumentacion import registrar_instrumentacion
+from modelos import db, agregar_columnas_faltantes, Receta
+from vistas.cache import registrar_cache
+from vistas.costos import materializar_totales
+from vistas.trabajos import registrar_trabajos
 from vistas import (
     VistaIngrediente,
     VistaIngredientes,
+    VistaImportarIngredientes,
     VistaReceta,
     VistaRecetas,
+    VistaRecetasLote,
+    VistaCostosReceta,
+    VistaCostosRecetas,
     VistaSignIn,
     VistaLogIn,
     VistaChef,
@@ -21,47 +31,111 @@ from vistas import (
     VistaMenusChef,
     VistaReporteCompra,
     VistaUsuario,
+    VistaEstadisticasCache,
+    VistaReporteMenu,
+    VistaReporteMenus,
+    VistaReporteProveedores,
+    VistaTrabajos,
+    VistaTrabajo,
+    VistaResultadoTrabajo,
+    VistaBuscar,
 )
 from vistas.vistas import VistaRestauranteEspecifico
 
-app = Flask(__name__)
+FLASK_ENV = config_entorno("FLASK_ENV", default="development")
 
-FLASK_ENV = config("FLASK_ENV", default="development")
 
-# if FLASK_ENV == "testing":
-app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite:///test.db"
-# else:
-#     app.config["SQLALCHEMY_DATABASE_URI"] = config("DATABASE_URL")
+def registrar_recursos(api):
+    api.add_resource(VistaSignIn, "/signin")
+    api.add_resource(VistaLogIn, "/login")
+    api.add_resource(VistaUsuario, "/usuario")
+    api.add_resource(VistaIngredientes, "/ingredientes")
+    api.add_resource(VistaImportarIngredientes, "/ingredientes/importar")
+    api.add_resource(VistaIngrediente, "/ingrediente/<int:id_ingrediente>")
+    api.add_resource(VistaRecetas, "/recetas/<int:id_usuario>")
+    api.add_resource(VistaRecetasLote, "/recetas/<int:id_usuario>/lote")
+    api.add_resource(VistaReceta, "/receta/<int:id_receta>")
+    api.add_resource(VistaCostosRecetas, "/recetas/<int:id_usuario>/costos")
+    api.add_resource(VistaCostosReceta, "/receta/<int:id_receta>/costos")
+    api.add_resource(VistaChef, "/chefs")
+    api.add_resource(VistaChefs, "/chefs/<int:id_restaurante>")
+    api.add_resource(VistaRestaurante, "/restaurante")
+    api.add_resource(VistaRestauranteEspecifico, "/restaurante/<int:id_restaurante>")
+    api.add_resource(VistaRestaurantes, "/restaurantes/<int:id_usuario>")
+    api.add_resource(VistaMenu, "/menu")
+    api.add_resource(VistaMenus, "/menus/<int:id_restaurante>")
+    api.add_resource(VistaMenusChef, "/menus")
+    api.add_resource(VistaReporteCompra, "/reporte")
+    api.add_resource(VistaReporteMenu, "/reporte/menu/<int:id_menu>")
+    api.add_resource(VistaReporteMenus, "/reporte/menus")
+    api.add_resource(VistaReporteProveedores, "/reporte/proveedores")
+    api.add_resource(VistaTrabajos, "/trabajos")
+    api.add_resource(VistaTrabajo, "/trabajo/<string:id_trabajo>")
+    api.add_resource(VistaResultadoTrabajo, "/trabajo/<string:id_trabajo>/resultado")
+    api.add_resource(VistaBuscar, "/buscar")
+    api.add_resource(VistaEstadisticasCache, "/cache/estadisticas")
 
-app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
-app.config["JWT_SECRET_KEY"] = config("JWT_SECRET_KEY", default="frase-secreta")
-app.config["PROPAGATE_EXCEPTIONS"] = True
 
-app_context = app.app_context()
-app_context.push()
+# Crea y configura la aplicación sin abrir conexiones ni inspeccionar el
+# esquema; las tablas se crean con "flask crear-tablas". config permite
+# sobrescribir valores (por ejemplo en pruebas).
+def create_app(config=None):
+    app = Flask(__name__)
 
-db.init_app(app)
-#db.drop_all()
-db.create_all()
+    configurar_base_datos(app)
+    app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+    app.config["JWT_SECRET_KEY"] = config_entorno("JWT_SECRET_KEY", default="frase-secreta")
+    app.config["PROPAGATE_EXCEPTIONS"] = True
+    app.config["INSTRUMENTACION_UMBRAL_LENTO_MS"] = config_entorno(
+        "INSTRUMENTACION_UMBRAL_LENTO_MS", default=500, cast=float
+    )
+    app.config["COMPRESION_MINIMO_BYTES"] = config_entorno(
+        "COMPRESION_MINIMO_BYTES", default=1024, cast=int
+    )
+    app.config["COMPRESION_NIVEL_GZIP"] = config_entorno(
+        "COMPRESION_NIVEL_GZIP", default=6, cast=int
+    )
+    app.config["COMPRESION_NIVEL_BROTLI"] = config_entorno(
+        "COMPRESION_NIVEL_BROTLI", default=4, cast=int
+    )
+    app.config["CACHE_BACKEND"] = config_entorno("CACHE_BACKEND", default="memoria")
+    app.config["CACHE_REDIS_URL"] = config_entorno("CACHE_REDIS_URL", default="")
+    app.config["CACHE_MAXIMO_ENTRADAS"] = config_entorno(
+        "CACHE_MAXIMO_ENTRADAS", default=1024, cast=int
+    )
+    app.config["CACHE_TTL"] = config_entorno("CACHE_TTL", default=60, cast=int)
+    app.config["TRABAJOS_HILOS"] = config_entorno("TRABAJOS_HILOS", default=2, cast=int)
+    app.config["TRABAJOS_EXPIRACION"] = config_entorno(
+        "TRABAJOS_EXPIRACION", default=3600, cast=int
+    )
+    if config:
+        app.config.update(config)
 
-cors = CORS(app)
+    db.init_app(app)
+    CORS(app)
+    api = Api(app)
+    registrar_recursos(api)
+    registrar_cache(app)
+    registrar_trabajos(app)
+    registrar_instrumentacion(app, api)
+    # Se registra después para que el tiempo de compresión quede dentro del
+    # tiempo del handler que reporta la instrumentación.
+    registrar_compresion(app)
+    JWTManager(app)
 
-api = Api(app)
-api.add_resource(VistaSignIn, "/signin")
-api.add_resource(VistaLogIn, "/login")
-api.add_resource(VistaUsuario, "/usuario")
-api.add_resource(VistaIngredientes, "/ingredientes")
-api.add_resource(VistaIngrediente, "/ingrediente/<int:id_ingrediente>")
-api.add_resource(VistaRecetas, "/recetas/<int:id_usuario>")
-api.add_resource(VistaReceta, "/receta/<int:id_receta>")
-api.add_resource(VistaChef, "/chefs")
-api.add_resource(VistaChefs, "/chefs/<int:id_restaurante>")
-api.add_resource(VistaRestaurante, "/restaurante")
-api.add_resource(VistaRestauranteEspecifico, "/restaurante/<int:id_restaurante>")
-api.add_resource(VistaRestaurantes, "/restaurantes/<int:id_usuario>")
-api.add_resource(VistaMenu, "/menu")
-api.add_resource(VistaMenus, "/menus/<int:id_restaurante>")
-api.add_resource(VistaMenusChef, "/menus")
-api.add_resource(VistaReporteCompra, "/reporte")
+    @app.cli.command("crear-tablas")
+    def crear_tablas():
+        db.create_all()
+        with db.engine.begin() as connection:
+            agregadas = agregar_columnas_faltantes(connection)
+        # Recetas creadas antes de materializar los totales
+        materializar_totales(Receta.costo_total.is_(None))
+        db.session.commit()
+        for columna in agregadas:
+            print("Columna agregada: {}".format(columna))
+        print("Tablas creadas")
 
-jwt = JWTManager(app)
+    return app
+
+
+app = create_app()
@@ -0,0 +1,76 @@
+import argparse
+import json
+import sys
+import time
+
+import compresion
+
+from .datos import ESCALAS
+from .ejecutar import ESCENARIOS, Contexto, _encabezados, base_sembrada
+
+
+def _cuerpos(escala, accept):
+    cuerpos = {}
+    # Sin compresión en la app para obtener los bytes originales
+    with base_sembrada(escala, {"COMPRESION": False}) as (app, inquilinos, _):
+        ctx = Contexto(app.test_client())
+        for nombre, escenario in ESCENARIOS.items():
+            metodo, ruta, usuario, cuerpo = escenario(ctx, inquilinos[0])
+            if metodo != "GET":
+                continue
+            encabezados = dict(_encabezados(ctx, usuario, None), Accept=accept)
+            respuesta = ctx.cliente.get(ruta, headers=encabezados)
+            if respuesta.status_code == 200:
+                cuerpos[nombre] = respuesta.get_data()
+    return cuerpos
+
+
+def _configuraciones(niveles_gzip, niveles_brotli):
+    configuraciones = [
+        ("gzip-{}".format(nivel), "gzip", {"COMPRESION_NIVEL_GZIP": nivel})
+        for nivel in niveles_gzip
+    ]
+    if compresion.brotli is not None:
+        configuraciones += [
+            ("br-{}".format(nivel), "br", {"COMPRESION_NIVEL_BROTLI": nivel})
+            for nivel in niveles_brotli
+        ]
+    return configuraciones
+
+
+# Para la respuesta de cada escenario GET mide los bytes ahorrados y el
+# tiempo de CPU de comprimirla con cada codificación y nivel.
+def ejecutar(escala, repeticiones=20, niveles_gzip=(1, 6, 9), niveles_brotli=(1, 4, 11),
+             accept="application/json"):
+    resultados = {}
+    for nombre, datos in _cuerpos(escala, accept).items():
+        resultado = {"bytes": len(datos)}
+        for etiqueta, codificacion, config in _configuraciones(niveles_gzip, niveles_brotli):
+            inicio = time.process_time()
+            for _ in range(repeticiones):
+                comprimido = compresion.comprimir(datos, codificacion, config)
+            cpu_ms = (time.process_time() - inicio) * 1000 / repeticiones
+            resultado[etiqueta] = {
+                "bytes": len(comprimido),
+                "ahorro_pct": round(100 * (1 - len(comprimido) / len(datos)), 1) if datos else 0,
+                "cpu_ms": round(cpu_ms, 3),
+            }
+        resultados[nombre] = resultado
+    return resultados
+
+
+def main(argumentos=None):
+    parser = argparse.ArgumentParser(description="Benchmark de la compresión de respuestas")
+    parser.add_argument("--escala", choices=sorted(ESCALAS), default="pequena")
+    parser.add_argument("--repeticiones", type=int, default=20)
+    parser.add_argument("--ndjson", action="store_true", help="pedir application/x-ndjson")
+    opciones = parser.parse_args(argumentos)
+
+    accept = "application/x-ndjson" if opciones.ndjson else "application/json"
+    resultado = ejecutar(ESCALAS[opciones.escala], opciones.repeticiones, accept=accept)
+    print(json.dumps(resultado, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,193 @@
+import hashlib
+import random
+from collections import namedtuple
+from datetime import datetime, timedelta
+
+from modelos import (
+    db,
+    Administrador,
+    Chef,
+    Ingrediente,
+    Menu,
+    MenuReceta,
+    Receta,
+    RecetaIngrediente,
+    Restaurante,
+    Usuario,
+)
+from vistas.costos import materializar_totales
+
+CONTRASENA = "Benchmark1$"
+
+Escala = namedtuple(
+    "Escala",
+    [
+        "administradores",
+        "restaurantes",
+        "chefs",
+        "ingredientes",
+        "recetas",
+        "ingredientes_por_receta",
+        "menus",
+        "recetas_por_menu",
+    ],
+)
+
+ESCALAS = {
+    "pequena": Escala(1, 2, 2, 30, 20, 5, 5, 3),
+    "mediana": Escala(100, 3, 2, 50, 40, 6, 10, 4),
+    "grande": Escala(1000, 3, 2, 50, 40, 6, 10, 4),
+}
+
+# Datos de un administrador sembrado que los escenarios usan como inquilino.
+Inquilino = namedtuple(
+    "Inquilino",
+    ["administrador", "usuario", "chefs", "restaurantes", "ingredientes", "recetas", "menus"],
+)
+
+
+def _insertar(modelo, filas):
+    if filas:
+        db.session.execute(modelo.__table__.insert(), filas)
+
+
+# Siembra una base de datos vacía con la escala indicada. Los ids se asignan
+# en secuencia para insertar cada tabla con un solo executemany. Retorna la
+# lista de Inquilino en orden de id.
+def sembrar(escala, semilla=0):
+    aleatorio = random.Random(semilla)
+    contrasena = hashlib.md5(CONTRASENA.encode("utf-8")).hexdigest()
+    inicio_menus = datetime.now().replace(second=0, microsecond=0) + timedelta(days=365)
+
+    usuarios, administradores, chefs, restaurantes = [], [], [], []
+    ingredientes, recetas, recetas_ingredientes = [], [], []
+    menus, menus_recetas = [], []
+    inquilinos = []
+
+    for numero_admin in range(escala.administradores):
+        id_admin = len(usuarios) + 1
+        usuario_admin = "admin{}".format(numero_admin)
+        usuarios.append({"id": id_admin, "usuario": usuario_admin, "contrasena": contrasena})
+        administradores.append({"id": id_admin})
+
+        ids_ingredientes = []
+        for numero in range(escala.ingredientes):
+            id_ingrediente = len(ingredientes) + 1
+            ingredientes.append(
+                {
+                    "id": id_ingrediente,
+                    "nombre": "Ingrediente {} {}".format(numero_admin, numero),
+                    "unidad": "gramo",
+                    "costo": aleatorio.randint(1, 100),
+                    "calorias": aleatorio.randint(1, 500),
+                    "sitio": "Sitio {}".format(numero % 7),
+                    "administrador_id": id_admin,
+                }
+            )
+            ids_ingredientes.append(id_ingrediente)
+
+        ids_recetas = []
+        for numero in range(escala.recetas):
+            id_receta = len(recetas) + 1
+            recetas.append(
+                {
+                    "id": id_receta,
+                    "nombre": "Receta {} {}".format(numero_admin, numero),
+                    "duracion": aleatorio.randint(10, 120),
+                    "porcion": aleatorio.randint(1, 8),
+                    "preparacion": "Preparación de la receta {}".format(numero),
+                    "usuario": id_admin,
+                }
+            )
+            for id_ingrediente in aleatorio.sample(
+                ids_ingredientes, min(escala.ingredientes_por_receta, len(ids_ingredientes))
+            ):
+                recetas_ingredientes.append(
+                    {
+                        "receta": id_receta,
+                        "ingrediente": id_ingrediente,
+                        "cantidad": aleatorio.randint(1, 10),
+                    }
+                )
+            ids_recetas.append(id_receta)
+
+        ids_restaurantes, usuarios_chefs, ids_menus = [], [], []
+        for numero in range(escala.restaurantes):
+            id_restaurante = len(restaurantes) + 1
+            restaurantes.append(
+                {
+                    "id": id_restaurante,
+                    "nombre": "Restaurante {} {}".format(numero_admin, numero),
+                    "direccion": "Calle {}".format(numero),
+                    "telefono": "555{:04d}".format(numero),
+                    "administrador_id": id_admin,
+                }
+            )
+            ids_restaurantes.append(id_restaurante)
+
+            for numero_chef in range(escala.chefs):
+                id_chef = len(usuarios) + 1
+                usuario_chef = "chef{}_{}_{}".format(numero_admin, numero, numero_chef)
+                usuarios.append(
+                    {"id": id_chef, "usuario": usuario_chef, "contrasena": contrasena}
+                )
+                chefs.append(
+                    {
+                        "id": id_chef,
+                        "nombre": "Chef {} {}".format(numero, numero_chef),
+                        "restaurante_id": id_restaurante,
+                    }
+                )
+                usuarios_chefs.append(usuario_chef)
+
+            for numero_menu in range(escala.menus):
+                id_menu = len(menus) + 1
+                fecha_inicio = inicio_menus + timedelta(days=7 * numero_menu)
+                menus.append(
+                    {
+                        "id": id_menu,
+                        "nombre": "Menú {}".format(numero_menu),
+                        "fecha_inicio": fecha_inicio,
+                        "fecha_fin": fecha_inicio + timedelta(days=6),
+                        "descripcion": "Menú de la semana {}".format(numero_menu),
+                        "usuario_id": id_admin,
+                        "restaurante_id": id_restaurante,
+                    }
+                )
+                ids_menus.append(id_menu)
+                for id_receta in aleatorio.sample(
+                    ids_recetas, min(escala.recetas_por_menu, len(ids_recetas))
+                ):
+                    menus_recetas.append(
+                        {
+                            "menu": id_menu,
+                            "receta": id_receta,
+                            "numero_personas": aleatorio.randint(1, 50),
+                        }
+                    )
+
+        inquilinos.append(
+            Inquilino(
+                id_admin,
+                usuario_admin,
+                usuarios_chefs,
+                ids_restaurantes,
+                ids_ingredientes,
+                ids_recetas,
+                ids_menus,
+            )
+        )
+
+    _insertar(Usuario, usuarios)
+    _insertar(Administrador, administradores)
+    _insertar(Ingrediente, ingredientes)
+    _insertar(Receta, recetas)
+    _insertar(RecetaIngrediente, recetas_ingredientes)
+    _insertar(Restaurante, restaurantes)
+    _insertar(Chef, chefs)
+    _insertar(Menu, menus)
+    _insertar(MenuReceta, menus_recetas)
+    materializar_totales()
+    db.session.commit()
+
+    return inquilinos
@@ -0,0 +1,433 @@
+import argparse
+import json
+import math
+import os
+import platform
+import re
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+from app import create_app
+from modelos import db, RecetaIngrediente
+from vistas.intervalos import invalidar_indice
+
+from .datos import CONTRASENA, ESCALAS, sembrar
+
+PATRON_CONSULTAS = re.compile(r'desc="(\d+) consultas"')
+TOLERANCIA_POR_DEFECTO = 0.25
+INQUILINOS_POR_CORRIDA = 10
+
+
+def percentil(valores, porcentaje):
+    ordenados = sorted(valores)
+    posicion = max(math.ceil(porcentaje / 100 * len(ordenados)) - 1, 0)
+    return ordenados[posicion]
+
+
+def _consultas(respuesta):
+    coincidencia = PATRON_CONSULTAS.search(respuesta.headers.get("Server-Timing", ""))
+    return int(coincidencia.group(1)) if coincidencia else None
+
+
+class Contexto:
+    def __init__(self, cliente):
+        self.cliente = cliente
+        self.tokens = {}
+        self.contador = 0
+        self.trabajos = {}
+
+    def token(self, usuario):
+        if usuario not in self.tokens:
+            respuesta = self.cliente.post(
+                "/login", json={"usuario": usuario, "contrasena": CONTRASENA}
+            )
+            self.tokens[usuario] = respuesta.get_json()["token"]
+        return self.tokens[usuario]
+
+    def unico(self, prefijo):
+        self.contador += 1
+        return "{}{}".format(prefijo, self.contador)
+
+    # Trabajo terminado del inquilino para medir las consultas de estado y
+    # resultado; se crea la primera vez, fuera del tiempo medido.
+    def trabajo(self, inquilino):
+        if inquilino.administrador not in self.trabajos:
+            respuesta = self.cliente.post(
+                "/trabajos",
+                json={"tipo": "reporte_compra", "parametros": _datos_reporte(inquilino)},
+                headers={"Authorization": "Bearer {}".format(self.token(inquilino.usuario))},
+            )
+            self.cliente.application.extensions["trabajos"].esperar(timeout=60)
+            self.trabajos[inquilino.administrador] = respuesta.get_json()["id"]
+        return self.trabajos[inquilino.administrador]
+
+
+def _datos_receta(inquilino, nombre):
+    return {
+        "nombre": nombre,
+        "preparacion": "Mezclar todo",
+        "duracion": 30,
+        "porcion": 4,
+        "ingredientes": [
+            {"cantidad": 2, "idIngrediente": id_ingrediente}
+            for id_ingrediente in inquilino.ingredientes[:5]
+        ],
+    }
+
+
+# Edición típica de una receta: mismos ingredientes con una cantidad
+# cambiada. Los ids de RecetaIngrediente se leen antes de medir.
+def _editar_receta(ctx, inquilino):
+    id_receta = inquilino.recetas[1 % len(inquilino.recetas)]
+    actuales = (
+        db.session.query(
+            RecetaIngrediente.id, RecetaIngrediente.cantidad, RecetaIngrediente.ingrediente
+        )
+        .filter(RecetaIngrediente.receta == id_receta)
+        .order_by(RecetaIngrediente.id)
+        .all()
+    )
+    # Sin dejar abierta la transacción de lectura en la sesión de la prueba
+    db.session.remove()
+    datos = _datos_receta(inquilino, ctx.unico("Receta editada "))
+    datos["ingredientes"] = [
+        {
+            "id": str(fila.id),
+            "cantidad": float(fila.cantidad) + (1 if indice == 0 else 0),
+            "idIngrediente": fila.ingrediente,
+        }
+        for indice, fila in enumerate(actuales)
+    ]
+    return "PUT", "/receta/{}".format(id_receta), inquilino.usuario, datos
+
+
+def _datos_reporte(inquilino):
+    return {
+        "recetas": [
+            {"receta": id_receta, "numero_personas": 10} for id_receta in inquilino.recetas[:10]
+        ]
+    }
+
+
+def _datos_ingrediente(nombre):
+    return {"nombre": nombre, "unidad": "gramo", "costo": 3, "calorias": 40, "sitio": "Plaza"}
+
+
+def _datos_menu(ctx, inquilino):
+    nombre = ctx.unico("Menú nuevo ")
+    # Semanas posteriores a las de los menús sembrados para no superponerse
+    inicio = datetime.now() + timedelta(days=3650 + 7 * ctx.contador)
+    return {
+        "nombre": nombre,
+        "descripcion": "Menú de prueba de rendimiento",
+        "fecha_inicio": inicio.strftime("%Y-%m-%d %H:%M"),
+        "fecha_fin": (inicio + timedelta(days=6)).strftime("%Y-%m-%d %H:%M"),
+        "restaurante": inquilino.restaurantes[0],
+        "recetas": [
+            {"receta": id_receta, "numero_personas": 5} for id_receta in inquilino.recetas[:3]
+        ],
+    }
+
+
+# Un escenario por recurso y método registrado en la aplicación, salvo los
+# DELETE y el PUT de /signin (VistaSignIn.put espera un id que la ruta no
+# lleva). Cada uno recibe el contexto y el inquilino de la iteración y
+# retorna (método, ruta, usuario autenticado o None, cuerpo JSON o None).
+ESCENARIOS = {
+    "login": lambda ctx, inq: (
+        "POST", "/login", None, {"usuario": inq.usuario, "contrasena": CONTRASENA}
+    ),
+    "signin": lambda ctx, inq: (
+        "POST", "/signin", None, {"usuario": ctx.unico("admin_nuevo"), "contrasena": CONTRASENA}
+    ),
+    "usuario": lambda ctx, inq: ("GET", "/usuario", inq.usuario, None),
+    "ingredientes_listar": lambda ctx, inq: ("GET", "/ingredientes", inq.usuario, None),
+    "ingredientes_crear": lambda ctx, inq: (
+        "POST", "/ingredientes", inq.usuario, _datos_ingrediente(ctx.unico("Ingrediente nuevo "))
+    ),
+    "ingredientes_importar": lambda ctx, inq: (
+        "POST",
+        "/ingredientes/importar",
+        inq.usuario,
+        [_datos_ingrediente(ctx.unico("Ingrediente importado ")) for _ in range(20)],
+    ),
+    "ingrediente_detalle": lambda ctx, inq: (
+        "GET", "/ingrediente/{}".format(inq.ingredientes[0]), inq.usuario, None
+    ),
+    "ingrediente_editar": lambda ctx, inq: (
+        "PUT",
+        "/ingrediente/{}".format(inq.ingredientes[0]),
+        inq.usuario,
+        _datos_ingrediente(ctx.unico("Ingrediente editado ")),
+    ),
+    "recetas_listar": lambda ctx, inq: (
+        "GET", "/recetas/{}".format(inq.administrador), inq.usuario, None
+    ),
+    "recetas_crear": lambda ctx, inq: (
+        "POST",
+        "/recetas/{}".format(inq.administrador),
+        inq.usuario,
+        _datos_receta(inq, ctx.unico("Receta nueva ")),
+    ),
+    "recetas_lote": lambda ctx, inq: (
+        "POST",
+        "/recetas/{}/lote".format(inq.administrador),
+        inq.usuario,
+        [_datos_receta(inq, ctx.unico("Receta lote ")) for _ in range(10)],
+    ),
+    "recetas_costos": lambda ctx, inq: (
+        "GET", "/recetas/{}/costos".format(inq.administrador), inq.usuario, None
+    ),
+    "receta_detalle": lambda ctx, inq: (
+        "GET", "/receta/{}".format(inq.recetas[0]), inq.usuario, None
+    ),
+    "receta_editar": _editar_receta,
+    "receta_costos": lambda ctx, inq: (
+        "GET", "/receta/{}/costos".format(inq.recetas[0]), inq.usuario, None
+    ),
+    "restaurantes_listar": lambda ctx, inq: (
+        "GET", "/restaurantes/{}".format(inq.administrador), inq.usuario, None
+    ),
+    "restaurante_detalle": lambda ctx, inq: (
+        "GET", "/restaurante/{}".format(inq.restaurantes[0]), inq.usuario, None
+    ),
+    "restaurante_editar": lambda ctx, inq: (
+        "PUT",
+        "/restaurante/{}".format(inq.restaurantes[0]),
+        inq.usuario,
+        {"nombre": ctx.unico("Restaurante editado "), "direccion": "Calle 2", "telefono": "5550001"},
+    ),
+    "restaurante_crear": lambda ctx, inq: (
+        "POST",
+        "/restaurante",
+        inq.usuario,
+        {"nombre": ctx.unico("Restaurante nuevo "), "direccion": "Calle 1", "telefono": "5550000"},
+    ),
+    "chefs_listar": lambda ctx, inq: (
+        "GET", "/chefs/{}".format(inq.restaurantes[0]), inq.usuario, None
+    ),
+    "chefs_crear": lambda ctx, inq: (
+        "POST",
+        "/chefs",
+        inq.usuario,
+        {
+            "nombre": "Chef nuevo",
+            "usuario": ctx.unico("chef_nuevo"),
+            "contrasena": CONTRASENA,
+            "restaurante_id": inq.restaurantes[0],
+        },
+    ),
+    "menus_listar": lambda ctx, inq: (
+        "GET", "/menus/{}".format(inq.restaurantes[0]), inq.usuario, None
+    ),
+    "menus_chef": lambda ctx, inq: ("GET", "/menus", inq.chefs[0], None),
+    "menu_crear": lambda ctx, inq: ("POST", "/menu", inq.usuario, _datos_menu(ctx, inq)),
+    "reporte_compra": lambda ctx, inq: ("POST", "/reporte", inq.usuario, _datos_reporte(inq)),
+    "reporte_menu": lambda ctx, inq: (
+        "GET", "/reporte/menu/{}".format(inq.menus[0]), inq.usuario, None
+    ),
+    # Todos los menús sembrados de los restaurantes del administrador
+    "reporte_menus": lambda ctx, inq: (
+        "GET",
+        "/reporte/menus?desde={:%Y-%m-%d}&hasta={:%Y-%m-%d}".format(
+            datetime.now(), datetime.now() + timedelta(days=3650)
+        ),
+        inq.usuario,
+        None,
+    ),
+    "buscar": lambda ctx, inq: ("GET", "/buscar?q=receta", inq.usuario, None),
+    "reporte_proveedores": lambda ctx, inq: (
+        "GET",
+        "/reporte/proveedores?desde={:%Y-%m-%d}&hasta={:%Y-%m-%d}".format(
+            datetime.now(), datetime.now() + timedelta(days=3650)
+        ),
+        inq.usuario,
+        None,
+    ),
+    "trabajos_crear": lambda ctx, inq: (
+        "POST",
+        "/trabajos",
+        inq.usuario,
+        {"tipo": "reporte_compra", "parametros": _datos_reporte(inq)},
+    ),
+    "trabajo_estado": lambda ctx, inq: (
+        "GET", "/trabajo/{}".format(ctx.trabajo(inq)), inq.usuario, None
+    ),
+    "trabajo_resultado": lambda ctx, inq: (
+        "GET", "/trabajo/{}/resultado".format(ctx.trabajo(inq)), inq.usuario, None
+    ),
+    "cache_estadisticas": lambda ctx, inq: ("GET", "/cache/estadisticas", inq.usuario, None),
+}
+
+
+def _encabezados(ctx, usuario, codificacion):
+    encabezados = {}
+    if usuario:
+        encabezados["Authorization"] = "Bearer {}".format(ctx.token(usuario))
+    if codificacion:
+        encabezados["Accept-Encoding"] = codificacion
+    return encabezados
+
+
+def _medir(ctx, inquilinos, escenario, repeticiones, codificacion=None):
+    duraciones, consultas, tamanos, estados = [], [], [], set()
+    for numero in range(repeticiones):
+        inquilino = inquilinos[numero % len(inquilinos)]
+        metodo, ruta, usuario, cuerpo = escenario(ctx, inquilino)
+        encabezados = _encabezados(ctx, usuario, codificacion)
+
+        inicio = time.perf_counter()
+        respuesta = ctx.cliente.open(ruta, method=metodo, json=cuerpo, headers=encabezados)
+        tamanos.append(len(respuesta.get_data()))
+        duraciones.append((time.perf_counter() - inicio) * 1000)
+        consultas.append(_consultas(respuesta))
+        estados.add(respuesta.status_code)
+
+    consultas = [valor for valor in consultas if valor is not None]
+    return {
+        "p50_ms": round(percentil(duraciones, 50), 3),
+        "p95_ms": round(percentil(duraciones, 95), 3),
+        "p99_ms": round(percentil(duraciones, 99), 3),
+        "media_ms": round(sum(duraciones) / len(duraciones), 3),
+        "consultas": max(consultas) if consultas else None,
+        "bytes": round(sum(tamanos) / len(tamanos)),
+        "estados": sorted(estados),
+    }
+
+
+# Crea una app sobre una base SQLite temporal sembrada con la escala pedida.
+# Entrega (app, inquilinos, siembra_ms) y al salir borra la base.
+@contextmanager
+def base_sembrada(escala, config=None):
+    directorio = tempfile.mkdtemp(prefix="benchmark_metricas_")
+    ruta_bd = os.path.join(directorio, "benchmark.db")
+    app = create_app(
+        dict(
+            {
+                "SQLALCHEMY_DATABASE_URI": "sqlite:///" + ruta_bd,
+                "INSTRUMENTACION_UMBRAL_LENTO_MS": float("inf"),
+            },
+            **(config or {})
+        )
+    )
+
+    contexto_app = app.app_context()
+    contexto_app.push()
+    # La sesión es por hilo: se descarta cualquier sesión ligada a otra app
+    db.session.remove()
+    invalidar_indice()
+    try:
+        db.create_all()
+        inicio = time.perf_counter()
+        inquilinos = sembrar(escala)
+        yield app, inquilinos, (time.perf_counter() - inicio) * 1000
+    finally:
+        db.session.remove()
+        invalidar_indice()
+        db.get_engine(app).dispose()
+        contexto_app.pop()
+        for archivo in os.listdir(directorio):
+            os.remove(os.path.join(directorio, archivo))
+        os.rmdir(directorio)
+
+
+# Ejecuta cada escenario repeticiones veces sobre una base sembrada, rotando
+# entre los primeros inquilinos. codificacion se envía como Accept-Encoding.
+def ejecutar(escala, repeticiones=50, escenarios=None, codificacion=None):
+    with base_sembrada(escala) as (app, inquilinos, siembra_ms):
+        ctx = Contexto(app.test_client())
+        resultados = {}
+        for nombre, escenario in ESCENARIOS.items():
+            if escenarios and nombre not in escenarios:
+                continue
+            resultados[nombre] = _medir(
+                ctx, inquilinos[:INQUILINOS_POR_CORRIDA], escenario, repeticiones, codificacion
+            )
+        # Los trabajos enviados terminan antes de borrar la base
+        app.extensions["trabajos"].esperar(timeout=60)
+
+    return {
+        "fecha": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "escala": escala._asdict(),
+        "repeticiones": repeticiones,
+        "codificacion": codificacion,
+        "siembra_ms": round(siembra_ms, 3),
+        "escenarios": resultados,
+    }
+
+
+# Compara contra una corrida de referencia. Es regresión que el p95 crezca
+# más de la tolerancia o que aumente el número de consultas.
+def comparar(resultado, linea_base, tolerancia=TOLERANCIA_POR_DEFECTO):
+    regresiones = []
+    for nombre, actual in resultado["escenarios"].items():
+        base = linea_base["escenarios"].get(nombre)
+        if base is None:
+            continue
+
+        if actual["p95_ms"] > base["p95_ms"] * (1 + tolerancia):
+            regresiones.append(
+                "{}: p95 {:.2f} ms (base {:.2f} ms)".format(
+                    nombre, actual["p95_ms"], base["p95_ms"]
+                )
+            )
+        if (
+            actual["consultas"] is not None
+            and base["consultas"] is not None
+            and actual["consultas"] > base["consultas"]
+        ):
+            regresiones.append(
+                "{}: {} consultas (base {})".format(
+                    nombre, actual["consultas"], base["consultas"]
+                )
+            )
+    return regresiones
+
+
+def main(argumentos=None):
+    parser = argparse.ArgumentParser(description="Benchmark de los endpoints de la API")
+    parser.add_argument("--escala", choices=sorted(ESCALAS), default="pequena")
+    for campo in ESCALAS["pequena"]._fields:
+        parser.add_argument("--" + campo.replace("_", "-"), type=int, dest=campo)
+    parser.add_argument("--repeticiones", type=int, default=50)
+    parser.add_argument("--escenario", action="append", dest="escenarios")
+    parser.add_argument("--salida", help="archivo JSON donde guardar los resultados")
+    parser.add_argument("--linea-base", help="resultados JSON de referencia")
+    parser.add_argument("--tolerancia", type=float, default=TOLERANCIA_POR_DEFECTO)
+    parser.add_argument("--codificacion", help="valor de Accept-Encoding, por ejemplo gzip")
+    opciones = parser.parse_args(argumentos)
+
+    escala = ESCALAS[opciones.escala]
+    escala = escala._replace(
+        **{
+            campo: getattr(opciones, campo)
+            for campo in escala._fields
+            if getattr(opciones, campo) is not None
+        }
+    )
+    resultado = ejecutar(
+        escala, opciones.repeticiones, opciones.escenarios, opciones.codificacion
+    )
+
+    texto = json.dumps(resultado, indent=2, ensure_ascii=False)
+    if opciones.salida:
+        with open(opciones.salida, "w", encoding="utf-8") as archivo:
+            archivo.write(texto + "\n")
+    else:
+        print(texto)
+
+    if opciones.linea_base:
+        with open(opciones.linea_base, encoding="utf-8") as archivo:
+            regresiones = comparar(resultado, json.load(archivo), opciones.tolerancia)
+        for regresion in regresiones:
+            print("REGRESIÓN " + regresion, file=sys.stderr)
+        return 1 if regresiones else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
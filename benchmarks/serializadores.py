@@ -0,0 +1,125 @@
+import argparse
+import json
+import sys
+import time
+from datetime import datetime, timedelta
+
+from modelos import (
+    Chef,
+    ChefSchema,
+    Ingrediente,
+    IngredienteSchema,
+    Menu,
+    MenuSchema,
+    Receta,
+    RecetaIngrediente,
+    RecetaSchema,
+)
+from vistas.serializadores import compilar_serializador
+
+
+def _objetos(cantidad):
+    inicio = datetime(2030, 1, 1, 8, 30)
+    return {
+        "ingrediente": (
+            IngredienteSchema(),
+            [
+                Ingrediente(
+                    id=numero,
+                    nombre="Ingrediente {}".format(numero),
+                    unidad="gramo",
+                    costo=numero * 1.5,
+                    calorias=numero,
+                    sitio="Plaza",
+                )
+                for numero in range(cantidad)
+            ],
+        ),
+        "receta": (
+            RecetaSchema(),
+            [
+                Receta(
+                    id=numero,
+                    nombre="Receta {}".format(numero),
+                    duracion=30,
+                    porcion=4,
+                    preparacion="Mezclar",
+                    usuario=1,
+                    ingredientes=[
+                        RecetaIngrediente(
+                            id=numero * 5 + orden, cantidad=orden, ingrediente=orden
+                        )
+                        for orden in range(5)
+                    ],
+                )
+                for numero in range(cantidad)
+            ],
+        ),
+        "menu": (
+            MenuSchema(),
+            [
+                Menu(
+                    id=numero,
+                    nombre="Menú {}".format(numero),
+                    fecha_inicio=inicio + timedelta(days=numero),
+                    fecha_fin=inicio + timedelta(days=numero + 6),
+                    descripcion="Menú",
+                    restaurante_id=1,
+                )
+                for numero in range(cantidad)
+            ],
+        ),
+        "chef": (
+            ChefSchema(),
+            [
+                Chef(id=numero, nombre="Chef {}".format(numero), restaurante_id=1)
+                for numero in range(cantidad)
+            ],
+        ),
+    }
+
+
+def _mejor_tiempo(funcion, objetos, repeticiones):
+    mejor = float("inf")
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        for objeto in objetos:
+            funcion(objeto)
+        mejor = min(mejor, time.perf_counter() - inicio)
+    return mejor * 1000
+
+
+# Compara schema.dump con el serializador compilado sobre los mismos objetos
+# en memoria, sin base de datos, y verifica que el JSON sea idéntico.
+def ejecutar(cantidad=2000, repeticiones=5):
+    resultados = {}
+    for nombre, (schema, objetos) in _objetos(cantidad).items():
+        compilado = compilar_serializador(schema)
+        if json.dumps([schema.dump(objeto) for objeto in objetos]) != json.dumps(
+            [compilado(objeto) for objeto in objetos]
+        ):
+            raise AssertionError("El serializador de {} no coincide con dump".format(nombre))
+
+        dump_ms = _mejor_tiempo(schema.dump, objetos, repeticiones)
+        compilado_ms = _mejor_tiempo(compilado, objetos, repeticiones)
+        resultados[nombre] = {
+            "filas": cantidad,
+            "dump_ms": round(dump_ms, 3),
+            "compilado_ms": round(compilado_ms, 3),
+            "aceleracion": round(dump_ms / compilado_ms, 2),
+        }
+    return resultados
+
+
+def main(argumentos=None):
+    parser = argparse.ArgumentParser(description="Benchmark de los serializadores")
+    parser.add_argument("--filas", type=int, default=2000)
+    parser.add_argument("--repeticiones", type=int, default=5)
+    opciones = parser.parse_args(argumentos)
+
+    print(json.dumps(ejecutar(opciones.filas, opciones.repeticiones), indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
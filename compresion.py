@@ -0,0 +1,144 @@
+import zlib
+
+from flask import request
+
+try:
+    import brotli
+except ImportError:
+    try:
+        import brotlicffi as brotli
+    except ImportError:
+        brotli = None
+
+MINIMO_BYTES_POR_DEFECTO = 1024
+NIVEL_GZIP_POR_DEFECTO = 6
+NIVEL_BROTLI_POR_DEFECTO = 4
+TIPOS_COMPRIMIBLES = ("application/json", "application/x-ndjson", "text/")
+
+
+class CompresorGzip:
+    def __init__(self, nivel):
+        # wbits 31: formato gzip con mtime 0, la salida es determinística
+        self._compresor = zlib.compressobj(nivel, zlib.DEFLATED, 31)
+
+    def comprimir(self, datos):
+        return self._compresor.compress(datos)
+
+    def vaciar(self):
+        return self._compresor.flush(zlib.Z_SYNC_FLUSH)
+
+    def terminar(self):
+        return self._compresor.flush()
+
+
+class CompresorBrotli:
+    def __init__(self, nivel):
+        self._compresor = brotli.Compressor(quality=nivel)
+
+    def comprimir(self, datos):
+        return self._compresor.process(datos)
+
+    def vaciar(self):
+        return self._compresor.flush()
+
+    def terminar(self):
+        return self._compresor.finish()
+
+
+def codificaciones_disponibles():
+    return ("br", "gzip") if brotli is not None else ("gzip",)
+
+
+def crear_compresor(codificacion, config):
+    if codificacion == "br":
+        return CompresorBrotli(config["COMPRESION_NIVEL_BROTLI"])
+    return CompresorGzip(config["COMPRESION_NIVEL_GZIP"])
+
+
+def comprimir(datos, codificacion, config):
+    compresor = crear_compresor(codificacion, config)
+    return compresor.comprimir(datos) + compresor.terminar()
+
+
+def _negociar_codificacion():
+    mejor, calidad_mejor = None, 0
+    for codificacion in codificaciones_disponibles():
+        calidad = request.accept_encodings[codificacion]
+        if calidad > calidad_mejor:
+            mejor, calidad_mejor = codificacion, calidad
+    return mejor
+
+
+def _comprimible(respuesta):
+    return (
+        200 <= respuesta.status_code < 300
+        and respuesta.status_code != 204
+        and "Content-Encoding" not in respuesta.headers
+        and respuesta.mimetype.startswith(TIPOS_COMPRIMIBLES)
+    )
+
+
+# Cada parte de una respuesta en streaming se comprime y se envía de
+# inmediato (vaciar) para que el cliente reciba las filas a medida que salen.
+def _comprimir_flujo(partes, compresor, juego_caracteres):
+    try:
+        for parte in partes:
+            if isinstance(parte, str):
+                parte = parte.encode(juego_caracteres)
+            datos = compresor.comprimir(parte) + compresor.vaciar()
+            if datos:
+                yield datos
+        yield compresor.terminar()
+    finally:
+        if hasattr(partes, "close"):
+            partes.close()
+
+
+# Un ETag fuerte identifica bytes exactos: la representación comprimida
+# lleva un sufijo con la codificación.
+def etag_codificado(etag, codificacion):
+    return "{}-{}".format(etag, codificacion)
+
+
+def etag_base(etag):
+    for codificacion in ("br", "gzip"):
+        sufijo = "-" + codificacion
+        if etag.endswith(sufijo):
+            return etag[: -len(sufijo)]
+    return etag
+
+
+def registrar_compresion(app):
+    app.config.setdefault("COMPRESION", True)
+    app.config.setdefault("COMPRESION_MINIMO_BYTES", MINIMO_BYTES_POR_DEFECTO)
+    app.config.setdefault("COMPRESION_NIVEL_GZIP", NIVEL_GZIP_POR_DEFECTO)
+    app.config.setdefault("COMPRESION_NIVEL_BROTLI", NIVEL_BROTLI_POR_DEFECTO)
+    if not app.config["COMPRESION"]:
+        return
+
+    @app.after_request
+    def comprimir_respuesta(respuesta):
+        if not _comprimible(respuesta):
+            return respuesta
+
+        respuesta.vary.add("Accept-Encoding")
+        codificacion = _negociar_codificacion()
+        if codificacion is None:
+            return respuesta
+
+        if respuesta.is_streamed:
+            respuesta.response = _comprimir_flujo(
+                respuesta.response, crear_compresor(codificacion, app.config), respuesta.charset
+            )
+            respuesta.headers.pop("Content-Length", None)
+        else:
+            datos = respuesta.get_data()
+            if len(datos) < app.config["COMPRESION_MINIMO_BYTES"]:
+                return respuesta
+            respuesta.set_data(comprimir(datos, codificacion, app.config))
+
+        respuesta.headers["Content-Encoding"] = codificacion
+        etag, debil = respuesta.get_etag()
+        if etag:
+            respuesta.set_etag(etag_codificado(etag, codificacion), weak=debil)
+        return respuesta
@@ -0,0 +1,66 @@
+import sqlite3
+
+from decouple import config
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+URL_POR_DEFECTO = "sqlite:///test.db"
+
+
+def url_base_datos():
+    url = config("DATABASE_URL", default=URL_POR_DEFECTO)
+    # Heroku y otros proveedores todavía entregan el esquema postgres://, que
+    # SQLAlchemy 1.4 ya no acepta.
+    if url.startswith("postgres://"):
+        url = "postgresql://" + url[len("postgres://"):]
+    return url
+
+
+def es_sqlite(url):
+    return url.startswith("sqlite")
+
+
+# Opciones del pool de conexiones para motores cliente/servidor (Postgres con
+# psycopg2). SQLite usa el pool por defecto de SQLAlchemy.
+def opciones_motor(url):
+    if es_sqlite(url):
+        return {}
+
+    return {
+        "pool_size": config("DB_POOL_SIZE", default=5, cast=int),
+        "max_overflow": config("DB_MAX_OVERFLOW", default=10, cast=int),
+        "pool_recycle": config("DB_POOL_RECYCLE", default=1800, cast=int),
+        "pool_pre_ping": config("DB_POOL_PRE_PING", default=True, cast=bool),
+    }
+
+
+# Pragmas que se aplican a cada conexión SQLite nueva. WAL permite lectores
+# concurrentes mientras un worker escribe y busy_timeout espera el bloqueo en
+# vez de fallar de inmediato con "database is locked".
+def pragmas_sqlite():
+    return {
+        "journal_mode": config("SQLITE_JOURNAL_MODE", default="WAL"),
+        "synchronous": config("SQLITE_SYNCHRONOUS", default="NORMAL"),
+        "mmap_size": config("SQLITE_MMAP_SIZE", default=64 * 1024 * 1024, cast=int),
+        "cache_size": config("SQLITE_CACHE_SIZE", default=-16000, cast=int),
+        "busy_timeout": config("SQLITE_BUSY_TIMEOUT", default=5000, cast=int),
+    }
+
+
+@event.listens_for(Engine, "connect")
+def _configurar_conexion_sqlite(conexion_dbapi, registro_conexion):
+    if not isinstance(conexion_dbapi, sqlite3.Connection):
+        return
+
+    cursor = conexion_dbapi.cursor()
+    try:
+        for pragma, valor in pragmas_sqlite().items():
+            cursor.execute("PRAGMA {} = {}".format(pragma, valor))
+    finally:
+        cursor.close()
+
+
+def configurar_base_datos(app):
+    url = url_base_datos()
+    app.config["SQLALCHEMY_DATABASE_URI"] = url
+    app.config["SQLALCHEMY_ENGINE_OPTIONS"] = opciones_motor(url)
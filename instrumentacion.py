@@ -0,0 +1,164 @@
+import json
+import logging
+import time
+
+from flask import g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger("metricas.instrumentacion")
+
+UMBRAL_LENTO_MS_POR_DEFECTO = 500
+MAXIMO_SENTENCIAS = 200
+
+
+class MetricasSolicitud:
+    def __init__(self):
+        self.inicio = time.perf_counter()
+        self.consultas = 0
+        self.bd_ms = 0.0
+        self.serializacion_ms = 0.0
+        self.sentencias = []
+
+    def registrar_consulta(self, sentencia, duracion_ms):
+        self.consultas += 1
+        self.bd_ms += duracion_ms
+        if len(self.sentencias) < MAXIMO_SENTENCIAS:
+            self.sentencias.append((sentencia, round(duracion_ms, 3)))
+
+    def handler_ms(self):
+        return (time.perf_counter() - self.inicio) * 1000
+
+
+def _metricas_actuales():
+    if not has_request_context():
+        return None
+    return g.get("metricas")
+
+
+# Los eventos del motor se registran una sola vez para todos los motores;
+# fuera de una solicitud instrumentada no hacen nada.
+@event.listens_for(Engine, "before_cursor_execute")
+def _antes_de_consulta(conn, cursor, statement, parameters, context, executemany):
+    if _metricas_actuales() is not None:
+        conn.info.setdefault("inicio_consulta", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _despues_de_consulta(conn, cursor, statement, parameters, context, executemany):
+    metricas = _metricas_actuales()
+    inicios = conn.info.get("inicio_consulta")
+    if metricas is None or not inicios:
+        return
+    metricas.registrar_consulta(statement, (time.perf_counter() - inicios.pop()) * 1000)
+
+
+# Envuelve una representación de flask-restful para medir cuánto tarda en
+# convertir la respuesta a JSON.
+def medir_serializacion(representacion):
+    def representacion_medida(data, code, headers=None):
+        metricas = _metricas_actuales()
+        inicio = time.perf_counter()
+        respuesta = representacion(data, code, headers)
+        if metricas is not None:
+            metricas.serializacion_ms += (time.perf_counter() - inicio) * 1000
+        return respuesta
+
+    return representacion_medida
+
+
+def encabezado_server_timing(metricas, handler_ms):
+    return ", ".join(
+        [
+            'bd;dur={:.2f};desc="{} consultas"'.format(metricas.bd_ms, metricas.consultas),
+            "serializacion;dur={:.2f}".format(metricas.serializacion_ms),
+            "handler;dur={:.2f}".format(handler_ms),
+        ]
+    )
+
+
+def _registrar(registro, metricas, umbral_lento_ms):
+    if registro["handler_ms"] >= umbral_lento_ms:
+        registro["sentencias"] = metricas.sentencias
+        logger.warning(json.dumps(registro, default=str))
+    else:
+        logger.info(json.dumps(registro, default=str))
+
+
+# Recorre el cuerpo de una respuesta en streaming (NDJSON) contando los bytes
+# enviados; al agotarse o cerrarse registra las métricas completas, con las
+# consultas y el tiempo de generar el cuerpo.
+def _medir_cuerpo(cuerpo, metricas, registro, umbral_lento_ms):
+    enviados = 0
+    try:
+        for fragmento in cuerpo:
+            enviados += len(fragmento)
+            yield fragmento
+    finally:
+        cerrar = getattr(cuerpo, "close", None)
+        if cerrar is not None:
+            cerrar()
+        registro.update(
+            {
+                "consultas": metricas.consultas,
+                "bd_ms": round(metricas.bd_ms, 3),
+                "serializacion_ms": round(metricas.serializacion_ms, 3),
+                "handler_ms": round(metricas.handler_ms(), 3),
+                "bytes": enviados,
+            }
+        )
+        _registrar(registro, metricas, umbral_lento_ms)
+
+
+def registrar_instrumentacion(app, api):
+    app.config.setdefault("INSTRUMENTACION", True)
+    app.config.setdefault("INSTRUMENTACION_UMBRAL_LENTO_MS", UMBRAL_LENTO_MS_POR_DEFECTO)
+    if not app.config["INSTRUMENTACION"]:
+        return
+
+    for tipo, representacion in list(api.representations.items()):
+        api.representations[tipo] = medir_serializacion(representacion)
+
+    @app.before_request
+    def iniciar_metricas():
+        g.metricas = MetricasSolicitud()
+
+    @app.after_request
+    def reportar_metricas(respuesta):
+        metricas = g.get("metricas")
+        if metricas is None:
+            return respuesta
+
+        umbral_lento_ms = app.config["INSTRUMENTACION_UMBRAL_LENTO_MS"]
+        handler_ms = metricas.handler_ms()
+        respuesta.headers["Server-Timing"] = encabezado_server_timing(metricas, handler_ms)
+        registro = {
+            "metodo": request.method,
+            "ruta": request.path,
+            "endpoint": request.endpoint,
+            "estado": respuesta.status_code,
+        }
+
+        # En streaming el cuerpo se genera después de este punto: el
+        # encabezado sólo cubre hasta aquí y lo indica, y el registro se hace
+        # al terminar el cuerpo. g.metricas se deja para que las consultas del
+        # generador se sigan contando.
+        if respuesta.is_streamed:
+            respuesta.headers["Server-Timing"] += ', streaming;desc="cuerpo sin medir"'
+            registro["streaming"] = True
+            respuesta.response = _medir_cuerpo(
+                respuesta.response, metricas, registro, umbral_lento_ms
+            )
+            return respuesta
+
+        g.pop("metricas", None)
+        registro.update(
+            {
+                "consultas": metricas.consultas,
+                "bd_ms": round(metricas.bd_ms, 3),
+                "serializacion_ms": round(metricas.serializacion_ms, 3),
+                "handler_ms": round(handler_ms, 3),
+            }
+        )
+        _registrar(registro, metricas, umbral_lento_ms)
+        return respuesta
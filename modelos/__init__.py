@@ -1 +1,3 @@
 from .modelos import *
+from .busqueda import busqueda
+from .migraciones import agregar_columnas_faltantes
@@ -0,0 +1,140 @@
+from sqlalchemy import Column, Integer, MetaData, String, Table, Text, event
+
+from .modelos import db
+
+# Índice de texto de recetas (nombre, preparación) e ingredientes (nombre,
+# sitio) por administrador. No es parte de db.metadata: en SQLite es una
+# tabla virtual FTS5 y en Postgres una tabla con un tsvector, y ambas se
+# crean con el DDL de abajo. El rowid es id * 2 para recetas e id * 2 + 1
+# para ingredientes, así los triggers actualizan por llave. En FTS5 la
+# columna inquilino guarda el token "a<administrador_id>" para filtrar por
+# administrador dentro del MATCH, con el índice, y no fila por fila.
+busqueda = Table(
+    "busqueda",
+    MetaData(),
+    Column("rowid", Integer, primary_key=True),
+    Column("tipo", String(20)),
+    Column("objeto_id", Integer),
+    Column("administrador_id", Integer),
+    Column("inquilino", Text),
+    Column("nombre", Text),
+    Column("texto", Text),
+    Column("documento", Text),
+)
+
+# (tabla, tipo, desplazamiento del rowid, columna del administrador,
+#  columna nombre, columna texto)
+_FUENTES = (
+    ("receta", "receta", 0, "usuario", "nombre", "preparacion"),
+    ("ingrediente", "ingrediente", 1, "administrador_id", "nombre", "sitio"),
+)
+
+
+def _valores(fila, fuente, inquilino):
+    tabla, tipo, desplazamiento, administrador, nombre, texto = fuente
+    valores = "{fila}.id * 2 + {d}, '{tipo}', {fila}.id, {fila}.{a}, ".format(
+        fila=fila, d=desplazamiento, tipo=tipo, a=administrador
+    )
+    if inquilino:
+        valores += "'a' || {fila}.{a}, ".format(fila=fila, a=administrador)
+    return valores + "{fila}.{n}, {fila}.{t}".format(fila=fila, n=nombre, t=texto)
+
+
+def _columnas(inquilino):
+    if inquilino:
+        return "rowid, tipo, objeto_id, administrador_id, inquilino, nombre, texto"
+    return "rowid, tipo, objeto_id, administrador_id, nombre, texto"
+
+
+def _ddl_sqlite():
+    sentencias = [
+        "CREATE VIRTUAL TABLE IF NOT EXISTS busqueda USING fts5("
+        "tipo UNINDEXED, objeto_id UNINDEXED, administrador_id UNINDEXED, inquilino, "
+        "nombre, texto, "
+        "tokenize = 'unicode61 remove_diacritics 2')"
+    ]
+    for fuente in _FUENTES:
+        tabla, _, desplazamiento, administrador, nombre, texto = fuente
+        insertar = "INSERT INTO busqueda({}) VALUES ({});".format(
+            _columnas(True), _valores("new", fuente, True)
+        )
+        borrar = "DELETE FROM busqueda WHERE rowid = old.id * 2 + {};".format(desplazamiento)
+        sentencias += [
+            "CREATE TRIGGER IF NOT EXISTS busqueda_{t}_insertar AFTER INSERT ON {t} "
+            "BEGIN {i} END".format(t=tabla, i=insertar),
+            "CREATE TRIGGER IF NOT EXISTS busqueda_{t}_actualizar "
+            "AFTER UPDATE OF {a}, {n}, {x} ON {t} BEGIN {b} {i} END".format(
+                t=tabla, a=administrador, n=nombre, x=texto, b=borrar, i=insertar
+            ),
+            "CREATE TRIGGER IF NOT EXISTS busqueda_{t}_borrar AFTER DELETE ON {t} "
+            "BEGIN {b} END".format(t=tabla, b=borrar),
+        ]
+    return sentencias
+
+
+def _ddl_postgres():
+    sentencias = [
+        "CREATE TABLE IF NOT EXISTS busqueda ("
+        "rowid BIGINT PRIMARY KEY, tipo VARCHAR(20) NOT NULL, objeto_id INTEGER NOT NULL, "
+        "administrador_id INTEGER, nombre TEXT, texto TEXT, "
+        "documento tsvector GENERATED ALWAYS AS ("
+        "setweight(to_tsvector('spanish', coalesce(nombre, '')), 'A') || "
+        "setweight(to_tsvector('spanish', coalesce(texto, '')), 'B')) STORED)",
+        "CREATE INDEX IF NOT EXISTS ix_busqueda_documento ON busqueda USING GIN (documento)",
+        "CREATE INDEX IF NOT EXISTS ix_busqueda_administrador ON busqueda (administrador_id)",
+    ]
+    for fuente in _FUENTES:
+        tabla, _, desplazamiento, administrador, nombre, texto = fuente
+        sentencias += [
+            "CREATE OR REPLACE FUNCTION busqueda_{t}() RETURNS trigger AS $$ BEGIN "
+            "IF TG_OP IN ('UPDATE', 'DELETE') THEN "
+            "DELETE FROM busqueda WHERE rowid = OLD.id * 2 + {d}; END IF; "
+            "IF TG_OP IN ('INSERT', 'UPDATE') THEN "
+            "INSERT INTO busqueda({c}) VALUES ({v}); END IF; "
+            "RETURN NULL; END $$ LANGUAGE plpgsql".format(
+                t=tabla, d=desplazamiento, c=_columnas(False), v=_valores("NEW", fuente, False)
+            ),
+            "DROP TRIGGER IF EXISTS busqueda_{t} ON {t}".format(t=tabla),
+            "CREATE TRIGGER busqueda_{t} AFTER INSERT OR DELETE OR UPDATE OF {a}, {n}, {x} "
+            "ON {t} FOR EACH ROW EXECUTE FUNCTION busqueda_{t}()".format(
+                t=tabla, a=administrador, n=nombre, x=texto
+            ),
+        ]
+    return sentencias
+
+
+def _existe(connection):
+    if connection.dialect.name == "postgresql":
+        return connection.exec_driver_sql("SELECT to_regclass('busqueda')").scalar() is not None
+    return (
+        connection.exec_driver_sql(
+            "SELECT 1 FROM sqlite_master WHERE name = 'busqueda'"
+        ).first()
+        is not None
+    )
+
+
+# Se ejecuta con cada create_all: crea el índice y sus triggers si faltan y,
+# la primera vez, lo llena con las recetas e ingredientes existentes.
+@event.listens_for(db.metadata, "after_create")
+def crear_indice_busqueda(target, connection, **kw):
+    sqlite = connection.dialect.name == "sqlite"
+    if sqlite:
+        sentencias = _ddl_sqlite()
+    elif connection.dialect.name == "postgresql":
+        sentencias = _ddl_postgres()
+    else:
+        return
+
+    existia = _existe(connection)
+    for sentencia in sentencias:
+        connection.exec_driver_sql(sentencia)
+    if existia:
+        return
+
+    for fuente in _FUENTES:
+        connection.exec_driver_sql(
+            "INSERT INTO busqueda({}) SELECT {} FROM {} AS fila".format(
+                _columnas(sqlite), _valores("fila", fuente, sqlite), fuente[0]
+            )
+        )
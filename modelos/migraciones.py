@@ -0,0 +1,29 @@
+from sqlalchemy import inspect
+from sqlalchemy.schema import CreateColumn
+
+from .modelos import db
+
+
+# create_all no modifica tablas existentes: agrega con ALTER TABLE las
+# columnas declaradas en los modelos que faltan en la base (por ejemplo los
+# totales de Receta en una base anterior). Sólo sirve para columnas que
+# aceptan NULL o tienen default. Retorna ["tabla.columna", ...] agregadas.
+def agregar_columnas_faltantes(connection):
+    inspector = inspect(connection)
+    tablas = set(inspector.get_table_names())
+    agregadas = []
+    for tabla in db.metadata.sorted_tables:
+        if tabla.name not in tablas:
+            continue
+
+        existentes = {columna["name"] for columna in inspector.get_columns(tabla.name)}
+        for columna in tabla.columns:
+            if columna.name in existentes:
+                continue
+            connection.exec_driver_sql(
+                "ALTER TABLE {} ADD COLUMN {}".format(
+                    tabla.name, CreateColumn(columna).compile(dialect=connection.dialect)
+                )
+            )
+            agregadas.append("{}.{}".format(tabla.name, columna.name))
+    return agregadas
@@ -23,12 +23,15 @@ class Ingrediente(db.Model):
     sitio = db.Column(db.String(128))
     administrador_id = db.Column(db.Integer, db.ForeignKey("usuario.id"))
 
+    __table_args__ = (db.Index("ix_ingrediente_administrador_id", "administrador_id", "id"),)
+
 
 class RecetaIngrediente(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     cantidad = db.Column(db.Numeric)
     ingrediente = db.Column(db.Integer, db.ForeignKey("ingrediente.id"))
     receta = db.Column(db.Integer, db.ForeignKey("receta.id"))
+    datos_ingrediente = db.relationship("Ingrediente")
 
 
 class Receta(db.Model):
@@ -37,11 +40,17 @@ class Receta(db.Model):
     duracion = db.Column(db.Numeric)
     porcion = db.Column(db.Numeric)
     preparacion = db.Column(db.String)
+    costo_total = db.Column(db.Numeric)
+    calorias_total = db.Column(db.Numeric)
+    costo_porcion = db.Column(db.Numeric)
+    calorias_porcion = db.Column(db.Numeric)
     ingredientes = db.relationship(
         "RecetaIngrediente", cascade="all, delete, delete-orphan"
     )
     usuario = db.Column(db.Integer, db.ForeignKey("usuario.id"))
 
+    __table_args__ = (db.Index("ix_receta_usuario_id", "usuario", "id"),)
+
 
 class Usuario(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -71,6 +80,10 @@ class Chef(Usuario):
     nombre = db.Column(db.String(200))
     restaurante_id = db.Column(db.Integer, db.ForeignKey("restaurante.id"))
 
+    __table_args__ = (
+        db.Index("ix_chef_restaurante_nombre_id", "restaurante_id", "nombre", "id"),
+    )
+
 
 class Restaurante(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -97,6 +110,12 @@ class Restaurante(db.Model):
         lazy="dynamic",
     )
 
+    __table_args__ = (
+        db.Index(
+            "ix_restaurante_administrador_nombre_id", "administrador_id", "nombre", "id"
+        ),
+    )
+
 class Menu(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     nombre = db.Column(db.String(200), nullable=False)
@@ -106,13 +125,62 @@ class Menu(db.Model):
     usuario_id = db.Column(db.Integer, db.ForeignKey("usuario.id"))
     restaurante_id = db.Column(db.Integer, db.ForeignKey("restaurante.id"))   
     recetas = db.relationship("MenuReceta", cascade="all, delete, delete-orphan")
+    lista_compra = db.relationship(
+        "ListaCompraMenu", uselist=False, cascade="all, delete, delete-orphan"
+    )
+
+    __table_args__ = (
+        db.Index("ix_menu_restaurante_inicio_id", "restaurante_id", "fecha_inicio", "id"),
+        db.Index("ix_menu_restaurante_fechas", "restaurante_id", "fecha_inicio", "fecha_fin"),
+    )
 
 class MenuReceta(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     numero_personas = db.Column(db.Integer, nullable=False)
     menu = db.Column(db.Integer, db.ForeignKey("menu.id"))
     receta = db.Column(db.Integer, db.ForeignKey("receta.id"))
-    
+
+    __table_args__ = (db.Index("ix_menu_receta_menu", "menu"),)
+
+
+# Lista de compra calculada de un menú (JSON con el formato de
+# ingredientes_receta) y la versión de las recetas del administrador con la
+# que se calculó; si la versión cambió, la lista está vencida.
+class ListaCompraMenu(db.Model):
+    menu_id = db.Column(db.Integer, db.ForeignKey("menu.id"), primary_key=True)
+    version = db.Column(db.Integer, nullable=False)
+    ingredientes = db.Column(db.Text, nullable=False)
+
+
+# Operación pesada que se ejecuta en segundo plano (vistas/trabajos.py). Los
+# parámetros y el resultado se guardan como JSON; la fila se borra después
+# de expira.
+class Trabajo(db.Model):
+    id = db.Column(db.String(32), primary_key=True)
+    tipo = db.Column(db.String(50), nullable=False)
+    estado = db.Column(db.String(20), nullable=False)
+    administrador_id = db.Column(db.Integer, nullable=False)
+    parametros = db.Column(db.Text, nullable=False)
+    codigo = db.Column(db.Integer)
+    resultado = db.Column(db.Text)
+    error = db.Column(db.String(500))
+    creado = db.Column(DateTime, nullable=False)
+    terminado = db.Column(DateTime)
+    expira = db.Column(DateTime, nullable=False)
+    # Proceso cuyo pool ejecuta el trabajo: "host:pid:token"
+    proceso = db.Column(db.String(150))
+
+    __table_args__ = (db.Index("ix_trabajo_expira", "expira"),)
+
+
+# Versión de cada colección por administrador (inquilino). Se incrementa en
+# cada escritura y forma parte del ETag de los listados.
+class VersionColeccion(db.Model):
+    administrador_id = db.Column(db.Integer, primary_key=True)
+    coleccion = db.Column(db.String(50), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+
+
 class ChefSchema(SQLAlchemyAutoSchema):
     class Meta:
         model = Chef
@@ -164,6 +232,7 @@ class RecetaIngredienteSchema(SQLAlchemyAutoSchema):
         include_relationships = True
         include_fk = True
         load_instance = True
+        exclude = ("datos_ingrediente",)
 
     id = fields.String()
     cantidad = fields.String()
@@ -180,9 +249,28 @@ class RecetaSchema(SQLAlchemyAutoSchema):
     id = fields.String()
     duracion = fields.String()
     porcion = fields.String()
+    costo_total = fields.Float(dump_only=True)
+    calorias_total = fields.Float(dump_only=True)
+    costo_porcion = fields.Float(dump_only=True)
+    calorias_porcion = fields.Float(dump_only=True)
     ingredientes = fields.List(fields.Nested(RecetaIngredienteSchema()))
 
 
+class RecetaIngredienteLoteSchema(Schema):
+    cantidad = fields.Float(required=True)
+    idIngrediente = fields.Integer(required=True)
+
+
+class RecetaLoteSchema(Schema):
+    nombre = fields.String(required=True, validate=not_empty)
+    preparacion = fields.String(required=True)
+    duracion = fields.Float(required=True)
+    porcion = fields.Float(required=True)
+    ingredientes = fields.List(
+        fields.Nested(RecetaIngredienteLoteSchema()), required=True
+    )
+
+
 class MenuRecetaSchema(SQLAlchemyAutoSchema):
     class Meta:
         model = MenuReceta
@@ -215,3 +303,9 @@ class UsuarioSchema(SQLAlchemyAutoSchema):
         load_instance = True
 
     id = fields.String()
+
+
+class TrabajoSchema(SQLAlchemyAutoSchema):
+    class Meta:
+        model = Trabajo
+        fields = ("id", "tipo", "estado", "codigo", "error", "creado", "terminado", "expira")
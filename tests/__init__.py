@@ -0,0 +1,45 @@
+import atexit
+import os
+import shutil
+import tempfile
+from contextlib import contextmanager
+
+from app import create_app
+from modelos import db
+from sqlalchemy import event
+
+# Las pruebas usan una base SQLite temporal, no el test.db del repositorio,
+# y el contexto queda activo para que los TestCase puedan usar db.session
+# directamente. La cache de lecturas se desactiva porque las pruebas escriben
+# en la base sin pasar por las vistas; test_cache instala la suya.
+DIRECTORIO_BASE = tempfile.mkdtemp(prefix="metricas-pruebas-")
+atexit.register(shutil.rmtree, DIRECTORIO_BASE, ignore_errors=True)
+URL_BASE_PRUEBAS = "sqlite:///" + os.path.join(DIRECTORIO_BASE, "pruebas.db")
+
+CONFIGURACION_PRUEBAS = {
+    "TESTING": True,
+    "CACHE": False,
+    "SQLALCHEMY_DATABASE_URI": URL_BASE_PRUEBAS,
+}
+
+app = create_app(CONFIGURACION_PRUEBAS)
+app.app_context().push()
+db.create_all()
+
+
+# Registra las sentencias SQL que se ejecutan dentro del bloque:
+#     with contar_consultas() as consultas:
+#         ...
+#     self.assertEqual(len(consultas), 1)
+@contextmanager
+def contar_consultas():
+    consultas = []
+
+    def contar(conn, cursor, statement, parameters, context, executemany):
+        consultas.append(statement)
+
+    event.listen(db.engine, "before_cursor_execute", contar)
+    try:
+        yield consultas
+    finally:
+        event.remove(db.engine, "before_cursor_execute", contar)
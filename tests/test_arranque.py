@@ -0,0 +1,88 @@
+import json
+import os
+import shutil
+import subprocess
+import sys
+from unittest import TestCase
+
+from app import create_app
+from modelos import db
+from sqlalchemy import inspect
+
+from tests import CONFIGURACION_PRUEBAS, DIRECTORIO_BASE, app
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Presupuesto del tiempo de importación de app.py en un proceso nuevo. Se
+# puede ajustar con PRESUPUESTO_ARRANQUE_MS en máquinas lentas.
+PRESUPUESTO_ARRANQUE_MS = float(os.environ.get("PRESUPUESTO_ARRANQUE_MS", 1500))
+
+MEDIR_ARRANQUE = """
+import json, sys, time
+inicio = time.perf_counter()
+import app
+duracion = (time.perf_counter() - inicio) * 1000
+print(json.dumps({
+    "duracion_ms": duracion,
+    "numpy": "numpy" in sys.modules,
+    "conexiones": len(app.app.extensions["sqlalchemy"].connectors),
+}))
+"""
+
+
+class TestArranque(TestCase):
+    def _medir_arranque(self):
+        resultado = subprocess.run(
+            [sys.executable, "-c", MEDIR_ARRANQUE],
+            cwd=RAIZ,
+            capture_output=True,
+            check=True,
+        )
+        return json.loads(resultado.stdout.decode("utf-8").strip().splitlines()[-1])
+
+    def test_importar_app_es_liviano(self):
+        mediciones = [self._medir_arranque() for _ in range(3)]
+
+        for medicion in mediciones:
+            self.assertFalse(medicion["numpy"])
+            self.assertEqual(medicion["conexiones"], 0)
+        self.assertLess(
+            min(medicion["duracion_ms"] for medicion in mediciones),
+            PRESUPUESTO_ARRANQUE_MS,
+        )
+
+    def test_comando_crear_tablas(self):
+        resultado = app.test_cli_runner().invoke(args=["crear-tablas"])
+        self.assertEqual(resultado.exit_code, 0)
+        self.assertIn("Tablas creadas", resultado.output)
+
+    def test_crear_tablas_migra_base_anterior(self):
+        # test.db tiene el esquema original, sin los totales de Receta
+        archivo = os.path.join(DIRECTORIO_BASE, "anterior.db")
+        shutil.copy(os.path.join(RAIZ, "test.db"), archivo)
+        anterior = create_app(
+            dict(CONFIGURACION_PRUEBAS, SQLALCHEMY_DATABASE_URI="sqlite:///" + archivo)
+        )
+
+        # El comando usa la aplicación activa, así que se empuja su contexto
+        db.session.remove()
+        try:
+            with anterior.app_context():
+                resultado = anterior.test_cli_runner().invoke(args=["crear-tablas"])
+                self.assertEqual(resultado.exit_code, 0, resultado.output)
+                self.assertIn("Columna agregada: receta.costo_total", resultado.output)
+
+                columnas = {
+                    columna["name"] for columna in inspect(db.engine).get_columns("receta")
+                }
+                self.assertIn("calorias_porcion", columnas)
+                sin_totales = db.session.execute(
+                    "SELECT COUNT(*) FROM receta WHERE costo_total IS NULL"
+                ).scalar()
+                self.assertEqual(sin_totales, 0)
+
+                segunda = anterior.test_cli_runner().invoke(args=["crear-tablas"])
+                self.assertNotIn("Columna agregada", segunda.output)
+                db.session.remove()
+        finally:
+            db.session.remove()
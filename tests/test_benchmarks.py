@@ -0,0 +1,48 @@
+from unittest import TestCase
+
+from benchmarks import compresion as benchmark_compresion
+from benchmarks.datos import Escala
+from benchmarks.ejecutar import ESCENARIOS, comparar, ejecutar, percentil
+from modelos import Receta
+
+from tests import app
+
+
+class TestBenchmarks(TestCase):
+    def test_percentil(self):
+        valores = list(range(1, 101))
+        self.assertEqual(percentil(valores, 50), 50)
+        self.assertEqual(percentil(valores, 95), 95)
+        self.assertEqual(percentil(valores, 99), 99)
+
+    def test_ejecutar_escala_minima(self):
+        recetas_antes = Receta.query.count()
+
+        resultado = ejecutar(Escala(2, 1, 1, 6, 4, 3, 2, 2), repeticiones=2)
+
+        self.assertEqual(set(resultado["escenarios"]), set(ESCENARIOS))
+        for nombre, medicion in resultado["escenarios"].items():
+            self.assertTrue(
+                all(estado < 400 for estado in medicion["estados"]), nombre
+            )
+            self.assertLessEqual(medicion["p50_ms"], medicion["p99_ms"])
+        self.assertEqual(resultado["escenarios"]["receta_detalle"]["consultas"], 1)
+        # La corrida usa su propia base de datos temporal
+        self.assertEqual(Receta.query.count(), recetas_antes)
+        self.assertEqual(comparar(resultado, resultado), [])
+
+    def test_comparar_detecta_regresiones(self):
+        base = {"escenarios": {"a": {"p95_ms": 10.0, "consultas": 2}}}
+        actual = {"escenarios": {"a": {"p95_ms": 20.0, "consultas": 5}}}
+        self.assertEqual(len(comparar(actual, base)), 2)
+        self.assertEqual(len(comparar(actual, base, tolerancia=1.5)), 1)
+
+    def test_benchmark_compresion(self):
+        resultado = benchmark_compresion.ejecutar(
+            Escala(1, 1, 1, 20, 10, 3, 2, 2), repeticiones=1, niveles_gzip=(6,), niveles_brotli=(4,)
+        )
+
+        self.assertIn("ingredientes_listar", resultado)
+        medicion = resultado["ingredientes_listar"]
+        self.assertLess(medicion["gzip-6"]["bytes"], medicion["bytes"])
+        self.assertGreater(medicion["gzip-6"]["ahorro_pct"], 0)
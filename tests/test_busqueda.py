@@ -0,0 +1,121 @@
+import hashlib
+from unittest import TestCase
+
+from faker import Faker
+from modelos import db, Administrador, Ingrediente, Receta
+
+from tests import app
+
+
+class TestBusqueda(TestCase):
+    def setUp(self):
+        self.data_factory = Faker()
+        self.client = app.test_client()
+        self.administradores = []
+        self.headers = self._crear_administrador()
+
+    def _crear_administrador(self):
+        nombre_usuario = "test_" + self.data_factory.name()
+        contrasena = "T1$" + self.data_factory.word()
+        administrador = Administrador(
+            usuario=nombre_usuario,
+            contrasena=hashlib.md5(contrasena.encode("utf-8")).hexdigest(),
+        )
+        db.session.add(administrador)
+        db.session.commit()
+        self.administradores.append(administrador.id)
+
+        respuesta_login = self.client.post(
+            "/login", json={"usuario": nombre_usuario, "contrasena": contrasena}
+        ).get_json()
+        return {"Authorization": "Bearer {}".format(respuesta_login["token"])}
+
+    def tearDown(self):
+        for administrador_id in self.administradores:
+            Receta.query.filter_by(usuario=administrador_id).delete()
+            Ingrediente.query.filter_by(administrador_id=administrador_id).delete()
+            db.session.delete(Administrador.query.get(administrador_id))
+        db.session.commit()
+
+    def _receta(self, nombre, preparacion, administrador_id=None):
+        receta = Receta(
+            nombre=nombre,
+            duracion=10,
+            porcion=2,
+            preparacion=preparacion,
+            usuario=administrador_id or self.administradores[0],
+        )
+        db.session.add(receta)
+        db.session.commit()
+        return receta
+
+    def _buscar(self, **parametros):
+        return self.client.get("/buscar", query_string=parametros, headers=self.headers)
+
+    def test_buscar_ordenado_por_relevancia(self):
+        en_preparacion = self._receta("Sopa del día", "Servir con arroz blanco")
+        en_nombre = self._receta("Arroz con pollo", "Cocinar el pollo")
+        ingrediente = Ingrediente(
+            nombre="Arróz integral",
+            unidad="gramo",
+            costo=1,
+            calorias=1,
+            sitio="Plaza",
+            administrador_id=self.administradores[0],
+        )
+        db.session.add(ingrediente)
+        db.session.commit()
+
+        resultados = self._buscar(q="arroz").get_json()
+        self.assertEqual(
+            {(resultado["tipo"], resultado["id"]) for resultado in resultados},
+            {("receta", en_preparacion.id), ("receta", en_nombre.id), ("ingrediente", ingrediente.id)},
+        )
+        # La coincidencia en el nombre es más relevante que en la preparación
+        ids = [resultado["id"] for resultado in resultados if resultado["tipo"] == "receta"]
+        self.assertEqual(ids, [en_nombre.id, en_preparacion.id])
+
+        solo_recetas = self._buscar(q="arr", tipo="receta").get_json()
+        self.assertEqual({resultado["tipo"] for resultado in solo_recetas}, {"receta"})
+
+    def test_buscar_por_administrador(self):
+        otro_administrador = self._crear_administrador()
+        ajena = self._receta("Lasaña", "Hornear", self.administradores[1])
+        self._receta("Lasaña de verduras", "Hornear")
+
+        propios = self._buscar(q="lasana").get_json()
+        self.assertEqual(len(propios), 1)
+        self.assertNotIn(ajena.id, [resultado["id"] for resultado in propios])
+
+        ajenos = self.client.get(
+            "/buscar", query_string={"q": "lasaña"}, headers=otro_administrador
+        ).get_json()
+        self.assertEqual([resultado["id"] for resultado in ajenos], [ajena.id])
+
+    def test_indice_sincronizado(self):
+        receta = self._receta("Ceviche", "Marinar en limón")
+        receta.nombre = "Tiradito"
+        db.session.commit()
+
+        self.assertEqual(self._buscar(q="ceviche").get_json(), [])
+        self.assertEqual(len(self._buscar(q="tiradito").get_json()), 1)
+
+        db.session.delete(receta)
+        db.session.commit()
+        self.assertEqual(self._buscar(q="tiradito").get_json(), [])
+
+    def test_buscar_paginado(self):
+        for numero in range(3):
+            self._receta("Tamal {}".format(numero), "Envolver en hoja")
+
+        primera = self._buscar(q="tamal", limit=2)
+        self.assertEqual(len(primera.get_json()), 2)
+        segunda = self._buscar(q="tamal", limit=2, cursor=primera.headers["X-Siguiente-Cursor"])
+        self.assertEqual(len(segunda.get_json()), 1)
+        self.assertNotIn("X-Siguiente-Cursor", segunda.headers)
+
+        ids = [resultado["id"] for resultado in primera.get_json() + segunda.get_json()]
+        self.assertEqual(len(set(ids)), 3)
+
+    def test_buscar_sin_texto(self):
+        self.assertEqual(self._buscar(q=" \"* ").status_code, 400)
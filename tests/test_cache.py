@@ -0,0 +1,200 @@
+import hashlib
+from unittest import TestCase
+
+from faker import Faker
+from modelos import db, Administrador, Ingrediente
+
+from app import create_app
+from tests import CONFIGURACION_PRUEBAS, app
+from vistas.cache import CacheCompartida, CacheMemoria, crear_cache
+
+
+# Reemplazo local de redis con las operaciones que usa CacheCompartida
+class RedisLocal:
+    def __init__(self):
+        self.datos = {}
+
+    def get(self, llave):
+        return self.datos.get(llave)
+
+    def setex(self, llave, ttl, valor):
+        self.datos[llave] = valor.encode("utf-8")
+
+    def incr(self, llave):
+        self.datos[llave] = str(int(self.datos.get(llave, 0)) + 1).encode("utf-8")
+        return int(self.datos[llave])
+
+
+class TestCache(TestCase):
+    def setUp(self):
+        self.data_factory = Faker()
+        self.client = app.test_client()
+
+        nombre_usuario = "test_" + self.data_factory.name()
+        contrasena = "T1$" + self.data_factory.word()
+        administrador = Administrador(
+            usuario=nombre_usuario,
+            contrasena=hashlib.md5(contrasena.encode("utf-8")).hexdigest(),
+        )
+        db.session.add(administrador)
+        db.session.commit()
+        self.usuario_id = administrador.id
+
+        respuesta_login = self.client.post(
+            "/login", json={"usuario": nombre_usuario, "contrasena": contrasena}
+        ).get_json()
+        self.headers = {"Authorization": "Bearer {}".format(respuesta_login["token"])}
+
+    def tearDown(self):
+        app.extensions["cache"] = None
+        Ingrediente.query.filter_by(administrador_id=self.usuario_id).delete()
+        db.session.delete(Administrador.query.get(self.usuario_id))
+        db.session.commit()
+
+    def _crear_ingrediente(self):
+        return self.client.post(
+            "/ingredientes",
+            json={
+                "nombre": self.data_factory.unique.name(),
+                "unidad": "gramo",
+                "costo": 2,
+                "calorias": 10,
+                "sitio": "Plaza",
+            },
+            headers=self.headers,
+        )
+
+    def test_lru_desaloja_la_menos_usada(self):
+        cache = CacheMemoria(maximo_entradas=2)
+        cache.guardar(1, "ingredientes", "a", [1])
+        cache.guardar(1, "ingredientes", "b", [2])
+        cache.obtener(1, "ingredientes", "a")
+        cache.guardar(1, "ingredientes", "c", [3])
+
+        self.assertEqual(cache.obtener(1, "ingredientes", "a"), [1])
+        self.assertIsNone(cache.obtener(1, "ingredientes", "b"))
+        self.assertEqual(len(cache), 2)
+        self.assertEqual(cache.estadisticas.desalojos, 1)
+        self.assertEqual(cache.estadisticas.aciertos, 2)
+        self.assertEqual(cache.estadisticas.fallos, 1)
+
+    def test_ttl_vencido(self):
+        cache = CacheMemoria(ttl=-1)
+        cache.guardar(1, "menus", "a", [1])
+
+        self.assertIsNone(cache.obtener(1, "menus", "a"))
+        self.assertEqual(cache.estadisticas.expirados, 1)
+        self.assertEqual(len(cache), 0)
+
+    def test_invalidar_solo_el_inquilino(self):
+        for cache in (CacheMemoria(), CacheCompartida(RedisLocal())):
+            with self.subTest(backend=cache.nombre):
+                cache.guardar(1, "chefs", "a", [1])
+                cache.guardar(2, "chefs", "a", [2])
+                cache.invalidar(1, "chefs")
+
+                self.assertIsNone(cache.obtener(1, "chefs", "a"))
+                self.assertEqual(cache.obtener(2, "chefs", "a"), [2])
+
+    def test_crear_cache_compartida(self):
+        cliente = RedisLocal()
+        cache = crear_cache({"CACHE_BACKEND": "compartida", "CACHE_CLIENTE": cliente})
+        self.assertIsInstance(cache, CacheCompartida)
+        self.assertIs(cache.cliente, cliente)
+
+    def test_listado_cacheado_e_invalidado(self):
+        for cache in (CacheMemoria(), CacheCompartida(RedisLocal())):
+            with self.subTest(backend=cache.nombre):
+                app.extensions["cache"] = cache
+                self._crear_ingrediente()
+
+                primera = self.client.get("/ingredientes", headers=self.headers)
+                segunda = self.client.get("/ingredientes", headers=self.headers)
+                self.assertEqual(segunda.get_json(), primera.get_json())
+                self.assertEqual(cache.estadisticas.aciertos, 1)
+
+                self._crear_ingrediente()
+                tercera = self.client.get("/ingredientes", headers=self.headers)
+                self.assertEqual(len(tercera.get_json()), len(primera.get_json()) + 1)
+                self.assertEqual(cache.estadisticas.aciertos, 1)
+
+    def test_etag_con_cache(self):
+        app.extensions["cache"] = CacheMemoria()
+        self._crear_ingrediente()
+
+        primera = self.client.get("/ingredientes", headers=self.headers)
+        etag = primera.headers["ETag"]
+        condicional = self.client.get(
+            "/ingredientes", headers=dict(self.headers, **{"If-None-Match": etag})
+        )
+        self.assertEqual(condicional.status_code, 304)
+
+        self._crear_ingrediente()
+        segunda = self.client.get(
+            "/ingredientes", headers=dict(self.headers, **{"If-None-Match": etag})
+        )
+        self.assertEqual(segunda.status_code, 200)
+        self.assertNotEqual(segunda.headers["ETag"], etag)
+        self.assertEqual(len(segunda.get_json()), 2)
+
+        cacheada = self.client.get("/ingredientes", headers=self.headers)
+        self.assertEqual(cacheada.headers["ETag"], segunda.headers["ETag"])
+        self.assertEqual(cacheada.get_json(), segunda.get_json())
+        self.assertEqual(app.extensions["cache"].estadisticas.aciertos, 1)
+
+    # Dos workers con la misma base y cada uno con su cache en memoria: la
+    # escritura en uno no invalida la cache del otro, pero la versión en la
+    # llave hace que el otro no entregue el listado anterior.
+    def test_escritura_en_otra_instancia(self):
+        app.extensions["cache"] = CacheMemoria()
+        otra = create_app(dict(CONFIGURACION_PRUEBAS, CACHE=True))
+        cliente_otra = otra.test_client()
+
+        db.session.remove()
+        try:
+            vacia = self.client.get("/ingredientes", headers=self.headers)
+            self.assertEqual(vacia.get_json(), [])
+
+            creado = cliente_otra.post(
+                "/ingredientes",
+                json={
+                    "nombre": self.data_factory.unique.name(),
+                    "unidad": "gramo",
+                    "costo": 2,
+                    "calorias": 10,
+                    "sitio": "Plaza",
+                },
+                headers=self.headers,
+            )
+            self.assertEqual(creado.status_code, 200)
+
+            actual = self.client.get("/ingredientes", headers=self.headers)
+            self.assertEqual(len(actual.get_json()), 1)
+            self.assertNotEqual(actual.headers["ETag"], vacia.headers["ETag"])
+
+            en_otra = cliente_otra.get(
+                "/ingredientes",
+                headers=dict(self.headers, **{"If-None-Match": actual.headers["ETag"]}),
+            )
+            self.assertEqual(en_otra.status_code, 304)
+        finally:
+            db.session.remove()
+
+    def test_estadisticas(self):
+        app.extensions["cache"] = CacheMemoria()
+        self.client.get("/ingredientes", headers=self.headers)
+        self.client.get("/ingredientes", headers=self.headers)
+
+        respuesta = self.client.get("/cache/estadisticas", headers=self.headers)
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(
+            respuesta.get_json(),
+            {
+                "backend": "memoria",
+                "aciertos": 1,
+                "fallos": 1,
+                "desalojos": 0,
+                "expirados": 0,
+                "entradas": 1,
+            },
+        )
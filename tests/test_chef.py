@@ -3,9 +3,10 @@ import hashlib
 from unittest import TestCase
 
 from faker import Faker
+from flask_jwt_extended import decode_token
 from modelos import db, Usuario, Chef, Restaurante, Administrador
 
-from app import app
+from tests import app, contar_consultas
 
 
 class TestChef(TestCase):
@@ -189,4 +190,70 @@ class TestChef(TestCase):
                 if chef['id'] == str(chef_creado.id):
                     self.assertEqual(chef['nombre'], chef_creado.nombre)
                     self.assertEqual(chef['restaurante_id'], chef_creado.restaurante.id)
-                    self.assertEqual(chef['id'], chef_creado.id)
\ No newline at end of file
+                    self.assertEqual(chef['id'], chef_creado.id)
+
+    def test_listar_chefs_paginado_con_nombre_vacio(self):
+        for nombre in (None, None, "Ana", "Bruno"):
+            chef = Chef(
+                usuario="test_" + self.data_factory.unique.user_name(),
+                contrasena="x",
+                nombre=nombre,
+                restaurante_id=self.restaurante_creado.id,
+            )
+            db.session.add(chef)
+            db.session.commit()
+            self.chefs_creados.append(chef)
+
+        headers = {"Authorization": "Bearer {}".format(self.token)}
+        endpoint = "/chefs/{}?limit=1".format(self.restaurante_creado.id)
+        ids = []
+        while endpoint:
+            resultado = self.client.get(endpoint, headers=headers)
+            self.assertEqual(resultado.status_code, 200)
+            ids.extend(chef["id"] for chef in resultado.get_json())
+            cursor = resultado.headers.get("X-Siguiente-Cursor")
+            endpoint = "/chefs/{}?limit=1&cursor={}".format(
+                self.restaurante_creado.id, cursor
+            ) if cursor else None
+
+        self.assertEqual(sorted(ids), sorted(chef.id for chef in self.chefs_creados))
+
+    def test_login_chef_incluye_claims(self):
+        chef = Chef(
+            nombre="Chef Claims",
+            usuario="chef_claims",
+            contrasena=hashlib.md5("contrasena".encode("utf-8")).hexdigest(),
+            restaurante=self.restaurante_creado,
+        )
+        db.session.add(chef)
+        db.session.commit()
+        self.chefs_creados.append(chef)
+        id_restaurante = self.restaurante_creado.id
+
+        solicitud_login = self.client.post(
+            "/login",
+            data=json.dumps({"usuario": "chef_claims", "contrasena": "contrasena"}),
+            headers={"Content-Type": "application/json"},
+        )
+        respuesta_login = json.loads(solicitud_login.get_data())
+        self.assertEqual(respuesta_login["rol"], "chef")
+
+        claims = decode_token(respuesta_login["token"])
+        self.assertEqual(claims["rol"], "chef")
+        self.assertEqual(claims["administrador_id"], self.usuario_id)
+        self.assertEqual(claims["restaurante_id"], id_restaurante)
+
+        claims_admin = decode_token(self.token)
+        self.assertEqual(claims_admin["rol"], "admin")
+        self.assertEqual(claims_admin["administrador_id"], self.usuario_id)
+        self.assertIsNone(claims_admin["restaurante_id"])
+
+        # El chef se resuelve desde el token: sólo se consultan la versión de
+        # la colección (ETag) y los menús
+        headers = {"Authorization": "Bearer {}".format(respuesta_login["token"])}
+        with contar_consultas() as consultas:
+            resultado = self.client.get("/menus", headers=headers)
+
+        self.assertEqual(resultado.status_code, 200)
+        self.assertEqual(len(consultas), 2)
+        self.assertNotIn("FROM usuario", " ".join(consultas))
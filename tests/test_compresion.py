@@ -0,0 +1,106 @@
+import gzip
+import hashlib
+import json
+from unittest import TestCase, skipUnless
+
+from faker import Faker
+from modelos import db, Administrador, Ingrediente
+
+import compresion
+from tests import app
+
+
+class TestCompresion(TestCase):
+    def setUp(self):
+        self.data_factory = Faker()
+        self.client = app.test_client()
+
+        nombre_usuario = "test_" + self.data_factory.name()
+        contrasena = "T1$" + self.data_factory.word()
+        administrador = Administrador(
+            usuario=nombre_usuario,
+            contrasena=hashlib.md5(contrasena.encode("utf-8")).hexdigest(),
+        )
+        db.session.add(administrador)
+        db.session.commit()
+        self.usuario_id = administrador.id
+
+        respuesta_login = self.client.post(
+            "/login", json={"usuario": nombre_usuario, "contrasena": contrasena}
+        ).get_json()
+        self.headers = {"Authorization": "Bearer {}".format(respuesta_login["token"])}
+
+        for _ in range(30):
+            db.session.add(
+                Ingrediente(
+                    nombre=self.data_factory.sentence(nb_words=8),
+                    unidad=self.data_factory.word(),
+                    costo=2,
+                    calorias=10,
+                    sitio=self.data_factory.sentence(nb_words=6),
+                    administrador_id=self.usuario_id,
+                )
+            )
+        db.session.commit()
+
+    def tearDown(self):
+        Ingrediente.query.filter_by(administrador_id=self.usuario_id).delete()
+        db.session.delete(Administrador.query.get(self.usuario_id))
+        db.session.commit()
+
+    def _get(self, **encabezados):
+        return self.client.get("/ingredientes", headers=dict(self.headers, **encabezados))
+
+    def test_gzip_respuesta_grande(self):
+        sin_comprimir = self._get()
+        self.assertNotIn("Content-Encoding", sin_comprimir.headers)
+        self.assertIn("Accept-Encoding", sin_comprimir.headers["Vary"])
+
+        comprimida = self._get(**{"Accept-Encoding": "gzip"})
+        self.assertEqual(comprimida.headers["Content-Encoding"], "gzip")
+        self.assertIn("Accept-Encoding", comprimida.headers["Vary"])
+        self.assertLess(len(comprimida.get_data()), len(sin_comprimir.get_data()))
+        self.assertEqual(gzip.decompress(comprimida.get_data()), sin_comprimir.get_data())
+        self.assertEqual(
+            comprimida.headers["ETag"],
+            sin_comprimir.headers["ETag"][:-1] + '-gzip"',
+        )
+
+        # El ETag de la representación comprimida también sirve para el 304
+        condicional = self._get(
+            **{"Accept-Encoding": "gzip", "If-None-Match": comprimida.headers["ETag"]}
+        )
+        self.assertEqual(condicional.status_code, 304)
+        self.assertEqual(condicional.headers["ETag"], comprimida.headers["ETag"])
+
+    def test_respuesta_pequena_sin_comprimir(self):
+        resultado = self.client.get(
+            "/usuario", headers=dict(self.headers, **{"Accept-Encoding": "gzip"})
+        )
+        self.assertEqual(resultado.status_code, 200)
+        self.assertNotIn("Content-Encoding", resultado.headers)
+
+    def test_gzip_streaming_ndjson(self):
+        sin_comprimir = self._get(Accept="application/x-ndjson")
+        comprimida = self._get(Accept="application/x-ndjson", **{"Accept-Encoding": "gzip"})
+
+        self.assertEqual(comprimida.headers["Content-Encoding"], "gzip")
+        self.assertNotIn("Content-Length", comprimida.headers)
+        lineas = gzip.decompress(comprimida.get_data()).decode("utf-8").splitlines()
+        self.assertEqual(len(lineas), 30)
+        self.assertEqual(
+            [json.loads(linea) for linea in lineas],
+            [json.loads(linea) for linea in sin_comprimir.get_data(as_text=True).splitlines()],
+        )
+
+    @skipUnless(compresion.brotli is not None, "brotli no está instalado")
+    def test_brotli_preferido(self):
+        sin_comprimir = self._get()
+        comprimida = self._get(**{"Accept-Encoding": "gzip, br"})
+        self.assertEqual(comprimida.headers["Content-Encoding"], "br")
+        self.assertEqual(
+            compresion.brotli.decompress(comprimida.get_data()), sin_comprimir.get_data()
+        )
+
+        comprimida = self._get(**{"Accept-Encoding": "gzip;q=1.0, br;q=0.5"})
+        self.assertEqual(comprimida.headers["Content-Encoding"], "gzip")
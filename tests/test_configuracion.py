@@ -0,0 +1,26 @@
+import os
+from unittest import TestCase, mock
+
+from configuracion import opciones_motor, url_base_datos
+from modelos import db
+
+from tests import app
+
+
+class TestConfiguracion(TestCase):
+    def test_url_postgres_heroku(self):
+        with mock.patch.dict(os.environ, {"DATABASE_URL": "postgres://u:c@servidor/bd"}):
+            self.assertEqual(url_base_datos(), "postgresql://u:c@servidor/bd")
+
+    def test_opciones_pool_postgres(self):
+        with mock.patch.dict(os.environ, {"DB_POOL_SIZE": "12", "DB_POOL_PRE_PING": "False"}):
+            opciones = opciones_motor("postgresql://u:c@servidor/bd")
+        self.assertEqual(opciones["pool_size"], 12)
+        self.assertFalse(opciones["pool_pre_ping"])
+        self.assertEqual(opciones_motor("sqlite:///test.db"), {})
+
+    def test_pragmas_sqlite(self):
+        with app.app_context():
+            with db.engine.connect() as conexion:
+                self.assertEqual(conexion.exec_driver_sql("PRAGMA journal_mode").scalar(), "wal")
+                self.assertEqual(conexion.exec_driver_sql("PRAGMA busy_timeout").scalar(), 5000)
@@ -1,3 +1,4 @@
+import io
 import json
 import hashlib
 from unittest import TestCase
@@ -6,7 +7,7 @@ from faker import Faker
 from faker.generator import random
 from modelos import db, Usuario, Ingrediente, Administrador
 
-from app import app
+from tests import app, contar_consultas
 
 
 class TestIngrediente(TestCase):
@@ -263,3 +264,162 @@ class TestIngrediente(TestCase):
                     self.assertEqual(float(ingrediente['calorias']), float(ingrediente_creado.calorias))
                     self.assertEqual(ingrediente['sitio'], ingrediente_creado.sitio)
                     self.assertEqual(ingrediente['id'], str(ingrediente_creado.id))
+
+    def test_listar_ingredientes_ndjson(self):
+        for i in range(0,3):
+            ingrediente = Ingrediente(nombre = self.data_factory.sentence(),
+                                  unidad=self.data_factory.sentence(),
+                                  calorias=round(random.uniform(0.1, 0.99), 2),
+                                  costo=round(random.uniform(0.1, 0.99), 2),
+                                  sitio=self.data_factory.sentence(),
+                                  administrador_id=self.usuario_id)
+            db.session.add(ingrediente)
+            db.session.commit()
+            self.ingredientes_creados.append(ingrediente)
+
+        endpoint_ingredientes = "/ingredientes"
+        headers = {'Accept': 'application/x-ndjson', "Authorization": "Bearer {}".format(self.token)}
+
+        resultado_consulta_ingrediente = self.client.get(endpoint_ingredientes,
+                                                        headers=headers)
+
+        #Verificar que la respuesta llega como una línea JSON por ingrediente
+        self.assertEqual(resultado_consulta_ingrediente.status_code, 200)
+        self.assertEqual(resultado_consulta_ingrediente.mimetype, 'application/x-ndjson')
+        lineas = resultado_consulta_ingrediente.get_data(as_text=True).splitlines()
+        datos_respuesta = [json.loads(linea) for linea in lineas]
+
+        self.assertEqual([ingrediente['id'] for ingrediente in datos_respuesta],
+                         [str(ingrediente.id) for ingrediente in self.ingredientes_creados])
+        for ingrediente, ingrediente_creado in zip(datos_respuesta, self.ingredientes_creados):
+            self.assertEqual(ingrediente['nombre'], ingrediente_creado.nombre)
+            self.assertEqual(ingrediente['sitio'], ingrediente_creado.sitio)
+
+    def _datos_ingrediente(self):
+        return {
+            "nombre": self.data_factory.sentence(),
+            "unidad": self.data_factory.word(),
+            "costo": round(random.uniform(0.1, 0.99), 2),
+            "calorias": round(random.uniform(0.1, 0.99), 2),
+            "sitio": self.data_factory.word()
+        }
+
+    def test_importar_ingredientes_json(self):
+        ingredientes = [self._datos_ingrediente() for i in range(0,20)]
+
+        endpoint_importar = "/ingredientes/importar"
+        headers = {'Content-Type': 'application/json', "Authorization": "Bearer {}".format(self.token)}
+
+        resultado_importacion = self.client.post(endpoint_importar,
+                                                 data=json.dumps(ingredientes),
+                                                 headers=headers)
+        datos_respuesta = json.loads(resultado_importacion.get_data())
+
+        importados = Ingrediente.query.filter_by(administrador_id=self.usuario_id).all()
+        self.ingredientes_creados.extend(importados)
+
+        #Verificar que se crearon todos los ingredientes con sus datos
+        self.assertEqual(resultado_importacion.status_code, 201)
+        self.assertEqual(datos_respuesta['creados'], 20)
+        self.assertEqual(sorted(ingrediente.nombre for ingrediente in importados),
+                         sorted(ingrediente['nombre'] for ingrediente in ingredientes))
+
+    def test_importar_ingredientes_csv(self):
+        ingredientes = [self._datos_ingrediente() for i in range(0,3)]
+        archivo = "nombre,unidad,costo,calorias,sitio\n" + "".join(
+            '"{nombre}",{unidad},{costo},{calorias},{sitio}\n'.format(**ingrediente)
+            for ingrediente in ingredientes
+        )
+
+        endpoint_importar = "/ingredientes/importar"
+        headers = {"Authorization": "Bearer {}".format(self.token)}
+
+        resultado_importacion = self.client.post(endpoint_importar,
+                                                 data={"archivo": (io.BytesIO(archivo.encode("utf-8")), "ingredientes.csv")},
+                                                 headers=headers,
+                                                 content_type="multipart/form-data")
+
+        importados = Ingrediente.query.filter_by(administrador_id=self.usuario_id).all()
+        self.ingredientes_creados.extend(importados)
+
+        self.assertEqual(resultado_importacion.status_code, 201)
+        self.assertEqual(len(importados), 3)
+        for ingrediente in ingredientes:
+            importado = next(i for i in importados if i.nombre == ingrediente['nombre'])
+            self.assertEqual(float(importado.costo), ingrediente['costo'])
+            self.assertEqual(importado.sitio, ingrediente['sitio'])
+
+    def test_importar_ingredientes_csv_no_utf8(self):
+        archivo = "nombre,unidad,costo,calorias,sitio\nPiñón,gramo,1,1,Plaza\n"
+        headers = {"Authorization": "Bearer {}".format(self.token)}
+
+        resultado_importacion = self.client.post("/ingredientes/importar",
+                                                 data={"archivo": (io.BytesIO(archivo.encode("latin-1")), "ingredientes.csv")},
+                                                 headers=headers,
+                                                 content_type="multipart/form-data")
+
+        self.assertEqual(resultado_importacion.status_code, 400)
+        self.assertIn("UTF-8", resultado_importacion.get_json()["mensaje"])
+        self.assertEqual(Ingrediente.query.filter_by(administrador_id=self.usuario_id).count(), 0)
+
+    def test_importar_ingredientes_errores_por_fila(self):
+        existente = Ingrediente(administrador_id=self.usuario_id, **self._datos_ingrediente())
+        db.session.add(existente)
+        db.session.commit()
+        self.ingredientes_creados.append(existente)
+
+        valido = self._datos_ingrediente()
+        sin_unidad = self._datos_ingrediente()
+        sin_unidad["unidad"] = ""
+        repetido_en_base = self._datos_ingrediente()
+        repetido_en_base["nombre"] = existente.nombre
+        ingredientes = [valido, sin_unidad, repetido_en_base, dict(valido)]
+
+        endpoint_importar = "/ingredientes/importar"
+        headers = {'Content-Type': 'application/json', "Authorization": "Bearer {}".format(self.token)}
+
+        resultado_importacion = self.client.post(endpoint_importar,
+                                                 data=json.dumps(ingredientes),
+                                                 headers=headers)
+        datos_respuesta = json.loads(resultado_importacion.get_data())
+
+        #Verificar que no se creó ningún ingrediente y que se reportó cada fila con error
+        self.assertEqual(resultado_importacion.status_code, 400)
+        self.assertEqual([error['fila'] for error in datos_respuesta['errores']], [2, 3, 4])
+        self.assertIn('unidad', datos_respuesta['errores'][0]['errores'])
+        self.assertIn('nombre', datos_respuesta['errores'][1]['errores'])
+        self.assertIn('nombre', datos_respuesta['errores'][2]['errores'])
+        self.assertEqual(Ingrediente.query.filter_by(administrador_id=self.usuario_id).count(), 1)
+
+    def test_listar_ingredientes_etag(self):
+        headers = {'Content-Type': 'application/json', "Authorization": "Bearer {}".format(self.token)}
+        resultado = self.client.post("/ingredientes", data=json.dumps(self._datos_ingrediente()),
+                                     headers=headers)
+        self.assertEqual(resultado.status_code, 200)
+        self.ingredientes_creados.append(Ingrediente.query.get(int(resultado.get_json()['id'])))
+
+        resultado = self.client.get("/ingredientes", headers=headers)
+        self.assertEqual(resultado.status_code, 200)
+        etag = resultado.headers['ETag']
+
+        #Con el ETag vigente se responde 304 consultando sólo la tabla de versiones
+        with contar_consultas() as consultas:
+            resultado = self.client.get("/ingredientes", headers=dict(headers, **{'If-None-Match': etag}))
+        self.assertEqual(resultado.status_code, 304)
+        self.assertEqual(resultado.headers['ETag'], etag)
+        self.assertEqual(len(consultas), 1)
+        self.assertIn("version_coleccion", consultas[0])
+
+        #Otro tipo de respuesta tiene otro ETag
+        resultado = self.client.get("/ingredientes", headers=dict(headers, Accept='application/x-ndjson',
+                                                                 **{'If-None-Match': etag}))
+        self.assertEqual(resultado.status_code, 200)
+
+        #Una escritura cambia la versión de la colección
+        resultado = self.client.post("/ingredientes", data=json.dumps(self._datos_ingrediente()),
+                                     headers=headers)
+        self.ingredientes_creados.append(Ingrediente.query.get(int(resultado.get_json()['id'])))
+        resultado = self.client.get("/ingredientes", headers=dict(headers, **{'If-None-Match': etag}))
+        self.assertEqual(resultado.status_code, 200)
+        self.assertNotEqual(resultado.headers['ETag'], etag)
+        self.assertEqual(len(resultado.get_json()), 2)
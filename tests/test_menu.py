@@ -1,14 +1,15 @@
 import json
 import hashlib
-from unittest import TestCase
+from unittest import TestCase, mock
 from faker import Faker
 from faker.generator import random
 from datetime import datetime, timedelta
 from sqlalchemy import and_
 
-from modelos import db, Usuario, Administrador, Restaurante, Ingrediente, Receta, RecetaIngrediente, Chef, Menu, MenuReceta
-from app import app
+from modelos import db, Usuario, Administrador, Restaurante, Ingrediente, Receta, RecetaIngrediente, Chef, Menu, MenuReceta, ListaCompraMenu
+from tests import app, contar_consultas
 from vistas import VistaMenu
+from vistas.intervalos import IndiceIntervalos
 
 
 class TestMenu(TestCase):
@@ -188,6 +189,143 @@ class TestMenu(TestCase):
         self.assertEqual(response_status_code, 400)
         self.assertEqual(response_data["mensaje"], "Datos inválidos")
 
+    def test_indice_intervalos(self):
+        base = datetime(2030, 1, 1)
+        indice = IndiceIntervalos([
+            (1, base, base + timedelta(days=2)),
+            (2, base + timedelta(days=10), base + timedelta(days=30)),
+            (3, base + timedelta(days=12), base + timedelta(days=13)),
+        ])
+
+        self.assertTrue(indice.se_superpone(base + timedelta(days=2), base + timedelta(days=3)))
+        self.assertTrue(indice.se_superpone(base + timedelta(days=20), base + timedelta(days=21)))
+        self.assertFalse(indice.se_superpone(base + timedelta(days=3), base + timedelta(days=9)))
+        self.assertFalse(indice.se_superpone(base + timedelta(days=31), base + timedelta(days=40)))
+
+        indice.quitar(2)
+        self.assertFalse(indice.se_superpone(base + timedelta(days=20), base + timedelta(days=21)))
+        indice.agregar(4, base + timedelta(days=19), base + timedelta(days=19))
+        self.assertTrue(indice.se_superpone(base + timedelta(days=18), base + timedelta(days=20)))
+
+    def test_indice_intervalos_igual_a_busqueda_lineal(self):
+        base = datetime(2030, 1, 1)
+        indice = IndiceIntervalos()
+        intervalos = {}
+        for paso in range(300):
+            menu_id = random.randint(1, 40)
+            if random.random() < 0.3:
+                indice.quitar(menu_id)
+                intervalos.pop(menu_id, None)
+            else:
+                inicio = base + timedelta(days=random.randint(0, 200))
+                fin = inicio + timedelta(days=random.randint(0, 15))
+                indice.agregar(menu_id, inicio, fin)
+                intervalos[menu_id] = (inicio, fin)
+
+            inicio = base + timedelta(days=random.randint(0, 220))
+            fin = inicio + timedelta(days=random.randint(0, 5))
+            esperado = any(a <= fin and b >= inicio for a, b in intervalos.values())
+            self.assertEqual(indice.se_superpone(inicio, fin), esperado, paso)
+            self.assertEqual(len(indice), len(intervalos))
+
+    def test_validacion_menu_fechas_superpuestas(self):
+        fecha_inicio = datetime.now().replace(second=0, microsecond=0) + timedelta(days=10)
+        data = {
+            "fecha_inicio": (fecha_inicio + timedelta(days=1)).strftime("%Y-%m-%d %H:%M"),
+            "fecha_fin": (fecha_inicio + timedelta(days=2)).strftime("%Y-%m-%d %H:%M"),
+        }
+        restaurante_id = self.restaurantes_creados[0].id
+        vista_menu = VistaMenu()
+
+        self.assertIsNone(vista_menu._validacion_fechas(data, restaurante_id))
+
+        menu = Menu(
+            nombre="Menu superpuesto",
+            fecha_inicio=fecha_inicio,
+            fecha_fin=fecha_inicio + timedelta(days=3),
+            descripcion="Descripcion",
+            usuario_id=self.admin_id,
+            restaurante_id=restaurante_id,
+            recetas=[]
+        )
+        db.session.add(menu)
+        db.session.commit()
+        self.menus_creadas.append(menu)
+
+        # El índice del restaurante ya estaba cargado y se actualiza con el
+        # commit: la superposición se detecta sin consultar la base de datos
+        with contar_consultas() as consultas:
+            response = vista_menu._validacion_fechas(data, restaurante_id)
+        self.assertEqual(response[1], 400)
+        self.assertEqual(response[0]["mensaje"], "Ya existe un menú con fechas superpuestas en este restaurante")
+        self.assertEqual(consultas, [])
+
+        # Sin superposición en el índice se confirma con una consulta
+        with contar_consultas() as consultas:
+            sin_superposicion = vista_menu._validacion_fechas({
+                "fecha_inicio": (fecha_inicio + timedelta(days=4)).strftime("%Y-%m-%d %H:%M"),
+                "fecha_fin": (fecha_inicio + timedelta(days=5)).strftime("%Y-%m-%d %H:%M"),
+            }, restaurante_id)
+        self.assertIsNone(sin_superposicion)
+        self.assertEqual(len(consultas), 1)
+
+    def test_validacion_menu_creado_por_otro_proceso(self):
+        fecha_inicio = datetime.now().replace(second=0, microsecond=0) + timedelta(days=10)
+        data = {
+            "fecha_inicio": (fecha_inicio + timedelta(days=1)).strftime("%Y-%m-%d %H:%M"),
+            "fecha_fin": (fecha_inicio + timedelta(days=2)).strftime("%Y-%m-%d %H:%M"),
+        }
+        restaurante_id = self.restaurantes_creados[0].id
+        vista_menu = VistaMenu()
+        self.assertIsNone(vista_menu._validacion_fechas(data, restaurante_id))
+
+        # Un insert sin la sesión ORM no pasa por el índice de este proceso,
+        # como un menú creado en otro worker
+        resultado = db.session.execute(Menu.__table__.insert(), {
+            "nombre": "Menu de otro worker",
+            "fecha_inicio": fecha_inicio,
+            "fecha_fin": fecha_inicio + timedelta(days=3),
+            "descripcion": "Descripcion",
+            "usuario_id": self.admin_id,
+            "restaurante_id": restaurante_id,
+        })
+        db.session.commit()
+        self.menus_creadas.append(Menu.query.get(resultado.inserted_primary_key[0]))
+
+        response = vista_menu._validacion_fechas(data, restaurante_id)
+        self.assertEqual(response[1], 400)
+
+    def test_validacion_menu_restaurante_como_texto(self):
+        fecha_inicio = datetime.now().replace(second=0, microsecond=0) + timedelta(days=10)
+        restaurante_id = self.restaurantes_creados[0].id
+        vista_menu = VistaMenu()
+
+        # El índice se carga con el id numérico y el menú llega con el id como
+        # texto, como puede venir en el JSON
+        self.assertIsNone(vista_menu._validacion_fechas({
+            "fecha_inicio": (fecha_inicio + timedelta(days=1)).strftime("%Y-%m-%d %H:%M"),
+            "fecha_fin": (fecha_inicio + timedelta(days=2)).strftime("%Y-%m-%d %H:%M"),
+        }, restaurante_id))
+        menu = Menu(
+            nombre="Menu con id de texto",
+            fecha_inicio=fecha_inicio,
+            fecha_fin=fecha_inicio + timedelta(days=3),
+            descripcion="Descripcion",
+            usuario_id=self.admin_id,
+            restaurante_id=str(restaurante_id),
+            recetas=[]
+        )
+        db.session.add(menu)
+        db.session.commit()
+        self.menus_creadas.append(menu)
+
+        for restaurante in (restaurante_id, str(restaurante_id)):
+            response = vista_menu._validacion_fechas({
+                "fecha_inicio": (fecha_inicio + timedelta(days=1)).strftime("%Y-%m-%d %H:%M"),
+                "fecha_fin": (fecha_inicio + timedelta(days=2)).strftime("%Y-%m-%d %H:%M"),
+            }, restaurante)
+            self.assertEqual(response[1], 400)
+
     def test_crear_menu(self):
 
         current_datetime = datetime.now()
@@ -279,6 +417,38 @@ class TestMenu(TestCase):
                     self.assertEqual(menu['restaurante_id'], menu_creado.restaurante_id)
 
 
+    def test_listar_menus_paginado(self):
+        fecha_base = datetime(2030, 1, 1, 12, 0)
+        for i in range(5):
+            menu = Menu(
+                nombre="Menu paginado " + str(i),
+                # Dos menús comparten fecha de inicio para probar el desempate por id
+                fecha_inicio=fecha_base + timedelta(days=i // 2),
+                fecha_fin=fecha_base + timedelta(days=i // 2, hours=2),
+                descripcion="Descripcion",
+                usuario_id=self.admin_id,
+                restaurante_id=self.restaurantes_creados[0].id,
+                recetas=[]
+            )
+            db.session.add(menu)
+            db.session.commit()
+            self.menus_creadas.append(menu)
+
+        headers = {'Content-Type': 'application/json', "Authorization": "Bearer {}".format(self.token_admin)}
+        endpoint_menus = "/menus/" + str(self.restaurantes_creados[0].id) + "?limit=2"
+        ids_listados = []
+        while endpoint_menus:
+            resultado = self.client.get(endpoint_menus, headers=headers)
+            self.assertEqual(resultado.status_code, 200)
+            ids_listados.extend(menu["id"] for menu in json.loads(resultado.get_data()))
+            cursor = resultado.headers.get("X-Siguiente-Cursor")
+            endpoint_menus = (
+                "/menus/" + str(self.restaurantes_creados[0].id) + "?limit=2&cursor=" + cursor
+                if cursor else None
+            )
+
+        self.assertEqual(ids_listados, [str(menu.id) for menu in self.menus_creadas])
+
     def test_listar_menus_chefs(self):
         #Generar 10 menus con datos aleatorios
         for i in range(0,10):
@@ -351,6 +521,51 @@ class TestMenu(TestCase):
         self.assertEqual(ingredientes_resultado, "Cálculo correcto")
         self.assertEqual(ingredientes_receta[self.nombre_ingrediente]["cantidad"], 4)
 
+    def _contar_consultas_reporte(self, data, headers):
+        with contar_consultas() as consultas:
+            resultado = self.client.post("/reporte", data=json.dumps(data), headers=headers)
+        return resultado, len(consultas)
+
+    def test_reporte_compra_varias_recetas_consultas_constantes(self):
+        ingrediente = self.ingredientes_creados[0]
+        for i in range(5):
+            receta = Receta(
+                nombre="Receta reporte " + str(i),
+                duracion=10,
+                porcion=2,
+                preparacion=self.data_factory.paragraph(nb_sentences=1),
+                usuario=self.admin_id,
+                ingredientes=[RecetaIngrediente(cantidad=3, ingrediente=ingrediente.id)]
+            )
+            db.session.add(receta)
+            db.session.commit()
+            self.recetas_creadas.append(receta)
+
+        headers = {
+            "Content-Type": "application/json",
+            "Authorization": "Bearer {}".format(self.token_admin),
+        }
+
+        una_receta = {"recetas": [{"numero_personas": 20, "receta": self.recetas_creadas[0].id}]}
+        todas_las_recetas = {
+            "recetas": [
+                {"numero_personas": 3, "receta": receta.id} for receta in self.recetas_creadas
+            ]
+        }
+
+        _, consultas_una = self._contar_consultas_reporte(una_receta, headers)
+        resultado, consultas_todas = self._contar_consultas_reporte(todas_las_recetas, headers)
+
+        self.assertEqual(resultado.status_code, 200)
+        self.assertEqual(consultas_una, consultas_todas)
+
+        reporte = json.loads(resultado.get_data())["ingredientes_receta"][self.nombre_ingrediente]
+        # Receta original: ceil(1 * 3 / 5) = 1; cada receta nueva: ceil(3 * 3 / 2) = 5
+        self.assertEqual(reporte["cantidad"], 1 + 5 * 5)
+        self.assertEqual(reporte["costo"], 100.0 * (1 + 5 * 5))
+        self.assertEqual(len(reporte["recetas"]), 6)
+        self.assertEqual(reporte["recetas"][0], self.recetas_creadas[0].nombre)
+
     def test_reporte_compra_receta_inexistente(self):
         data = {
             "recetas": [
@@ -367,7 +582,231 @@ class TestMenu(TestCase):
         resultado_reporte = self.client.post(endpoint_chefs, data=json.dumps(data), headers=headers)
         self.assertEqual(resultado_reporte.status_code, 400)
 
-    
+
+    def _crear_menu_api(self, nombre, dias_inicio, numero_personas=20, restaurante=None):
+        inicio = datetime.now() + timedelta(days=dias_inicio)
+        data = {
+            "nombre": nombre,
+            "descripcion": "Menú de prueba",
+            "fecha_inicio": inicio.strftime("%Y-%m-%d %H:%M"),
+            "fecha_fin": (inicio + timedelta(days=2)).strftime("%Y-%m-%d %H:%M"),
+            "recetas": [
+                {"numero_personas": numero_personas, "receta": self.recetas_creadas[0].id},
+            ],
+            "restaurante": (restaurante or self.restaurantes_creados[0]).id,
+        }
+        headers = {"Authorization": "Bearer {}".format(self.token_admin)}
+        resultado = self.client.post("/menu", json=data, headers=headers)
+        self.assertEqual(resultado.status_code, 201)
+
+        menu = Menu.query.filter_by(nombre=nombre).first()
+        self.menus_creadas.append(menu)
+        return menu, inicio
+
+    def test_reporte_menu_guardado_al_crear(self):
+        menu, _ = self._crear_menu_api("Menu reporte", 2)
+        self.assertIsNotNone(ListaCompraMenu.query.get(menu.id))
+
+        headers = {"Authorization": "Bearer {}".format(self.token_admin)}
+        resultado = self.client.get("/reporte/menu/{}".format(menu.id), headers=headers)
+        self.assertEqual(resultado.status_code, 200)
+        reporte = resultado.get_json()["ingredientes_receta"][self.nombre_ingrediente]
+        # ceil(1 * 20 / 5) = 4
+        self.assertEqual(reporte["cantidad"], 4)
+        self.assertEqual(reporte["costo"], 400.0)
+
+        # Cambiar el costo del ingrediente vence la lista guardada
+        ingrediente = self.ingredientes_creados[0]
+        self.client.put(
+            "/ingrediente/{}".format(ingrediente.id),
+            json={
+                "nombre": ingrediente.nombre,
+                "unidad": ingrediente.unidad,
+                "costo": 50,
+                "calorias": 10,
+                "sitio": ingrediente.sitio,
+            },
+            headers=headers,
+        )
+        resultado = self.client.get("/reporte/menu/{}".format(menu.id), headers=headers)
+        reporte = resultado.get_json()["ingredientes_receta"][self.nombre_ingrediente]
+        self.assertEqual(reporte["costo"], 200.0)
+
+        resultado_chef = self.client.get(
+            "/reporte/menu/{}".format(menu.id),
+            headers={"Authorization": "Bearer {}".format(self.token_chef)},
+        )
+        self.assertEqual(resultado_chef.status_code, 200)
+
+    def test_reporte_menu_vence_con_receta_de_chef(self):
+        headers_chef = {"Authorization": "Bearer {}".format(self.token_chef)}
+        receta = {
+            "nombre": "Receta del chef",
+            "preparacion": "Mezclar",
+            "duracion": 1,
+            "porcion": 5,
+            "ingredientes": [{"cantidad": 1, "idIngrediente": self.ingredientes_creados[0].id}],
+        }
+        creada = self.client.post(
+            "/recetas/{}".format(self.chef_id), json=receta, headers=headers_chef
+        ).get_json()
+        self.recetas_creadas.insert(0, Receta.query.get(creada["id"]))
+        menu, _ = self._crear_menu_api("Menu del chef", 2)
+
+        ruta = "/reporte/menu/{}".format(menu.id)
+        reporte = self.client.get(ruta, headers=headers_chef).get_json()
+        # ceil(1 * 20 / 5) = 4
+        self.assertEqual(reporte["ingredientes_receta"][self.nombre_ingrediente]["cantidad"], 4)
+
+        # La receta está guardada con el id del chef, pero su cambio vence la
+        # lista guardada con la versión del administrador
+        receta_ingrediente = RecetaIngrediente.query.filter_by(receta=creada["id"]).one()
+        receta["porcion"] = 10
+        receta["ingredientes"] = [
+            {
+                "id": receta_ingrediente.id,
+                "cantidad": 1,
+                "idIngrediente": self.ingredientes_creados[0].id,
+            }
+        ]
+        actualizada = self.client.put(
+            "/receta/{}".format(creada["id"]), json=receta, headers=headers_chef
+        )
+        self.assertEqual(actualizada.status_code, 200)
+        reporte = self.client.get(ruta, headers=headers_chef).get_json()
+        # ceil(1 * 20 / 10) = 2
+        self.assertEqual(reporte["ingredientes_receta"][self.nombre_ingrediente]["cantidad"], 2)
+
+    def test_reporte_menu_guarda_lista_sin_confirmar_la_sesion(self):
+        menu, _ = self._crear_menu_api("Menu vencido", 2)
+        ListaCompraMenu.query.filter_by(menu_id=menu.id).update({"version": -1})
+        db.session.commit()
+
+        headers = {"Authorization": "Bearer {}".format(self.token_admin)}
+        with mock.patch.object(db.session, "commit") as commit:
+            resultado = self.client.get("/reporte/menu/{}".format(menu.id), headers=headers)
+        self.assertEqual(resultado.status_code, 200)
+        commit.assert_not_called()
+
+        db.session.expire_all()
+        self.assertNotEqual(ListaCompraMenu.query.get(menu.id).version, -1)
+
+    def test_reporte_menus_por_rango(self):
+        _, inicio_primero = self._crear_menu_api("Menu semana 1", 2)
+        _, inicio_segundo = self._crear_menu_api("Menu semana 2", 10, numero_personas=10)
+        headers = {"Authorization": "Bearer {}".format(self.token_admin)}
+
+        def reporte(desde, hasta, **parametros):
+            return self.client.get(
+                "/reporte/menus",
+                query_string=dict(
+                    parametros, desde=desde.strftime("%Y-%m-%d"), hasta=hasta.strftime("%Y-%m-%d")
+                ),
+                headers=headers,
+            )
+
+        ambos = reporte(inicio_primero, inicio_segundo).get_json()
+        self.assertEqual(len(ambos["menus"]), 2)
+        # ceil(1 * 20 / 5) + ceil(1 * 10 / 5)
+        self.assertEqual(ambos["ingredientes_receta"][self.nombre_ingrediente]["cantidad"], 4 + 2)
+
+        primero = reporte(
+            inicio_primero, inicio_primero, restaurante=self.restaurantes_creados[0].id
+        ).get_json()
+        self.assertEqual(primero["menus"], [self.menus_creadas[0].id])
+        self.assertEqual(primero["ingredientes_receta"][self.nombre_ingrediente]["cantidad"], 4)
+
+        self.assertEqual(
+            self.client.get("/reporte/menus?desde=ayer", headers=headers).status_code, 400
+        )
+
+    def test_reporte_proveedores_consolidado(self):
+        segundo_restaurante = Restaurante(
+            nombre=self.data_factory.unique.company(),
+            direccion=self.data_factory.address(),
+            telefono=self.data_factory.phone_number(),
+            administrador_id=self.admin_id,
+        )
+        db.session.add(segundo_restaurante)
+        db.session.commit()
+        self.restaurantes_creados.append(segundo_restaurante)
+
+        _, inicio = self._crear_menu_api("Menu cadena 1", 2)
+        self._crear_menu_api("Menu cadena 2", 3, numero_personas=10, restaurante=segundo_restaurante)
+
+        rango = {
+            "desde": inicio.strftime("%Y-%m-%d"),
+            "hasta": (inicio + timedelta(days=7)).strftime("%Y-%m-%d"),
+        }
+        resultado = self.client.get(
+            "/reporte/proveedores",
+            query_string=rango,
+            headers={"Authorization": "Bearer {}".format(self.token_admin)},
+        )
+        self.assertEqual(resultado.status_code, 200)
+        datos = resultado.get_json()
+        self.assertEqual(datos["menus"], 2)
+        self.assertEqual(datos["restaurantes"], 2)
+
+        ingrediente = self.ingredientes_creados[0]
+        # ceil(1 * 20 / 5) + ceil(1 * 10 / 5), igual que /reporte/menus
+        self.assertEqual(
+            datos["proveedores"],
+            [
+                {
+                    "sitio": ingrediente.sitio,
+                    "costo": 600.0,
+                    "ingredientes": [
+                        {
+                            "id": ingrediente.id,
+                            "nombre": ingrediente.nombre,
+                            "unidad": ingrediente.unidad,
+                            "cantidad": 6,
+                            "costo": 600.0,
+                        }
+                    ],
+                }
+            ],
+        )
+
+        resultado_chef = self.client.get(
+            "/reporte/proveedores",
+            query_string=rango,
+            headers={"Authorization": "Bearer {}".format(self.token_chef)},
+        )
+        self.assertEqual(resultado_chef.status_code, 403)
+
+    def test_reporte_proveedores_omite_recetas_sin_porcion(self):
+        _, inicio = self._crear_menu_api("Menu sin porcion", 2)
+        sin_porcion = Receta(
+            nombre=self.data_factory.sentence(nb_words=3),
+            duracion=1,
+            porcion=0,
+            preparacion=self.data_factory.paragraph(nb_sentences=1),
+            usuario=self.admin_id,
+            ingredientes=[RecetaIngrediente(cantidad=1, ingrediente=self.ingredientes_creados[0].id)],
+        )
+        db.session.add(sin_porcion)
+        db.session.flush()
+        db.session.add(
+            MenuReceta(numero_personas=10, receta=sin_porcion.id, menu=self.menus_creadas[0].id)
+        )
+        db.session.commit()
+        self.recetas_creadas.append(sin_porcion)
+
+        resultado = self.client.get(
+            "/reporte/proveedores",
+            query_string={
+                "desde": inicio.strftime("%Y-%m-%d"),
+                "hasta": (inicio + timedelta(days=7)).strftime("%Y-%m-%d"),
+            },
+            headers={"Authorization": "Bearer {}".format(self.token_admin)},
+        )
+        self.assertEqual(resultado.status_code, 200)
+        ingredientes = resultado.get_json()["proveedores"][0]["ingredientes"]
+        # Sólo cuenta la receta con porción: ceil(1 * 20 / 5) = 4
+        self.assertEqual(ingredientes[0]["cantidad"], 4)
+
     def tearDown(self):
 
         for receta_creada in self.recetas_creadas:
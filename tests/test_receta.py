@@ -0,0 +1,526 @@
+import json
+import hashlib
+from unittest import TestCase
+
+from faker import Faker
+from modelos import db, Administrador, Ingrediente, Receta, RecetaIngrediente
+
+from tests import app, contar_consultas
+
+
+class TestReceta(TestCase):
+    def setUp(self):
+        self.data_factory = Faker()
+        self.client = app.test_client()
+
+        nombre_usuario = "test_" + self.data_factory.name()
+        contrasena = "T1$" + self.data_factory.word()
+        contrasena_encriptada = hashlib.md5(contrasena.encode("utf-8")).hexdigest()
+
+        usuario_nuevo = Administrador(
+            usuario=nombre_usuario, contrasena=contrasena_encriptada
+        )
+        db.session.add(usuario_nuevo)
+        db.session.commit()
+
+        usuario_login = {"usuario": nombre_usuario, "contrasena": contrasena}
+
+        solicitud_login = self.client.post(
+            "/login",
+            data=json.dumps(usuario_login),
+            headers={"Content-Type": "application/json"},
+        )
+
+        respuesta_login = json.loads(solicitud_login.get_data())
+
+        self.token = respuesta_login["token"]
+        self.usuario_id = respuesta_login["id"]
+
+        self.ingredientes_creados = []
+        for costo, calorias in [(2, 100), (5, 30)]:
+            ingrediente = Ingrediente(
+                nombre=self.data_factory.sentence(),
+                unidad=self.data_factory.word(),
+                costo=costo,
+                calorias=calorias,
+                sitio=self.data_factory.word(),
+                administrador_id=self.usuario_id,
+            )
+            db.session.add(ingrediente)
+            db.session.commit()
+            self.ingredientes_creados.append(ingrediente)
+
+        self.recetas_creadas = []
+
+    def tearDown(self):
+        for receta_creada in self.recetas_creadas:
+            receta = Receta.query.get(receta_creada.id)
+            if receta:
+                db.session.delete(receta)
+                db.session.commit()
+
+        usuario_login = Administrador.query.get(self.usuario_id)
+        db.session.delete(usuario_login)
+        db.session.commit()
+
+    def _get_auth_headers(self):
+        return {
+            "Content-Type": "application/json",
+            "Authorization": "Bearer {}".format(self.token),
+        }
+
+    def _crear_receta(self, porcion, cantidades):
+        receta = Receta(
+            nombre=self.data_factory.sentence(nb_words=3),
+            duracion=30,
+            porcion=porcion,
+            preparacion=self.data_factory.paragraph(nb_sentences=2),
+            usuario=self.usuario_id,
+            ingredientes=[
+                RecetaIngrediente(cantidad=cantidad, ingrediente=ingrediente.id)
+                for ingrediente, cantidad in zip(self.ingredientes_creados, cantidades)
+            ],
+        )
+        db.session.add(receta)
+        db.session.commit()
+        self.recetas_creadas.append(receta)
+        return receta
+
+    def _contar_consultas(self, llamado):
+        with contar_consultas() as consultas:
+            resultado = llamado()
+        return resultado, len(consultas)
+
+    def test_listar_recetas(self):
+        receta = self._crear_receta(4, [3, 2])
+        self._crear_receta(2, [1])
+
+        resultado = self.client.get(
+            "/recetas/{}".format(self.usuario_id), headers=self._get_auth_headers()
+        )
+        self.assertEqual(resultado.status_code, 200)
+        recetas = json.loads(resultado.get_data())
+        self.assertEqual(len(recetas), 2)
+
+        receta_listada = next(r for r in recetas if r["id"] == str(receta.id))
+        self.assertEqual(receta_listada["nombre"], receta.nombre)
+        self.assertEqual(len(receta_listada["ingredientes"]), 2)
+        for receta_ingrediente, ingrediente in zip(
+            receta_listada["ingredientes"], self.ingredientes_creados
+        ):
+            self.assertEqual(receta_ingrediente["ingrediente"]["id"], str(ingrediente.id))
+            self.assertEqual(receta_ingrediente["ingrediente"]["nombre"], ingrediente.nombre)
+            self.assertEqual(receta_ingrediente["ingrediente"]["costo"], float(ingrediente.costo))
+
+    def test_listar_recetas_ndjson(self):
+        recetas_creadas = [self._crear_receta(2, [1, 2]) for i in range(3)]
+        ids_esperados = [str(receta.id) for receta in recetas_creadas]
+        headers = dict(self._get_auth_headers(), Accept="application/x-ndjson")
+
+        resultado = self.client.get("/recetas/{}".format(self.usuario_id), headers=headers)
+        self.assertEqual(resultado.status_code, 200)
+        self.assertEqual(resultado.mimetype, "application/x-ndjson")
+
+        recetas = [json.loads(linea) for linea in resultado.get_data(as_text=True).splitlines()]
+        self.assertEqual([receta["id"] for receta in recetas], ids_esperados)
+        for receta in recetas:
+            self.assertEqual(
+                [datos["ingrediente"]["id"] for datos in receta["ingredientes"]],
+                [str(ingrediente.id) for ingrediente in self.ingredientes_creados],
+            )
+
+    def test_listar_recetas_consultas_constantes(self):
+        self._crear_receta(4, [3, 2])
+        endpoint = "/recetas/{}".format(self.usuario_id)
+
+        _, consultas_una = self._contar_consultas(
+            lambda: self.client.get(endpoint, headers=self._get_auth_headers())
+        )
+        for i in range(5):
+            self._crear_receta(2, [1, 1])
+        resultado, consultas_varias = self._contar_consultas(
+            lambda: self.client.get(endpoint, headers=self._get_auth_headers())
+        )
+
+        self.assertEqual(len(json.loads(resultado.get_data())), 6)
+        self.assertEqual(consultas_una, consultas_varias)
+
+    def test_dar_receta(self):
+        receta = self._crear_receta(4, [3, 2])
+        endpoint = "/receta/{}".format(receta.id)
+
+        resultado, consultas = self._contar_consultas(
+            lambda: self.client.get(endpoint, headers=self._get_auth_headers())
+        )
+        self.assertEqual(resultado.status_code, 200)
+        self.assertEqual(consultas, 1)
+
+        datos_respuesta = json.loads(resultado.get_data())
+        self.assertEqual(datos_respuesta["id"], str(receta.id))
+        self.assertEqual(datos_respuesta["nombre"], receta.nombre)
+        self.assertEqual(datos_respuesta["preparacion"], receta.preparacion)
+        self.assertEqual(len(datos_respuesta["ingredientes"]), 2)
+        for receta_ingrediente, ingrediente in zip(
+            datos_respuesta["ingredientes"], self.ingredientes_creados
+        ):
+            self.assertEqual(receta_ingrediente["ingrediente"]["id"], str(ingrediente.id))
+            self.assertEqual(receta_ingrediente["ingrediente"]["unidad"], ingrediente.unidad)
+            self.assertEqual(receta_ingrediente["ingrediente"]["costo"], float(ingrediente.costo))
+
+    def test_dar_receta_server_timing(self):
+        receta = self._crear_receta(4, [3, 2])
+
+        resultado = self.client.get(
+            "/receta/{}".format(receta.id), headers=self._get_auth_headers()
+        )
+        self.assertEqual(resultado.status_code, 200)
+        server_timing = resultado.headers["Server-Timing"]
+        self.assertIn('desc="1 consultas"', server_timing)
+        self.assertIn("serializacion;dur=", server_timing)
+        self.assertIn("handler;dur=", server_timing)
+
+    def test_solicitud_lenta_registra_sql(self):
+        receta = self._crear_receta(4, [3, 2])
+        umbral = app.config["INSTRUMENTACION_UMBRAL_LENTO_MS"]
+        app.config["INSTRUMENTACION_UMBRAL_LENTO_MS"] = 0
+        try:
+            with self.assertLogs("metricas.instrumentacion", "WARNING") as registros:
+                self.client.get(
+                    "/receta/{}".format(receta.id), headers=self._get_auth_headers()
+                )
+        finally:
+            app.config["INSTRUMENTACION_UMBRAL_LENTO_MS"] = umbral
+
+        registro = json.loads(registros.records[-1].getMessage())
+        self.assertEqual(registro["consultas"], 1)
+        self.assertEqual(registro["estado"], 200)
+        self.assertIn("FROM receta", registro["sentencias"][0][0])
+
+    def test_listar_recetas_ndjson_registra_cuerpo(self):
+        for _ in range(3):
+            self._crear_receta(2, [1, 2])
+        headers = dict(self._get_auth_headers(), Accept="application/x-ndjson")
+
+        with self.assertLogs("metricas.instrumentacion", "INFO") as registros:
+            resultado = self.client.get("/recetas/{}".format(self.usuario_id), headers=headers)
+            cuerpo = resultado.get_data()
+            resultado.close()
+
+        # El encabezado sale antes del cuerpo; el registro se hace al terminar
+        # e incluye las consultas hechas mientras se generaba
+        self.assertIn('streaming;desc="cuerpo sin medir"', resultado.headers["Server-Timing"])
+        registro = json.loads(registros.records[-1].getMessage())
+        self.assertTrue(registro["streaming"])
+        self.assertEqual(registro["bytes"], len(cuerpo))
+        consultas_encabezado = int(
+            resultado.headers["Server-Timing"].split('desc="')[1].split(" ")[0]
+        )
+        self.assertGreater(registro["consultas"], consultas_encabezado)
+
+    def test_dar_receta_no_existente(self):
+        resultado = self.client.get("/receta/999999", headers=self._get_auth_headers())
+        self.assertEqual(resultado.status_code, 404)
+
+    def test_costos_recetas(self):
+        receta_a = self._crear_receta(4, [3, 2])
+        receta_b = self._crear_receta(0, [1])
+        receta_vacia = self._crear_receta(2, [])
+
+        resultado = self.client.get(
+            "/recetas/{}/costos".format(self.usuario_id),
+            headers=self._get_auth_headers(),
+        )
+        self.assertEqual(resultado.status_code, 200)
+        costos = {costo["id"]: costo for costo in json.loads(resultado.get_data())}
+
+        self.assertEqual(len(costos), 3)
+
+        costo_a = costos[str(receta_a.id)]
+        self.assertAlmostEqual(costo_a["costo_total"], 3 * 2 + 2 * 5)
+        self.assertAlmostEqual(costo_a["calorias_total"], 3 * 100 + 2 * 30)
+        self.assertAlmostEqual(costo_a["costo_porcion"], (3 * 2 + 2 * 5) / 4)
+        self.assertAlmostEqual(costo_a["calorias_porcion"], (3 * 100 + 2 * 30) / 4)
+
+        costo_b = costos[str(receta_b.id)]
+        self.assertAlmostEqual(costo_b["costo_total"], 2)
+        self.assertIsNone(costo_b["costo_porcion"])
+
+        costo_vacia = costos[str(receta_vacia.id)]
+        self.assertEqual(costo_vacia["costo_total"], 0)
+        self.assertEqual(costo_vacia["calorias_porcion"], 0)
+
+    def test_crear_receta_materializa_totales(self):
+        nueva_receta = {
+            "nombre": self.data_factory.sentence(nb_words=3),
+            "preparacion": self.data_factory.paragraph(nb_sentences=2),
+            "duracion": 20,
+            "porcion": 2,
+            "ingredientes": [
+                {"cantidad": 3, "idIngrediente": self.ingredientes_creados[0].id},
+                {"cantidad": 1, "idIngrediente": self.ingredientes_creados[1].id},
+            ],
+        }
+
+        resultado = self.client.post(
+            "/recetas/{}".format(self.usuario_id),
+            data=json.dumps(nueva_receta),
+            headers=self._get_auth_headers(),
+        )
+        self.assertEqual(resultado.status_code, 200)
+
+        receta = Receta.query.filter_by(nombre=nueva_receta["nombre"]).first()
+        self.recetas_creadas.append(receta)
+        self.assertAlmostEqual(float(receta.costo_total), 3 * 2 + 5)
+        self.assertAlmostEqual(float(receta.calorias_total), 3 * 100 + 30)
+        self.assertAlmostEqual(float(receta.costo_porcion), (3 * 2 + 5) / 2)
+        self.assertAlmostEqual(float(receta.calorias_porcion), (3 * 100 + 30) / 2)
+
+    def test_editar_ingrediente_actualiza_totales(self):
+        resultado = self.client.post(
+            "/recetas/{}".format(self.usuario_id),
+            data=json.dumps(
+                {
+                    "nombre": "Receta con ingrediente editado",
+                    "preparacion": "Mezclar",
+                    "duracion": 20,
+                    "porcion": 4,
+                    "ingredientes": [
+                        {"cantidad": 2, "idIngrediente": self.ingredientes_creados[0].id},
+                        {"cantidad": 1, "idIngrediente": self.ingredientes_creados[1].id},
+                    ],
+                }
+            ),
+            headers=self._get_auth_headers(),
+        )
+        self.assertEqual(resultado.status_code, 200)
+        receta = Receta.query.filter_by(nombre="Receta con ingrediente editado").first()
+        self.recetas_creadas.append(receta)
+        receta_sin_ingrediente = self._crear_receta(1, [])
+        receta_sin_ingrediente.costo_total = 0
+        db.session.commit()
+
+        ingrediente = self.ingredientes_creados[0]
+        resultado = self.client.put(
+            "/ingrediente/{}".format(ingrediente.id),
+            data=json.dumps(
+                {
+                    "nombre": ingrediente.nombre,
+                    "unidad": ingrediente.unidad,
+                    "costo": 10,
+                    "calorias": 50,
+                    "sitio": ingrediente.sitio,
+                }
+            ),
+            headers=self._get_auth_headers(),
+        )
+        self.assertEqual(resultado.status_code, 200)
+
+        receta = Receta.query.get(receta.id)
+        self.assertAlmostEqual(float(receta.costo_total), 2 * 10 + 5)
+        self.assertAlmostEqual(float(receta.calorias_total), 2 * 50 + 30)
+        self.assertAlmostEqual(float(receta.costo_porcion), (2 * 10 + 5) / 4)
+        self.assertAlmostEqual(float(receta.calorias_porcion), (2 * 50 + 30) / 4)
+        self.assertEqual(float(Receta.query.get(receta_sin_ingrediente.id).costo_total), 0)
+
+    def _datos_receta_lote(self, cantidades):
+        return {
+            "nombre": self.data_factory.sentence(nb_words=3),
+            "preparacion": self.data_factory.paragraph(nb_sentences=2),
+            "duracion": 15,
+            "porcion": 2,
+            "ingredientes": [
+                {"cantidad": cantidad, "idIngrediente": ingrediente.id}
+                for ingrediente, cantidad in zip(self.ingredientes_creados, cantidades)
+            ],
+        }
+
+    def test_crear_recetas_lote(self):
+        recetas = [self._datos_receta_lote([i + 1, 1]) for i in range(20)]
+
+        resultado = self.client.post(
+            "/recetas/{}/lote".format(self.usuario_id),
+            data=json.dumps(recetas),
+            headers=self._get_auth_headers(),
+        )
+        self.assertEqual(resultado.status_code, 201)
+        ids = json.loads(resultado.get_data())["ids"]
+        self.assertEqual(len(ids), 20)
+
+        for id_receta, datos in zip(ids, recetas):
+            receta = Receta.query.get(id_receta)
+            self.recetas_creadas.append(receta)
+            self.assertEqual(receta.nombre, datos["nombre"])
+            self.assertEqual(receta.usuario, self.usuario_id)
+            self.assertEqual(len(receta.ingredientes), 2)
+            cantidad = datos["ingredientes"][0]["cantidad"]
+            self.assertAlmostEqual(float(receta.costo_total), cantidad * 2 + 5)
+
+    def test_crear_recetas_lote_ingrediente_inexistente(self):
+        receta_invalida = self._datos_receta_lote([1])
+        receta_invalida["ingredientes"].append({"cantidad": 1, "idIngrediente": 999999})
+        recetas = [self._datos_receta_lote([1, 1]), receta_invalida, {"nombre": "x"}]
+
+        resultado = self.client.post(
+            "/recetas/{}/lote".format(self.usuario_id),
+            data=json.dumps(recetas),
+            headers=self._get_auth_headers(),
+        )
+        self.assertEqual(resultado.status_code, 400)
+        errores = json.loads(resultado.get_data())["errores"]
+        self.assertEqual([error["receta"] for error in errores], [3])
+        self.assertIn("porcion", errores[0]["errores"])
+
+        resultado = self.client.post(
+            "/recetas/{}/lote".format(self.usuario_id),
+            data=json.dumps(recetas[:2]),
+            headers=self._get_auth_headers(),
+        )
+        self.assertEqual(resultado.status_code, 400)
+        errores = json.loads(resultado.get_data())["errores"]
+        self.assertEqual([error["receta"] for error in errores], [2])
+        self.assertEqual(Receta.query.filter_by(usuario=self.usuario_id).count(), 0)
+
+    def test_crear_recetas_lote_ingrediente_ajeno(self):
+        otro_administrador = Administrador(usuario="test_" + self.data_factory.name(), contrasena="x")
+        db.session.add(otro_administrador)
+        db.session.commit()
+        ajeno = Ingrediente(
+            nombre=self.data_factory.sentence(),
+            unidad="gramo",
+            costo=1,
+            calorias=1,
+            sitio="Plaza",
+            administrador_id=otro_administrador.id,
+        )
+        db.session.add(ajeno)
+        db.session.commit()
+
+        try:
+            receta = self._datos_receta_lote([1])
+            receta["ingredientes"].append({"cantidad": 1, "idIngrediente": ajeno.id})
+            resultado = self.client.post(
+                "/recetas/{}/lote".format(self.usuario_id),
+                data=json.dumps([receta]),
+                headers=self._get_auth_headers(),
+            )
+            self.assertEqual(resultado.status_code, 400)
+            errores = json.loads(resultado.get_data())["errores"]
+            self.assertIn(str(ajeno.id), errores[0]["errores"]["ingredientes"][0])
+            self.assertEqual(Receta.query.filter_by(usuario=self.usuario_id).count(), 0)
+        finally:
+            db.session.delete(ajeno)
+            db.session.delete(otro_administrador)
+            db.session.commit()
+
+    def test_costos_receta(self):
+        receta = self._crear_receta(2, [1, 1])
+
+        resultado = self.client.get(
+            "/receta/{}/costos".format(receta.id), headers=self._get_auth_headers()
+        )
+        self.assertEqual(resultado.status_code, 200)
+        costo = json.loads(resultado.get_data())
+        self.assertAlmostEqual(costo["costo_total"], 7)
+        self.assertAlmostEqual(costo["calorias_porcion"], 65)
+
+        resultado = self.client.get(
+            "/receta/999999/costos", headers=self._get_auth_headers()
+        )
+        self.assertEqual(resultado.status_code, 404)
+
+    def test_editar_receta_sincroniza_ingredientes(self):
+        receta = self._crear_receta(2, [1, 3])
+        conservado = receta.ingredientes[0].id
+        datos = {
+            "nombre": "Receta editada",
+            "preparacion": "Hornear",
+            "duracion": 45,
+            "porcion": 2,
+            "ingredientes": [
+                {
+                    "id": conservado,
+                    "cantidad": 4,
+                    "idIngrediente": self.ingredientes_creados[0].id,
+                },
+                {"id": "", "cantidad": 2, "idIngrediente": self.ingredientes_creados[1].id},
+            ],
+        }
+
+        resultado = self.client.put(
+            "/receta/{}".format(receta.id),
+            data=json.dumps(datos),
+            headers=self._get_auth_headers(),
+        )
+        self.assertEqual(resultado.status_code, 200)
+
+        filas = {
+            fila.ingrediente: fila
+            for fila in RecetaIngrediente.query.filter_by(receta=receta.id)
+        }
+        self.assertEqual(RecetaIngrediente.query.filter_by(receta=receta.id).count(), 2)
+        self.assertEqual(filas[self.ingredientes_creados[0].id].id, conservado)
+        self.assertEqual(float(filas[self.ingredientes_creados[0].id].cantidad), 4)
+        self.assertEqual(float(filas[self.ingredientes_creados[1].id].cantidad), 2)
+
+        receta = Receta.query.get(receta.id)
+        self.assertEqual(receta.nombre, "Receta editada")
+        self.assertAlmostEqual(float(receta.costo_total), 4 * 2 + 2 * 5)
+        self.assertAlmostEqual(float(receta.calorias_porcion), (4 * 100 + 2 * 30) / 2)
+
+    def test_editar_receta_ingrediente_ajeno(self):
+        receta = self._crear_receta(2, [1])
+        otra_receta = self._crear_receta(2, [1])
+        datos = {
+            "nombre": "No se guarda",
+            "preparacion": "Hornear",
+            "duracion": 45,
+            "porcion": 2,
+            "ingredientes": [
+                {
+                    "id": otra_receta.ingredientes[0].id,
+                    "cantidad": 4,
+                    "idIngrediente": self.ingredientes_creados[0].id,
+                },
+            ],
+        }
+
+        resultado = self.client.put(
+            "/receta/{}".format(receta.id),
+            data=json.dumps(datos),
+            headers=self._get_auth_headers(),
+        )
+        self.assertEqual(resultado.status_code, 400)
+        self.assertNotEqual(Receta.query.get(receta.id).nombre, "No se guarda")
+        self.assertEqual(RecetaIngrediente.query.filter_by(receta=receta.id).count(), 1)
+
+    def test_listar_recetas_etag_cambia_con_ingrediente(self):
+        self._crear_receta(2, [1, 1])
+        endpoint = "/recetas/{}".format(self.usuario_id)
+
+        resultado = self.client.get(endpoint, headers=self._get_auth_headers())
+        etag = resultado.headers["ETag"]
+        resultado = self.client.get(
+            endpoint, headers=dict(self._get_auth_headers(), **{"If-None-Match": etag})
+        )
+        self.assertEqual(resultado.status_code, 304)
+
+        ingrediente = self.ingredientes_creados[0]
+        self.client.put(
+            "/ingrediente/{}".format(ingrediente.id),
+            data=json.dumps(
+                {
+                    "nombre": ingrediente.nombre,
+                    "unidad": ingrediente.unidad,
+                    "costo": 8,
+                    "calorias": 100,
+                    "sitio": ingrediente.sitio,
+                }
+            ),
+            headers=self._get_auth_headers(),
+        )
+
+        resultado = self.client.get(
+            endpoint, headers=dict(self._get_auth_headers(), **{"If-None-Match": etag})
+        )
+        self.assertEqual(resultado.status_code, 200)
+        self.assertNotEqual(resultado.headers["ETag"], etag)
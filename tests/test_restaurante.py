@@ -1,10 +1,12 @@
+import base64
 import json
 import hashlib
+from datetime import datetime
 from unittest import TestCase
 
 from faker import Faker
-from modelos import db, Usuario, Administrador, Restaurante
-from app import app
+from modelos import db, Usuario, Administrador, Chef, Menu, Restaurante, RestauranteSchema
+from tests import app, contar_consultas
 
 
 class TestRestaurante(TestCase):
@@ -137,6 +139,74 @@ class TestRestaurante(TestCase):
         print(len(json.loads(resultados_restaurantes.get_data())))
         self.assertEqual(10, len(json.loads(resultados_restaurantes.get_data())))
 
+    def _listar_contando_consultas(self, parametros=""):
+        with contar_consultas() as consultas:
+            resultado = self.client.get(
+                f"/restaurantes/{self.usuario_id}{parametros}",
+                headers=self._get_auth_headers(),
+            )
+        return resultado.get_json(), len(consultas)
+
+    def test_listar_restaurantes_consultas_constantes(self):
+        relacionados = []
+        conteos_consultas = []
+        try:
+            for cantidad in (2, 6):
+                while len(self.restaurantes_creados) < cantidad:
+                    restaurante = Restaurante(
+                        nombre=self.data_factory.unique.company(),
+                        direccion="Direccion Ejemplo",
+                        telefono="1234567890",
+                        administrador_id=self.usuario_id,
+                    )
+                    db.session.add(restaurante)
+                    db.session.flush()
+                    self.restaurantes_creados.append(restaurante)
+                    for numero in range(len(self.restaurantes_creados) % 3):
+                        relacionados.append(
+                            Chef(
+                                usuario=self.data_factory.unique.user_name(),
+                                nombre="Chef",
+                                restaurante_id=restaurante.id,
+                            )
+                        )
+                        relacionados.append(
+                            Menu(
+                                nombre="Menú {}".format(numero),
+                                fecha_inicio=datetime(2030, 1, 1),
+                                fecha_fin=datetime(2030, 1, 7),
+                                descripcion="Menú",
+                                restaurante_id=restaurante.id,
+                            )
+                        )
+                db.session.add_all(relacionados)
+                db.session.commit()
+
+                datos, consultas = self._listar_contando_consultas()
+                conteos_consultas.append(consultas)
+
+            esperados = {
+                restaurante.id: RestauranteSchema().dump(restaurante)
+                for restaurante in self.restaurantes_creados
+            }
+            # Mismo JSON que el schema, con las llaves en el mismo orden
+            self.assertEqual(
+                json.dumps(datos),
+                json.dumps([esperados[fila["id"]] for fila in datos]),
+            )
+            self.assertEqual(conteos_consultas[0], conteos_consultas[1])
+
+            datos, consultas = self._listar_contando_consultas("?expandir=conteos")
+            self.assertEqual(consultas, conteos_consultas[0])
+            for fila in datos:
+                self.assertNotIn("chefs", fila)
+                self.assertEqual(fila["conteo_chefs"], len(esperados[fila["id"]]["chefs"]))
+                self.assertEqual(fila["conteo_menus"], len(esperados[fila["id"]]["menus"]))
+        finally:
+            for objeto in relacionados:
+                db.session.delete(objeto)
+            db.session.commit()
+
     def test_listar_restaurantes_alfabeticamente(self):
         restaurantes_prueba = []
         for i in range(5):
@@ -167,6 +237,63 @@ class TestRestaurante(TestCase):
                 restaurantes_prueba[i].nombre, restaurantes_listados[i]["nombre"]
             )
 
+    def test_listar_restaurantes_paginado(self):
+        for i in range(7):
+            restaurante = Restaurante(
+                nombre="Paginado " + self.data_factory.name(),
+                direccion="Direccion Ejemplo",
+                telefono="1234567890",
+                administrador_id=self.usuario_id,
+            )
+            db.session.add(restaurante)
+            db.session.commit()
+            self.restaurantes_creados.append(restaurante)
+
+        nombres_esperados = sorted(
+            (restaurante.nombre, restaurante.id) for restaurante in self.restaurantes_creados
+        )
+
+        endpoint_restaurantes = f"/restaurantes/{self.usuario_id}?limit=3"
+        nombres_listados = []
+        paginas = 0
+        while endpoint_restaurantes:
+            resultado = self.client.get(
+                endpoint_restaurantes, headers=self._get_auth_headers()
+            )
+            self.assertEqual(resultado.status_code, 200)
+            pagina = json.loads(resultado.get_data())
+            self.assertLessEqual(len(pagina), 3)
+            nombres_listados.extend(restaurante["nombre"] for restaurante in pagina)
+            paginas += 1
+
+            cursor = resultado.headers.get("X-Siguiente-Cursor")
+            endpoint_restaurantes = (
+                f"/restaurantes/{self.usuario_id}?limit=3&cursor={cursor}"
+                if cursor
+                else None
+            )
+
+        self.assertEqual(paginas, 3)
+        self.assertEqual(nombres_listados, [nombre for nombre, _ in nombres_esperados])
+
+    def test_listar_restaurantes_cursor_invalido(self):
+        resultado = self.client.get(
+            f"/restaurantes/{self.usuario_id}?limit=3&cursor=no-es-un-cursor",
+            headers=self._get_auth_headers(),
+        )
+        self.assertEqual(resultado.status_code, 400)
+        self.assertEqual(json.loads(resultado.get_data())["mensaje"], "Cursor inválido")
+
+    def test_listar_restaurantes_cursor_no_escalar(self):
+        for valores in ([["a"], 1], [{"nombre": "a"}, 1], ["a", "1"]):
+            cursor = base64.urlsafe_b64encode(json.dumps(valores).encode("utf-8")).decode("ascii")
+            resultado = self.client.get(
+                f"/restaurantes/{self.usuario_id}?limit=3&cursor={cursor}",
+                headers=self._get_auth_headers(),
+            )
+            self.assertEqual(resultado.status_code, 400)
+            self.assertEqual(json.loads(resultado.get_data())["mensaje"], "Cursor inválido")
+
     def test_editar_restaurante(self):
         # 1. Crear un restaurante de prueba.
         restaurante_prueba = Restaurante(
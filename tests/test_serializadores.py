@@ -0,0 +1,146 @@
+import json
+import hashlib
+from datetime import datetime, timedelta
+from unittest import TestCase
+
+from faker import Faker
+from marshmallow import Schema, fields, post_dump
+from modelos import (
+    db,
+    Administrador,
+    Chef,
+    ChefSchema,
+    Ingrediente,
+    IngredienteSchema,
+    Menu,
+    MenuSchema,
+    Receta,
+    RecetaIngrediente,
+    RecetaSchema,
+    Restaurante,
+    RestauranteSchema,
+)
+
+from tests import app
+from vistas.serializadores import compilar_serializador
+
+
+class TestSerializadores(TestCase):
+    def setUp(self):
+        self.data_factory = Faker()
+
+        self.administrador = Administrador(
+            usuario="admin_" + self.data_factory.name(),
+            contrasena=hashlib.md5(b"clave").hexdigest(),
+        )
+        db.session.add(self.administrador)
+        db.session.commit()
+
+        self.ingrediente = Ingrediente(
+            nombre=self.data_factory.word(),
+            unidad=self.data_factory.word(),
+            costo=12.5,
+            calorias=80,
+            sitio=self.data_factory.word(),
+            administrador_id=self.administrador.id,
+        )
+        self.restaurante = Restaurante(
+            nombre=self.data_factory.name(),
+            direccion=self.data_factory.address(),
+            telefono=self.data_factory.phone_number(),
+            administrador_id=self.administrador.id,
+        )
+        db.session.add_all([self.ingrediente, self.restaurante])
+        db.session.commit()
+
+        self.receta = Receta(
+            nombre=self.data_factory.sentence(),
+            duracion=30,
+            porcion=4,
+            preparacion=self.data_factory.paragraph(),
+            usuario=self.administrador.id,
+            ingredientes=[
+                RecetaIngrediente(cantidad=3, ingrediente=self.ingrediente.id)
+            ],
+        )
+        self.chef = Chef(
+            usuario="chef_" + self.data_factory.name(),
+            contrasena=hashlib.md5(b"clave").hexdigest(),
+            nombre=self.data_factory.name(),
+            restaurante_id=self.restaurante.id,
+        )
+        inicio = datetime(2030, 1, 1, 8, 30)
+        self.menu = Menu(
+            nombre=self.data_factory.word(),
+            fecha_inicio=inicio,
+            fecha_fin=inicio + timedelta(days=6),
+            descripcion=self.data_factory.sentence(),
+            restaurante_id=self.restaurante.id,
+        )
+        db.session.add_all([self.receta, self.chef, self.menu])
+        db.session.commit()
+
+    def tearDown(self):
+        db.session.rollback()
+        for objeto in [self.menu, self.chef, self.receta, self.restaurante, self.ingrediente]:
+            db.session.delete(objeto)
+        db.session.commit()
+        db.session.delete(self.administrador)
+        db.session.commit()
+
+    def _assert_igual_a_dump(self, schema, objeto):
+        esperado = json.dumps(schema.dump(objeto))
+        obtenido = json.dumps(compilar_serializador(schema)(objeto))
+        self.assertEqual(obtenido, esperado)
+
+    def test_mismo_resultado_que_dump(self):
+        for schema, objeto in [
+            (IngredienteSchema(), self.ingrediente),
+            (RecetaSchema(), self.receta),
+            (MenuSchema(), self.menu),
+            (ChefSchema(), self.chef),
+            (RestauranteSchema(), self.restaurante),
+        ]:
+            with self.subTest(schema=type(schema).__name__):
+                self._assert_igual_a_dump(schema, objeto)
+
+    def test_valores_nulos(self):
+        for schema, objeto in [
+            (IngredienteSchema(), Ingrediente()),
+            (RecetaSchema(), Receta()),
+            (MenuSchema(), Menu()),
+            (ChefSchema(), Chef()),
+        ]:
+            with self.subTest(schema=type(schema).__name__):
+                self._assert_igual_a_dump(schema, objeto)
+
+    def test_filas_por_columnas(self):
+        fila = (
+            db.session.query(
+                Ingrediente.id,
+                Ingrediente.nombre,
+                Ingrediente.unidad,
+                Ingrediente.costo,
+                Ingrediente.calorias,
+                Ingrediente.sitio,
+            )
+            .filter(Ingrediente.id == self.ingrediente.id)
+            .one()
+        )
+        schema = IngredienteSchema()
+        self.assertEqual(
+            json.dumps(compilar_serializador(schema)(fila)),
+            json.dumps(schema.dump(self.ingrediente)),
+        )
+
+    def test_schema_con_post_dump_usa_dump(self):
+        class EsquemaConHook(Schema):
+            nombre = fields.String()
+
+            @post_dump
+            def mayusculas(self, datos, **kwargs):
+                datos["nombre"] = datos["nombre"].upper()
+                return datos
+
+        schema = EsquemaConHook()
+        self.assertEqual(compilar_serializador(schema), schema.dump)
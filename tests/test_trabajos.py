@@ -0,0 +1,207 @@
+import hashlib
+import json
+import uuid
+from datetime import datetime, timedelta
+from unittest import TestCase, mock
+
+from faker import Faker
+from modelos import db, Administrador, Ingrediente, Receta, RecetaIngrediente, Trabajo
+
+from tests import app
+from vistas.trabajos import proceso_actual, recuperar_trabajos
+
+
+class TestTrabajos(TestCase):
+    def setUp(self):
+        self.data_factory = Faker()
+        self.client = app.test_client()
+
+        nombre_usuario = "test_" + self.data_factory.name()
+        contrasena = "T1$" + self.data_factory.word()
+        administrador = Administrador(
+            usuario=nombre_usuario,
+            contrasena=hashlib.md5(contrasena.encode("utf-8")).hexdigest(),
+        )
+        db.session.add(administrador)
+        db.session.commit()
+        self.usuario_id = administrador.id
+
+        respuesta_login = self.client.post(
+            "/login", json={"usuario": nombre_usuario, "contrasena": contrasena}
+        ).get_json()
+        self.headers = {"Authorization": "Bearer {}".format(respuesta_login["token"])}
+
+        self.ingrediente = Ingrediente(
+            nombre=self.data_factory.unique.word(),
+            unidad="gramo",
+            costo=100,
+            calorias=10,
+            sitio="Plaza",
+            administrador_id=self.usuario_id,
+        )
+        db.session.add(self.ingrediente)
+        db.session.commit()
+
+        self.receta = Receta(
+            nombre=self.data_factory.sentence(nb_words=3),
+            duracion=10,
+            porcion=5,
+            preparacion="Mezclar",
+            usuario=self.usuario_id,
+            ingredientes=[RecetaIngrediente(cantidad=1, ingrediente=self.ingrediente.id)],
+        )
+        db.session.add(self.receta)
+        db.session.commit()
+
+    def tearDown(self):
+        Trabajo.query.filter_by(administrador_id=self.usuario_id).delete()
+        db.session.delete(Receta.query.get(self.receta.id))
+        Ingrediente.query.filter_by(administrador_id=self.usuario_id).delete()
+        db.session.delete(Administrador.query.get(self.usuario_id))
+        db.session.commit()
+
+    def _enviar(self, tipo, parametros):
+        respuesta = self.client.post(
+            "/trabajos", json={"tipo": tipo, "parametros": parametros}, headers=self.headers
+        )
+        app.extensions["trabajos"].esperar(timeout=10)
+        return respuesta
+
+    def test_reporte_compra_en_segundo_plano(self):
+        parametros = {"recetas": [{"numero_personas": 20, "receta": self.receta.id}]}
+        respuesta = self._enviar("reporte_compra", parametros)
+        self.assertEqual(respuesta.status_code, 202)
+        ruta = respuesta.headers["Location"]
+        self.assertEqual(ruta, "/trabajo/{}".format(respuesta.get_json()["id"]))
+
+        estado = self.client.get(ruta, headers=self.headers).get_json()
+        self.assertEqual(estado["estado"], "terminado")
+        self.assertEqual(estado["codigo"], 200)
+
+        resultado = self.client.get(ruta + "/resultado", headers=self.headers)
+        sincrono = self.client.post("/reporte", json=parametros, headers=self.headers)
+        self.assertEqual(resultado.status_code, 200)
+        self.assertEqual(resultado.get_json(), sincrono.get_json())
+
+    def test_importar_ingredientes_en_segundo_plano(self):
+        filas = [
+            {
+                "nombre": self.data_factory.unique.word(),
+                "unidad": "gramo",
+                "costo": 1,
+                "calorias": 2,
+                "sitio": "Plaza",
+            }
+            for _ in range(3)
+        ]
+        respuesta = self._enviar("importar_ingredientes", filas)
+
+        resultado = self.client.get(
+            respuesta.headers["Location"] + "/resultado", headers=self.headers
+        )
+        self.assertEqual(resultado.status_code, 201)
+        self.assertEqual(resultado.get_json()["creados"], 3)
+        self.assertEqual(
+            Ingrediente.query.filter_by(administrador_id=self.usuario_id).count(), 4
+        )
+
+    def test_trabajo_fallido(self):
+        parametros = {"recetas": [{"numero_personas": 2, "receta": self.receta.id}]}
+        with mock.patch(
+            "vistas.trabajos.reporte_compra", side_effect=RuntimeError("detalle interno")
+        ), self.assertLogs("metricas.trabajos", "ERROR"):
+            respuesta = self._enviar("reporte_compra", parametros)
+
+        resultado = self.client.get(
+            respuesta.headers["Location"] + "/resultado", headers=self.headers
+        )
+        self.assertEqual(resultado.status_code, 500)
+        self.assertEqual(resultado.get_json()["mensaje"], "El trabajo falló")
+        self.assertNotIn("detalle interno", resultado.get_json()["error"])
+
+    def test_parametros_invalidos(self):
+        invalidos = [
+            ("reporte_compra", None),
+            ("reporte_compra", {"recetas": [{"receta": self.receta.id}]}),
+            ("importar_ingredientes", []),
+            ("importar_ingredientes", ["texto"]),
+            ("recetas_lote", None),
+            ("recetas_lote", [{"nombre": "Sin campos"}]),
+        ]
+        for tipo, parametros in invalidos:
+            with self.subTest(tipo=tipo, parametros=parametros):
+                respuesta = self._enviar(tipo, parametros)
+                self.assertEqual(respuesta.status_code, 400)
+        self.assertEqual(Trabajo.query.filter_by(administrador_id=self.usuario_id).count(), 0)
+
+    def test_tipo_invalido(self):
+        respuesta = self.client.post(
+            "/trabajos", json={"tipo": "borrar_todo"}, headers=self.headers
+        )
+        self.assertEqual(respuesta.status_code, 400)
+
+    def test_pendiente_y_vencido(self):
+        ahora = datetime.now()
+        trabajo = Trabajo(
+            id="pendiente{}".format(self.usuario_id),
+            tipo="reporte_compra",
+            estado="pendiente",
+            administrador_id=self.usuario_id,
+            parametros="{}",
+            creado=ahora,
+            expira=ahora + timedelta(hours=1),
+            proceso=proceso_actual(),
+        )
+        db.session.add(trabajo)
+        db.session.commit()
+
+        ruta = "/trabajo/{}".format(trabajo.id)
+        resultado = self.client.get(ruta + "/resultado", headers=self.headers)
+        self.assertEqual(resultado.status_code, 202)
+
+        trabajo.expira = ahora - timedelta(seconds=1)
+        db.session.commit()
+        self.assertEqual(self.client.get(ruta, headers=self.headers).status_code, 404)
+
+    def _trabajo_huerfano(self, estado, proceso):
+        ahora = datetime.now()
+        trabajo = Trabajo(
+            id=uuid.uuid4().hex,
+            tipo="reporte_compra",
+            estado=estado,
+            administrador_id=self.usuario_id,
+            parametros=json.dumps(
+                {"recetas": [{"numero_personas": 2, "receta": self.receta.id}]}
+            ),
+            creado=ahora,
+            expira=ahora + timedelta(hours=1),
+            proceso=proceso,
+        )
+        db.session.add(trabajo)
+        db.session.commit()
+        return trabajo.id
+
+    def test_recuperar_trabajos_de_proceso_terminado(self):
+        # Mismo host y pid con otro token: un proceso anterior ya terminado
+        host, pid, _ = proceso_actual().split(":")
+        terminado = "{}:{}:anterior".format(host, pid)
+        pendiente = self._trabajo_huerfano("pendiente", terminado)
+        ejecutando = self._trabajo_huerfano("ejecutando", terminado)
+        otro_host = self._trabajo_huerfano("ejecutando", "otro-host:1:abc")
+
+        cola = app.extensions["trabajos"]
+        for trabajo_id in recuperar_trabajos():
+            cola.enviar(trabajo_id)
+        cola.esperar(timeout=10)
+        db.session.expire_all()
+
+        self.assertEqual(Trabajo.query.get(pendiente).estado, "terminado")
+        self.assertEqual(Trabajo.query.get(pendiente).proceso, proceso_actual())
+        self.assertEqual(Trabajo.query.get(ejecutando).estado, "fallido")
+        self.assertEqual(Trabajo.query.get(otro_host).estado, "ejecutando")
+
+        resultado = self.client.get(
+            "/trabajo/{}/resultado".format(ejecutando), headers=self.headers
+        )
+        self.assertEqual(resultado.status_code, 500)
+        self.assertEqual(recuperar_trabajos(), [])
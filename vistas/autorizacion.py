@@ -0,0 +1,69 @@
+from collections import namedtuple
+
+from flask_jwt_extended import get_jwt, get_jwt_identity
+
+from modelos import Administrador, Chef
+
+ROL_ADMINISTRADOR = "admin"
+ROL_CHEF = "chef"
+
+
+class Llamador(
+    namedtuple("Llamador", ["id", "rol", "administrador_id", "restaurante_id"])
+):
+    @property
+    def es_administrador(self):
+        return self.rol == ROL_ADMINISTRADOR
+
+    @property
+    def es_chef(self):
+        return self.rol == ROL_CHEF
+
+
+# Claims adicionales que VistaLogIn guarda en el token: el rol, el
+# administrador dueño de los datos (el mismo usuario si es administrador) y
+# el restaurante del chef.
+def claims_usuario(id_usuario):
+    if Administrador.query.get(id_usuario):
+        return {
+            "rol": ROL_ADMINISTRADOR,
+            "administrador_id": id_usuario,
+            "restaurante_id": None,
+        }
+
+    chef = Chef.query.get(id_usuario)
+    if chef:
+        restaurante = chef.restaurante
+        return {
+            "rol": ROL_CHEF,
+            "administrador_id": restaurante.administrador_id if restaurante else None,
+            "restaurante_id": chef.restaurante_id,
+        }
+
+    return {"rol": None, "administrador_id": None, "restaurante_id": None}
+
+
+# Resuelve quién hace la solicitud a partir de los claims del token, sin
+# consultar la base de datos. Los tokens emitidos antes de que existieran
+# los claims se resuelven con las consultas de siempre.
+def obtener_llamador():
+    id_usuario = get_jwt_identity()
+    claims = get_jwt()
+    if "rol" not in claims:
+        claims = claims_usuario(id_usuario)
+
+    return Llamador(
+        id=id_usuario,
+        rol=claims["rol"],
+        administrador_id=claims["administrador_id"],
+        restaurante_id=claims["restaurante_id"],
+    )
+
+
+# Administrador dueño de los datos de id_usuario. Si es el mismo usuario del
+# token se usan los claims; si no, se consulta como antes.
+def administrador_de_usuario(id_usuario):
+    llamador = obtener_llamador()
+    if llamador.id == id_usuario:
+        return llamador.administrador_id
+    return claims_usuario(id_usuario)["administrador_id"]
@@ -0,0 +1,59 @@
+import re
+
+from sqlalchemy import func, literal_column
+
+from modelos import db, busqueda
+
+TIPOS_BUSQUEDA = ("receta", "ingrediente")
+LIMITE_BUSQUEDA = 20
+# Pesos de bm25 en el orden de las columnas de la tabla FTS5 (tipo,
+# objeto_id, administrador_id, inquilino, nombre, texto): coincidir en el
+# nombre pesa más que en la preparación o el sitio.
+PESOS_BM25 = (0.0, 0.0, 0.0, 0.0, 10.0, 1.0)
+
+
+# Palabras de la búsqueda; cada una se busca como prefijo y deben estar
+# todas. Sólo se usan caracteres de palabra para que el texto del usuario no
+# se interprete como sintaxis de MATCH o tsquery.
+def terminos_busqueda(texto):
+    return re.findall(r"\w+", texto or "")
+
+
+# Consulta de los resultados del administrador y sus columnas de orden para
+# paginar: (rango, rowid), donde un rango menor es más relevante.
+def consulta_busqueda(administrador_id, terminos, tipo=None):
+    if db.engine.dialect.name == "postgresql":
+        consulta = func.to_tsquery(
+            "spanish", " & ".join("{}:*".format(termino) for termino in terminos)
+        )
+        coincide = busqueda.c.documento.op("@@")(consulta)
+        rango = (-func.ts_rank(busqueda.c.documento, consulta)).label("rango")
+    else:
+        tabla = literal_column("busqueda")
+        coincide = tabla.op("MATCH")(
+            "inquilino:a{} AND {}".format(
+                int(administrador_id),
+                " ".join('"{}"*'.format(termino) for termino in terminos),
+            )
+        )
+        rango = func.bm25(tabla, *PESOS_BM25).label("rango")
+
+    query = db.session.query(
+        busqueda.c.rowid,
+        busqueda.c.tipo,
+        busqueda.c.objeto_id,
+        busqueda.c.nombre,
+        rango,
+    ).filter(coincide, busqueda.c.administrador_id == administrador_id)
+    if tipo is not None:
+        query = query.filter(busqueda.c.tipo == tipo)
+    return query, [rango, busqueda.c.rowid]
+
+
+def serializar_resultado(fila):
+    return {
+        "tipo": fila.tipo,
+        "id": fila.objeto_id,
+        "nombre": fila.nombre,
+        "relevancia": -fila.rango,
+    }
@@ -0,0 +1,218 @@
+import json
+import threading
+import time
+from collections import OrderedDict
+
+from flask import Response, current_app, has_app_context, request
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from .listados import acepta_ndjson
+
+CLAVE_INVALIDACIONES = "cache_invalidaciones"
+MAXIMO_ENTRADAS_POR_DEFECTO = 1024
+TTL_POR_DEFECTO = 60
+
+
+class Estadisticas:
+    def __init__(self):
+        self.aciertos = 0
+        self.fallos = 0
+        self.desalojos = 0
+        self.expirados = 0
+
+    def como_dict(self):
+        return {
+            "aciertos": self.aciertos,
+            "fallos": self.fallos,
+            "desalojos": self.desalojos,
+            "expirados": self.expirados,
+        }
+
+
+# Cache en memoria del proceso con tamaño máximo (LRU) y TTL por entrada.
+# Las entradas se agrupan por (inquilino, colección) para invalidarlas juntas.
+class CacheMemoria:
+    nombre = "memoria"
+
+    def __init__(self, maximo_entradas=MAXIMO_ENTRADAS_POR_DEFECTO, ttl=TTL_POR_DEFECTO):
+        self.maximo_entradas = maximo_entradas
+        self.ttl = ttl
+        self.estadisticas = Estadisticas()
+        self._entradas = OrderedDict()
+        self._grupos = {}
+        self._bloqueo = threading.Lock()
+
+    def __len__(self):
+        return len(self._entradas)
+
+    def _quitar(self, clave):
+        self._entradas.pop(clave, None)
+        grupo = self._grupos.get(clave[:2])
+        if grupo is not None:
+            grupo.discard(clave)
+            if not grupo:
+                del self._grupos[clave[:2]]
+
+    def obtener(self, inquilino, coleccion, detalle):
+        clave = (inquilino, coleccion, detalle)
+        with self._bloqueo:
+            entrada = self._entradas.get(clave)
+            if entrada is None:
+                self.estadisticas.fallos += 1
+                return None
+            if entrada[0] < time.monotonic():
+                self._quitar(clave)
+                self.estadisticas.expirados += 1
+                self.estadisticas.fallos += 1
+                return None
+
+            self._entradas.move_to_end(clave)
+            self.estadisticas.aciertos += 1
+            return entrada[1]
+
+    def guardar(self, inquilino, coleccion, detalle, valor):
+        clave = (inquilino, coleccion, detalle)
+        with self._bloqueo:
+            self._entradas[clave] = (time.monotonic() + self.ttl, valor)
+            self._entradas.move_to_end(clave)
+            self._grupos.setdefault(clave[:2], set()).add(clave)
+            while len(self._entradas) > self.maximo_entradas:
+                self._quitar(next(iter(self._entradas)))
+                self.estadisticas.desalojos += 1
+
+    def invalidar(self, inquilino, coleccion):
+        with self._bloqueo:
+            for clave in list(self._grupos.get((inquilino, coleccion), ())):
+                self._quitar(clave)
+
+    def limpiar(self):
+        with self._bloqueo:
+            self._entradas.clear()
+            self._grupos.clear()
+
+
+# Cache compartida entre procesos sobre un cliente con la interfaz de redis
+# (get, setex, incr). Cada (inquilino, colección) tiene un número de
+# generación que forma parte de la llave: invalidar es incrementarlo y las
+# entradas viejas vencen por TTL. La memoria y el desalojo LRU los maneja el
+# servidor (maxmemory-policy allkeys-lru).
+class CacheCompartida:
+    nombre = "compartida"
+
+    def __init__(self, cliente, ttl=TTL_POR_DEFECTO, prefijo="metricas"):
+        self.cliente = cliente
+        self.ttl = ttl
+        self.prefijo = prefijo
+        self.estadisticas = Estadisticas()
+
+    def _llave_generacion(self, inquilino, coleccion):
+        return "{}:gen:{}:{}".format(self.prefijo, inquilino, coleccion)
+
+    def _llave(self, inquilino, coleccion, detalle):
+        generacion = self.cliente.get(self._llave_generacion(inquilino, coleccion))
+        return "{}:{}:{}:{}:{}".format(
+            self.prefijo, inquilino, coleccion, int(generacion or 0), detalle
+        )
+
+    def obtener(self, inquilino, coleccion, detalle):
+        crudo = self.cliente.get(self._llave(inquilino, coleccion, detalle))
+        if crudo is None:
+            self.estadisticas.fallos += 1
+            return None
+        self.estadisticas.aciertos += 1
+        return json.loads(crudo)
+
+    def guardar(self, inquilino, coleccion, detalle, valor):
+        self.cliente.setex(
+            self._llave(inquilino, coleccion, detalle), self.ttl, json.dumps(valor)
+        )
+
+    def invalidar(self, inquilino, coleccion):
+        self.cliente.incr(self._llave_generacion(inquilino, coleccion))
+
+
+def crear_cache(config):
+    ttl = config.get("CACHE_TTL", TTL_POR_DEFECTO)
+    if config.get("CACHE_BACKEND", "memoria") == "compartida":
+        cliente = config.get("CACHE_CLIENTE")
+        if cliente is None:
+            import redis
+
+            cliente = redis.Redis.from_url(config["CACHE_REDIS_URL"])
+        return CacheCompartida(cliente, ttl)
+
+    return CacheMemoria(config.get("CACHE_MAXIMO_ENTRADAS", MAXIMO_ENTRADAS_POR_DEFECTO), ttl)
+
+
+def registrar_cache(app):
+    app.config.setdefault("CACHE", True)
+    app.extensions["cache"] = crear_cache(app.config) if app.config["CACHE"] else None
+
+
+def cache_actual():
+    return current_app.extensions.get("cache")
+
+
+# Lectura cacheada de un recurso del inquilino. La llave es la versión de la
+# colección, la ruta con sus parámetros y variante, para lo que cambia la
+# respuesta sin estar en la ruta. Con la versión en la llave, una escritura
+# hecha en otro proceso (que sólo invalida su propia cache) también deja de
+# encontrar las entradas anteriores aquí. version se pasa cuando quien llama
+# ya la leyó. Se guarda sólo la respuesta JSON exitosa (datos y encabezados);
+# el streaming NDJSON no se cachea.
+def en_cache(inquilino, coleccion, generar, variante="", version=None):
+    cache = cache_actual()
+    if cache is None or inquilino is None or acepta_ndjson():
+        return generar()
+
+    if version is None:
+        from .versiones import version_coleccion
+
+        version = version_coleccion(inquilino, coleccion)
+    inquilino = str(inquilino)
+    detalle = "{}|{}|{}".format(version, request.full_path, variante)
+    guardado = cache.obtener(inquilino, coleccion, detalle)
+    if guardado is not None:
+        datos, encabezados = guardado
+        return (datos, 200, encabezados) if encabezados else datos
+
+    resultado = generar()
+    if isinstance(resultado, Response):
+        return resultado
+    if isinstance(resultado, tuple):
+        datos, codigo, encabezados = (resultado + (None,))[:3]
+        if codigo == 200:
+            cache.guardar(inquilino, coleccion, detalle, [datos, encabezados])
+        return resultado
+
+    cache.guardar(inquilino, coleccion, detalle, [resultado, None])
+    return resultado
+
+
+# Las invalidaciones que registra versiones.registrar_cambio se aplican
+# cuando la transacción confirma, para que una lectura concurrente no vuelva
+# a guardar los datos anteriores.
+def invalidar_al_confirmar(inquilino, colecciones):
+    from modelos import db
+
+    pendientes = db.session.info.setdefault(CLAVE_INVALIDACIONES, set())
+    pendientes.update((str(inquilino), coleccion) for coleccion in colecciones)
+
+
+@event.listens_for(Session, "after_commit")
+def _aplicar_invalidaciones(session):
+    pendientes = session.info.pop(CLAVE_INVALIDACIONES, None)
+    if not pendientes or not has_app_context():
+        return
+
+    cache = cache_actual()
+    if cache is None:
+        return
+    for inquilino, coleccion in pendientes:
+        cache.invalidar(inquilino, coleccion)
+
+
+@event.listens_for(Session, "after_rollback")
+def _descartar_invalidaciones(session):
+    session.info.pop(CLAVE_INVALIDACIONES, None)
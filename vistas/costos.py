@@ -0,0 +1,190 @@
+from sqlalchemy import case, func, select, update
+
+from modelos import db, Ingrediente, Receta, RecetaIngrediente
+
+COLUMNAS_TOTALES = ("costo_total", "calorias_total", "costo_porcion", "calorias_porcion")
+
+
+def _vector(valores):
+    import numpy as np
+
+    return np.fromiter(
+        (0.0 if valor is None else float(valor) for valor in valores),
+        dtype=np.float64,
+        count=len(valores),
+    )
+
+
+# Arma la matriz dispersa receta x ingrediente (formato coordenado) con las
+# cantidades de RecetaIngrediente y la multiplica por los vectores de costo y
+# calorías de Ingrediente. Retorna {id_receta: totales} para las recetas que
+# cumplen el filtro.
+def calcular_totales_recetas(*filtros):
+    recetas = (
+        db.session.query(Receta.id, Receta.nombre, Receta.porcion)
+        .filter(*filtros)
+        .order_by(Receta.id)
+        .all()
+    )
+    if not recetas:
+        return {}
+
+    entradas = (
+        db.session.query(
+            RecetaIngrediente.receta,
+            RecetaIngrediente.ingrediente,
+            RecetaIngrediente.cantidad,
+            Ingrediente.costo,
+            Ingrediente.calorias,
+        )
+        .join(Receta, Receta.id == RecetaIngrediente.receta)
+        .join(Ingrediente, Ingrediente.id == RecetaIngrediente.ingrediente)
+        .filter(*filtros)
+        .all()
+    )
+
+    # numpy se importa al primer cálculo para no alargar el arranque
+    import numpy as np
+
+    ids_recetas = np.array([receta.id for receta in recetas], dtype=np.int64)
+    totales = np.zeros((len(recetas), 2), dtype=np.float64)
+
+    if entradas:
+        filas = np.searchsorted(
+            ids_recetas, np.array([entrada[0] for entrada in entradas], dtype=np.int64)
+        )
+        ids_ingredientes, columnas = np.unique(
+            np.array([entrada[1] for entrada in entradas], dtype=np.int64),
+            return_inverse=True,
+        )
+        cantidades = _vector([entrada[2] for entrada in entradas])
+
+        precios = np.zeros((len(ids_ingredientes), 2), dtype=np.float64)
+        precios[columnas, 0] = _vector([entrada[3] for entrada in entradas])
+        precios[columnas, 1] = _vector([entrada[4] for entrada in entradas])
+
+        # Producto matriz dispersa por vector: cada entrada aporta
+        # cantidad * precio a la fila de su receta.
+        aportes = cantidades[:, None] * precios[columnas]
+        totales[:, 0] = np.bincount(filas, weights=aportes[:, 0], minlength=len(recetas))
+        totales[:, 1] = np.bincount(filas, weights=aportes[:, 1], minlength=len(recetas))
+
+    porciones = _vector([receta.porcion for receta in recetas])
+    con_porcion = porciones > 0
+    por_porcion = np.full((len(recetas), 2), np.nan)
+    por_porcion[con_porcion] = totales[con_porcion] / porciones[con_porcion, None]
+
+    resultados = {}
+    for indice, receta in enumerate(recetas):
+        resultados[receta.id] = {
+            "id": str(receta.id),
+            "nombre": receta.nombre,
+            "porcion": None if receta.porcion is None else float(receta.porcion),
+            "costo_total": float(totales[indice, 0]),
+            "calorias_total": float(totales[indice, 1]),
+            "costo_porcion": float(por_porcion[indice, 0])
+            if con_porcion[indice]
+            else None,
+            "calorias_porcion": float(por_porcion[indice, 1])
+            if con_porcion[indice]
+            else None,
+        }
+    return resultados
+
+
+# Recalcula con la matriz los totales de las recetas que cumplen el filtro y
+# los guarda en las columnas materializadas de Receta. No hace commit.
+def materializar_totales(*filtros):
+    totales = calcular_totales_recetas(*filtros)
+    db.session.bulk_update_mappings(
+        Receta,
+        [
+            dict(
+                {"id": receta_id},
+                **{columna: total[columna] for columna in COLUMNAS_TOTALES}
+            )
+            for receta_id, total in totales.items()
+        ],
+    )
+    return totales
+
+
+# Lee los totales materializados sin tocar RecetaIngrediente ni Ingrediente.
+# Las recetas que aún no los tienen se calculan sin guardarlos: la lectura no
+# escribe; los totales se materializan al crear o editar la receta y con
+# "flask crear-tablas" para las recetas anteriores.
+def leer_totales_recetas(*filtros):
+    recetas = (
+        db.session.query(
+            Receta.id,
+            Receta.nombre,
+            Receta.porcion,
+            *[getattr(Receta, columna) for columna in COLUMNAS_TOTALES]
+        )
+        .filter(*filtros)
+        .order_by(Receta.id)
+        .all()
+    )
+
+    pendientes = [receta.id for receta in recetas if receta.costo_total is None]
+    calculados = {}
+    if pendientes:
+        calculados = calcular_totales_recetas(Receta.id.in_(pendientes))
+
+    resultados = {}
+    for receta in recetas:
+        if receta.id in calculados:
+            resultados[receta.id] = calculados[receta.id]
+            continue
+
+        resultados[receta.id] = {
+            "id": str(receta.id),
+            "nombre": receta.nombre,
+            "porcion": None if receta.porcion is None else float(receta.porcion),
+        }
+        for columna in COLUMNAS_TOTALES:
+            valor = getattr(receta, columna)
+            resultados[receta.id][columna] = None if valor is None else float(valor)
+    return resultados
+
+
+# Ajusta en una sola sentencia los totales de las recetas que usan el
+# ingrediente: cada una suma cantidad * diferencia de precio. Las recetas que
+# nunca se materializaron se dejan para que se calculen al leerlas.
+def propagar_cambio_ingrediente(id_ingrediente, delta_costo, delta_calorias):
+    if not delta_costo and not delta_calorias:
+        return
+
+    cantidad = (
+        select(func.sum(RecetaIngrediente.cantidad))
+        .where(
+            RecetaIngrediente.receta == Receta.id,
+            RecetaIngrediente.ingrediente == id_ingrediente,
+        )
+        .scalar_subquery()
+    )
+    costo_total = Receta.costo_total + cantidad * delta_costo
+    calorias_total = Receta.calorias_total + cantidad * delta_calorias
+
+    db.session.execute(
+        update(Receta)
+        .where(
+            Receta.id.in_(
+                select(RecetaIngrediente.receta).where(
+                    RecetaIngrediente.ingrediente == id_ingrediente
+                )
+            ),
+            Receta.costo_total.isnot(None),
+        )
+        .values(
+            costo_total=costo_total,
+            calorias_total=calorias_total,
+            costo_porcion=case(
+                (Receta.porcion > 0, costo_total / Receta.porcion), else_=None
+            ),
+            calorias_porcion=case(
+                (Receta.porcion > 0, calorias_total / Receta.porcion), else_=None
+            ),
+        )
+        .execution_options(synchronize_session=False)
+    )
@@ -0,0 +1,197 @@
+import csv
+import io
+
+from modelos import (
+    db,
+    Ingrediente,
+    IngredienteSchema,
+    Receta,
+    RecetaIngrediente,
+    RecetaLoteSchema,
+)
+from .costos import materializar_totales
+from .versiones import INGREDIENTES, RECETAS, registrar_cambio
+
+ingredientes_schema = IngredienteSchema(many=True)
+recetas_lote_schema = RecetaLoteSchema(many=True)
+
+
+# Filas del CSV como diccionarios, o None si el archivo no está en UTF-8 o
+# no se puede leer como CSV.
+def leer_csv(contenido):
+    try:
+        if isinstance(contenido, bytes):
+            contenido = contenido.decode("utf-8-sig")
+        return [dict(fila) for fila in csv.DictReader(io.StringIO(contenido))]
+    except (UnicodeDecodeError, csv.Error):
+        return None
+
+
+def _agregar_error(errores, indice, campo, mensaje):
+    errores.setdefault(indice, {}).setdefault(campo, []).append(mensaje)
+
+
+# Revisa que se haya enviado una lista de objetos. Retorna (respuesta,
+# código) con el error, o None.
+def validar_ingredientes(filas):
+    if not isinstance(filas, list) or not filas:
+        return {"mensaje": "No se enviaron ingredientes"}, 400
+    if not all(isinstance(fila, dict) for fila in filas):
+        return {"mensaje": "Cada ingrediente debe ser un objeto"}, 400
+    return None
+
+
+# Valida todas las filas en una pasada, revisa los nombres repetidos contra
+# los ingredientes del administrador con una sola consulta e inserta todo con
+# un executemany en una única transacción. Si alguna fila tiene errores no se
+# inserta nada. Retorna (respuesta, código).
+def importar_ingredientes(filas, administrador_id):
+    error = validar_ingredientes(filas)
+    if error:
+        return error
+
+    errores = ingredientes_schema.validate(filas, session=db.session)
+
+    nombres = [
+        fila.get("nombre") if isinstance(fila.get("nombre"), str) else None
+        for fila in filas
+    ]
+    existentes = {
+        nombre
+        for (nombre,) in db.session.query(Ingrediente.nombre).filter(
+            Ingrediente.administrador_id == administrador_id,
+            Ingrediente.nombre.in_({nombre for nombre in nombres if nombre}),
+        )
+    }
+    vistos = set()
+    for indice, nombre in enumerate(nombres):
+        if not nombre:
+            continue
+        if nombre in existentes:
+            _agregar_error(
+                errores, indice, "nombre", "El ingrediente ya existe con ese nombre."
+            )
+        elif nombre in vistos:
+            _agregar_error(
+                errores, indice, "nombre", "El ingrediente está repetido en la importación."
+            )
+        vistos.add(nombre)
+
+    if errores:
+        return {
+            "mensaje": "Datos inválidos",
+            "errores": [
+                {"fila": indice + 1, "errores": errores[indice]}
+                for indice in sorted(errores)
+            ],
+        }, 400
+
+    db.session.execute(
+        Ingrediente.__table__.insert(),
+        [
+            {
+                "nombre": fila["nombre"],
+                "unidad": fila["unidad"],
+                "costo": float(fila["costo"]),
+                "calorias": float(fila["calorias"]),
+                "sitio": fila["sitio"],
+                "administrador_id": administrador_id,
+            }
+            for fila in filas
+        ],
+    )
+    registrar_cambio(administrador_id, INGREDIENTES)
+    db.session.commit()
+
+    return {"mensaje": "Ingredientes importados exitosamente", "creados": len(filas)}, 201
+
+
+# Valida el lote contra RecetaLoteSchema sin consultar la base. Retorna
+# (respuesta, código) con los errores por receta, o None.
+def validar_recetas_lote(recetas):
+    if not isinstance(recetas, list) or not recetas:
+        return {"mensaje": "No se enviaron recetas"}, 400
+
+    errores = recetas_lote_schema.validate(recetas)
+    if errores:
+        return {
+            "mensaje": "Datos inválidos",
+            "errores": [
+                {"receta": indice + 1, "errores": errores[indice]}
+                for indice in sorted(errores)
+            ],
+        }, 400
+    return None
+
+
+# Crea un lote de recetas con el mismo formato de VistaRecetas.post. Los
+# idIngrediente de todo el lote se validan con una sola consulta IN y las
+# recetas con sus RecetaIngrediente se insertan en una única transacción.
+# Retorna (respuesta, código) con los ids creados en el orden recibido.
+def crear_recetas_lote(recetas, administrador_id):
+    error = validar_recetas_lote(recetas)
+    if error:
+        return error
+
+    datos = recetas_lote_schema.load(recetas)
+
+    ids_ingredientes = {
+        receta_ingrediente["idIngrediente"]
+        for receta in datos
+        for receta_ingrediente in receta["ingredientes"]
+    }
+    # Sólo cuentan los ingredientes del administrador: los de otro inquilino
+    # se reportan como inexistentes
+    existentes = {
+        id_ingrediente
+        for (id_ingrediente,) in db.session.query(Ingrediente.id).filter(
+            Ingrediente.id.in_(ids_ingredientes),
+            Ingrediente.administrador_id == administrador_id,
+        )
+    }
+
+    errores = []
+    for indice, receta in enumerate(datos):
+        faltantes = sorted(
+            {
+                receta_ingrediente["idIngrediente"]
+                for receta_ingrediente in receta["ingredientes"]
+            }
+            - existentes
+        )
+        if faltantes:
+            mensaje = "No existen los ingredientes " + str(faltantes)
+            errores.append({"receta": indice + 1, "errores": {"ingredientes": [mensaje]}})
+    if errores:
+        return {"mensaje": "Datos inválidos", "errores": errores}, 400
+
+    nuevas_recetas = [
+        Receta(
+            nombre=receta["nombre"],
+            preparacion=receta["preparacion"],
+            duracion=receta["duracion"],
+            porcion=receta["porcion"],
+            usuario=administrador_id,
+        )
+        for receta in datos
+    ]
+    db.session.bulk_save_objects(nuevas_recetas, return_defaults=True)
+
+    filas_ingredientes = [
+        {
+            "receta": nueva_receta.id,
+            "ingrediente": receta_ingrediente["idIngrediente"],
+            "cantidad": receta_ingrediente["cantidad"],
+        }
+        for nueva_receta, receta in zip(nuevas_recetas, datos)
+        for receta_ingrediente in receta["ingredientes"]
+    ]
+    if filas_ingredientes:
+        db.session.execute(RecetaIngrediente.__table__.insert(), filas_ingredientes)
+
+    ids = [nueva_receta.id for nueva_receta in nuevas_recetas]
+    materializar_totales(Receta.id.in_(ids))
+    registrar_cambio(administrador_id, RECETAS)
+    db.session.commit()
+
+    return {"mensaje": "Recetas creadas exitosamente", "ids": ids}, 201
@@ -0,0 +1,189 @@
+import threading
+import time
+from bisect import bisect_left, bisect_right
+
+from flask import current_app
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+
+from modelos import db, Menu
+
+TTL_POR_DEFECTO = 60
+CLAVE_CAMBIOS = "menus_cambiados"
+
+
+# Índice de intervalos [inicio, fin] ordenado por inicio, con el máximo
+# acumulado de fin. Un intervalo nuevo se superpone con alguno existente si,
+# entre los que empiezan antes de que termine, el que más tarde acaba lo hace
+# después de que empieza: una búsqueda binaria, O(log n). Agregar ubica el
+# intervalo con bisect y sólo actualiza los máximos que cambian.
+class IndiceIntervalos:
+    def __init__(self, intervalos=()):
+        self._intervalos = {menu_id: (inicio, fin) for menu_id, inicio, fin in intervalos}
+        self._ordenados = sorted(
+            (inicio, fin, menu_id) for menu_id, (inicio, fin) in self._intervalos.items()
+        )
+        self._inicios = [inicio for inicio, _, _ in self._ordenados]
+        self._max_fin = []
+        self._recalcular_desde(0)
+
+    # Recalcula el máximo acumulado de fin desde la posición indicada
+    def _recalcular_desde(self, posicion):
+        del self._max_fin[posicion:]
+        for _, fin, _ in self._ordenados[posicion:]:
+            self._max_fin.append(max(fin, self._max_fin[-1]) if self._max_fin else fin)
+
+    def __len__(self):
+        return len(self._intervalos)
+
+    def agregar(self, menu_id, inicio, fin):
+        self.quitar(menu_id)
+        self._intervalos[menu_id] = (inicio, fin)
+
+        posicion = bisect_right(self._ordenados, (inicio, fin, menu_id))
+        self._ordenados.insert(posicion, (inicio, fin, menu_id))
+        self._inicios.insert(posicion, inicio)
+        self._max_fin.insert(
+            posicion, max(fin, self._max_fin[posicion - 1]) if posicion else fin
+        )
+        # Los máximos siguientes sólo cambian mientras fin sea mayor
+        for siguiente in range(posicion + 1, len(self._max_fin)):
+            if self._max_fin[siguiente] >= fin:
+                break
+            self._max_fin[siguiente] = fin
+
+    def quitar(self, menu_id):
+        intervalo = self._intervalos.pop(menu_id, None)
+        if intervalo is None:
+            return
+
+        posicion = bisect_left(self._ordenados, intervalo + (menu_id,))
+        del self._ordenados[posicion]
+        del self._inicios[posicion]
+        self._recalcular_desde(posicion)
+
+    def se_superpone(self, inicio, fin):
+        posicion = bisect_right(self._inicios, fin)
+        return posicion > 0 and self._max_fin[posicion - 1] >= inicio
+
+
+_indices = {}
+_bloqueo = threading.Lock()
+
+
+# Los índices se guardan por id numérico: el restaurante llega del JSON como
+# número o como texto ("201") y ambos deben compartir el mismo índice.
+def _llave(restaurante_id):
+    try:
+        return int(restaurante_id)
+    except (TypeError, ValueError):
+        return restaurante_id
+
+
+def _ttl():
+    return current_app.config.get("MENU_INTERVALOS_TTL", TTL_POR_DEFECTO)
+
+
+def _cargar_indice(restaurante_id):
+    intervalos = (
+        db.session.query(Menu.id, Menu.fecha_inicio, Menu.fecha_fin)
+        .filter(Menu.restaurante_id == restaurante_id)
+        .all()
+    )
+    return IndiceIntervalos(intervalos)
+
+
+def existe_superposicion_bd(restaurante_id, fecha_inicio, fecha_fin):
+    return db.session.query(
+        Menu.query.filter(
+            Menu.restaurante_id == restaurante_id,
+            Menu.fecha_inicio <= fecha_fin,
+            Menu.fecha_fin >= fecha_inicio,
+        ).exists()
+    ).scalar()
+
+
+# El índice en memoria del restaurante sólo confirma superposiciones: un
+# menú que ya está en el índice quedó guardado y la API no borra ni mueve
+# menús. Si el índice no encuentra superposición, se confirma con la consulta
+# de existencia, porque otro proceso pudo crear un menú que este índice no
+# conoce. Si el índice no está cargado o venció su TTL se arma con una
+# consulta, fuera del bloqueo, y esa lectura ya responde la pregunta. Con el
+# índice deshabilitado (MENU_INTERVALOS_TTL = 0) sólo se usa la consulta.
+def hay_superposicion(restaurante_id, fecha_inicio, fecha_fin):
+    ttl = _ttl()
+    if not ttl:
+        return existe_superposicion_bd(restaurante_id, fecha_inicio, fecha_fin)
+
+    llave = _llave(restaurante_id)
+    ahora = time.monotonic()
+    with _bloqueo:
+        entrada = _indices.get(llave)
+        vigente = entrada is not None and ahora - entrada[1] <= ttl
+        if vigente and entrada[0].se_superpone(fecha_inicio, fecha_fin):
+            return True
+    if vigente:
+        return existe_superposicion_bd(restaurante_id, fecha_inicio, fecha_fin)
+
+    indice = _cargar_indice(restaurante_id)
+    with _bloqueo:
+        _indices[llave] = (indice, ahora)
+        return indice.se_superpone(fecha_inicio, fecha_fin)
+
+
+def invalidar_indice(restaurante_id=None):
+    with _bloqueo:
+        if restaurante_id is None:
+            _indices.clear()
+        else:
+            _indices.pop(_llave(restaurante_id), None)
+
+
+# Sincronización con las escrituras de Menu: los cambios se anotan en cada
+# flush y se aplican a los índices sólo cuando la transacción confirma.
+@event.listens_for(Session, "after_flush")
+def _anotar_cambios(session, contexto_flush):
+    cambios = session.info.setdefault(CLAVE_CAMBIOS, [])
+    for accion, menus in (
+        ("agregar", session.new),
+        ("invalidar", session.dirty),
+        ("quitar", session.deleted),
+    ):
+        for menu in menus:
+            if isinstance(menu, Menu):
+                # Se lee el estado cargado para no disparar consultas sobre
+                # objetos expirados o ya borrados.
+                valores = inspect(menu).dict
+                cambios.append(
+                    (
+                        accion,
+                        _llave(valores.get("restaurante_id")),
+                        valores.get("id"),
+                        valores.get("fecha_inicio"),
+                        valores.get("fecha_fin"),
+                    )
+                )
+
+
+@event.listens_for(Session, "after_commit")
+def _aplicar_cambios(session):
+    cambios = session.info.pop(CLAVE_CAMBIOS, [])
+    with _bloqueo:
+        for accion, restaurante_id, menu_id, inicio, fin in cambios:
+            if accion == "invalidar" or restaurante_id is None:
+                # Un menú editado pudo cambiar de restaurante o de fechas
+                _indices.clear()
+                return
+
+            entrada = _indices.get(restaurante_id)
+            if entrada is None:
+                continue
+            if accion == "agregar":
+                entrada[0].agregar(menu_id, inicio, fin)
+            else:
+                entrada[0].quitar(menu_id)
+
+
+@event.listens_for(Session, "after_rollback")
+def _descartar_cambios(session):
+    session.info.pop(CLAVE_CAMBIOS, None)
@@ -0,0 +1,195 @@
+import base64
+import binascii
+import json
+from datetime import datetime
+from decimal import Decimal
+from itertools import islice
+
+from flask import Response, request, stream_with_context
+from flask_restful import abort
+from sqlalchemy import DateTime, and_, false, or_
+
+LIMITE_MAXIMO = 500
+ENCABEZADO_CURSOR = "X-Siguiente-Cursor"
+TIPO_NDJSON = "application/x-ndjson"
+TAMANO_LOTE_STREAMING = 500
+
+
+def _codificar_cursor(valores):
+    crudo = json.dumps(
+        [valor.isoformat() if isinstance(valor, datetime) else valor for valor in valores],
+        separators=(",", ":"),
+    )
+    return base64.urlsafe_b64encode(crudo.encode("utf-8")).decode("ascii")
+
+
+# Tipos JSON que acepta el valor del cursor para la columna, según su tipo
+# en Python; None si no se conoce (por ejemplo el rango de la búsqueda).
+def _tipos_cursor(columna):
+    try:
+        tipo = columna.type.python_type
+    except NotImplementedError:
+        return None
+    if issubclass(tipo, (int, float, Decimal)):
+        return (int, float)
+    if issubclass(tipo, (str, datetime)):
+        return (str,)
+    return None
+
+
+def _valor_cursor(columna, valor):
+    if valor is None:
+        return None
+    if isinstance(valor, bool) or not isinstance(valor, (str, int, float)):
+        raise TypeError("Valor de cursor no escalar")
+    tipos = _tipos_cursor(columna)
+    if tipos is not None and not isinstance(valor, tipos):
+        raise TypeError("Valor de cursor de otro tipo")
+    if isinstance(columna.type, DateTime):
+        return datetime.fromisoformat(valor)
+    return valor
+
+
+def _decodificar_cursor(cursor, columnas):
+    try:
+        valores = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+    except (ValueError, UnicodeError, binascii.Error):
+        abort(400, mensaje="Cursor inválido")
+
+    if not isinstance(valores, list) or len(valores) != len(columnas):
+        abort(400, mensaje="Cursor inválido")
+
+    try:
+        return [_valor_cursor(columna, valor) for columna, valor in zip(columnas, valores)]
+    except (TypeError, ValueError):
+        abort(400, mensaje="Cursor inválido")
+
+
+def _limite():
+    try:
+        limite = int(request.args["limit"])
+    except ValueError:
+        abort(400, mensaje="El límite debe ser un número entero")
+
+    if limite < 1:
+        abort(400, mensaje="El límite debe ser mayor que cero")
+    return min(limite, LIMITE_MAXIMO)
+
+
+def _igual(columna, valor):
+    return columna.is_(None) if valor is None else columna == valor
+
+
+# "columna después de valor" respetando dónde ordena el motor los NULL: al
+# principio en SQLite y al final en Postgres (orden ascendente por defecto).
+def _mayor(columna, valor, nulos_primero):
+    admite_nulos = getattr(columna, "nullable", True)
+    if valor is None:
+        return columna.isnot(None) if nulos_primero else false()
+    if nulos_primero or not admite_nulos:
+        return columna > valor
+    return or_(columna > valor, columna.is_(None))
+
+
+# Condición "fila posterior al cursor" para el orden (c0, c1, ..., id):
+# c0 > v0 OR (c0 = v0 AND c1 > v1) OR ..., donde = y > tratan NULL como un
+# valor más para no saltarse las filas con la columna vacía.
+def _posteriores(columnas, valores, nulos_primero=True):
+    return or_(
+        *[
+            and_(
+                *[_igual(columnas[j], valores[j]) for j in range(indice)],
+                _mayor(columna, valores[indice], nulos_primero),
+            )
+            for indice, columna in enumerate(columnas)
+        ]
+    )
+
+
+# Paginación por llave (keyset) sobre las columnas de orden; la última debe
+# ser única (el id). Sin los parámetros limit/cursor retorna todas las filas
+# para no romper a los clientes actuales, salvo que se indique
+# limite_por_defecto. Retorna (filas, siguiente_cursor).
+def paginar(query, columnas, limite_por_defecto=None):
+    query = query.order_by(*columnas)
+    paginado = "limit" in request.args or "cursor" in request.args
+    if not paginado and limite_por_defecto is None:
+        return query.all(), None
+
+    if "limit" in request.args:
+        limite = _limite()
+    else:
+        limite = limite_por_defecto if limite_por_defecto is not None else LIMITE_MAXIMO
+    cursor = request.args.get("cursor")
+    if cursor:
+        nulos_primero = query.session.get_bind().dialect.name != "postgresql"
+        query = query.filter(
+            _posteriores(columnas, _decodificar_cursor(cursor, columnas), nulos_primero)
+        )
+
+    filas = query.limit(limite + 1).all()
+    if len(filas) <= limite:
+        return filas, None
+
+    filas = filas[:limite]
+    ultima = filas[-1]
+    return filas, _codificar_cursor([getattr(ultima, columna.key) for columna in columnas])
+
+
+def respuesta_paginada(resultados, siguiente_cursor):
+    if siguiente_cursor is None:
+        return resultados
+    return resultados, 200, {ENCABEZADO_CURSOR: siguiente_cursor}
+
+
+def acepta_ndjson():
+    return (
+        request.accept_mimetypes.best_match(["application/json", TIPO_NDJSON])
+        == TIPO_NDJSON
+    )
+
+
+# Con por_lotes, serializar recibe una lista de hasta TAMANO_LOTE_STREAMING
+# filas y retorna sus diccionarios; así puede traer los datos relacionados de
+# todo el lote con una consulta en vez de una por fila.
+def serializar_filas(filas, serializar, por_lotes=False):
+    if not por_lotes:
+        for fila in filas:
+            yield serializar(fila)
+        return
+
+    filas = iter(filas)
+    lote = list(islice(filas, TAMANO_LOTE_STREAMING))
+    while lote:
+        yield from serializar(lote)
+        lote = list(islice(filas, TAMANO_LOTE_STREAMING))
+
+
+def respuesta_ndjson(objetos, encabezados=None):
+    def generar():
+        for objeto in objetos:
+            yield json.dumps(objeto) + "\n"
+
+    return Response(
+        stream_with_context(generar()), mimetype=TIPO_NDJSON, headers=encabezados
+    )
+
+
+# Respuesta de los recursos de listado. Con "Accept: application/x-ndjson" las
+# filas se envían una por línea a medida que se leen; sin paginación la
+# consulta se recorre por lotes (yield_per) para que la memoria no crezca con
+# el tamaño del resultado.
+def listar(query, columnas, serializar, por_lotes=False):
+    paginado = "limit" in request.args or "cursor" in request.args
+
+    if acepta_ndjson() and not paginado:
+        filas = query.order_by(*columnas).yield_per(TAMANO_LOTE_STREAMING)
+        return respuesta_ndjson(serializar_filas(filas, serializar, por_lotes))
+
+    filas, siguiente_cursor = paginar(query, columnas)
+    objetos = serializar_filas(filas, serializar, por_lotes)
+    if acepta_ndjson():
+        encabezados = {ENCABEZADO_CURSOR: siguiente_cursor} if siguiente_cursor else None
+        return respuesta_ndjson(objetos, encabezados)
+
+    return respuesta_paginada(list(objetos), siguiente_cursor)
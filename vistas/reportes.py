@@ -0,0 +1,319 @@
+import json
+import math
+from collections import defaultdict
+
+from sqlalchemy import Float, type_coerce
+from sqlalchemy.exc import IntegrityError
+
+from modelos import (
+    db,
+    Ingrediente,
+    ListaCompraMenu,
+    Menu,
+    MenuReceta,
+    Receta,
+    RecetaIngrediente,
+    Restaurante,
+)
+from .costos import _vector
+from .versiones import RECETAS, version_coleccion
+
+
+def _identificador(valor):
+    try:
+        return int(valor)
+    except (TypeError, ValueError):
+        return None
+
+
+def _cargar_ingredientes_recetas(ids_recetas):
+    # Una sola consulta trae las recetas, sus filas de RecetaIngrediente y los
+    # datos del ingrediente; las recetas sin ingredientes llegan con None.
+    filas = (
+        db.session.query(
+            Receta.id,
+            Receta.nombre,
+            Receta.porcion,
+            RecetaIngrediente.cantidad,
+            Ingrediente.id,
+            Ingrediente.nombre,
+            Ingrediente.sitio,
+            Ingrediente.costo,
+        )
+        .outerjoin(RecetaIngrediente, RecetaIngrediente.receta == Receta.id)
+        .outerjoin(Ingrediente, Ingrediente.id == RecetaIngrediente.ingrediente)
+        .filter(Receta.id.in_(ids_recetas))
+        .order_by(Receta.id, RecetaIngrediente.id)
+        .all()
+    )
+
+    recetas = {}
+    ingredientes_por_receta = defaultdict(list)
+    for (
+        receta_id,
+        receta_nombre,
+        porcion,
+        cantidad,
+        ingrediente_id,
+        ingrediente_nombre,
+        sitio,
+        costo,
+    ) in filas:
+        recetas[receta_id] = (receta_nombre, float(porcion))
+        if ingrediente_id is not None:
+            ingredientes_por_receta[receta_id].append(
+                (float(cantidad), ingrediente_nombre, sitio, float(costo))
+            )
+
+    return recetas, ingredientes_por_receta
+
+
+def _pedidos(solicitudes):
+    return [
+        (_identificador(solicitud.get("receta")), solicitud.get("numero_personas"))
+        for solicitud in solicitudes
+    ]
+
+
+# Recibe una lista de {"receta", "numero_personas"} y retorna el diccionario
+# ingredientes_receta, o None si alguna de las recetas no existe.
+def calcular_ingredientes_compra(solicitudes):
+    pedidos = _pedidos(solicitudes)
+    ids_recetas = {receta_id for receta_id, _ in pedidos if receta_id is not None}
+    return _acumular(pedidos, *_cargar_ingredientes_recetas(ids_recetas))
+
+
+# Valida el cuerpo de /reporte ({"recetas": [{"receta", "numero_personas"}]}).
+# Retorna (respuesta, código) con el error, o None si es válido.
+def validar_reporte_compra(data):
+    if not isinstance(data, dict) or not isinstance(data.get("recetas"), list):
+        return {"mensaje": "No se enviaron recetas"}, 400
+
+    for solicitud in data["recetas"]:
+        if not isinstance(solicitud, dict):
+            return {"mensaje": "Cada receta debe ser un objeto"}, 400
+        numero_personas = solicitud.get("numero_personas")
+        if isinstance(numero_personas, bool) or not isinstance(numero_personas, (int, float)):
+            return {"mensaje": "El número de personas debe ser numérico"}, 400
+    return None
+
+
+# Respuesta de /reporte (y de los trabajos reporte_compra) como
+# (respuesta, código).
+def reporte_compra(solicitudes):
+    ingredientes_receta = calcular_ingredientes_compra(solicitudes)
+    if ingredientes_receta is None:
+        return {"mensaje": "Al menos una receta seleccionada no existe"}, 400
+
+    return {"mensaje": "Cálculo correcto", "ingredientes_receta": ingredientes_receta}, 200
+
+
+def _acumular(pedidos, recetas, ingredientes_por_receta):
+    ingredientes_receta = {}
+    for receta_id, numero_personas in pedidos:
+        if receta_id not in recetas:
+            return None
+
+        receta_nombre, porcion_float = recetas[receta_id]
+        for cantidad, ingrediente_nombre, sitio, costo in ingredientes_por_receta[
+            receta_id
+        ]:
+            unidades = math.ceil((cantidad * numero_personas) / porcion_float)
+            acumulado = ingredientes_receta.get(ingrediente_nombre)
+
+            if acumulado is None:
+                ingredientes_receta[ingrediente_nombre] = {
+                    "sitio": sitio,
+                    "cantidad": unidades,
+                    "recetas": [receta_nombre],
+                    "costo": costo * unidades,
+                }
+            else:
+                acumulado["recetas"].append(receta_nombre)
+                acumulado["cantidad"] += int(unidades)
+                acumulado["costo"] += costo * unidades
+
+    return ingredientes_receta
+
+
+# Igual que calcular_ingredientes_compra para varios menús a la vez
+# ({menu_id: solicitudes}) con una sola consulta de recetas.
+def calcular_listas_menus(solicitudes_por_menu):
+    pedidos_por_menu = {
+        menu_id: _pedidos(solicitudes) for menu_id, solicitudes in solicitudes_por_menu.items()
+    }
+    ids_recetas = {
+        receta_id
+        for pedidos in pedidos_por_menu.values()
+        for receta_id, _ in pedidos
+        if receta_id is not None
+    }
+    recetas, ingredientes_por_receta = _cargar_ingredientes_recetas(ids_recetas)
+    return {
+        menu_id: _acumular(pedidos, recetas, ingredientes_por_receta)
+        for menu_id, pedidos in pedidos_por_menu.items()
+    }
+
+
+def _solicitudes_menus(ids_menus):
+    solicitudes = {menu_id: [] for menu_id in ids_menus}
+    filas = (
+        db.session.query(MenuReceta.menu, MenuReceta.receta, MenuReceta.numero_personas)
+        .filter(MenuReceta.menu.in_(ids_menus))
+        .order_by(MenuReceta.id)
+    )
+    for menu_id, receta_id, numero_personas in filas:
+        solicitudes[menu_id].append({"receta": receta_id, "numero_personas": numero_personas})
+    return solicitudes
+
+
+# Listas de compra de menús del administrador: se usan las guardadas que
+# siguen vigentes y las demás se calculan con las filas de MenuReceta. Retorna
+# (listas, filas) con las filas de ListaCompraMenu por guardar, que no se
+# agregan a la sesión. Un menú con alguna receta inexistente queda con None.
+def listas_compra_menus(ids_menus, administrador_id):
+    version = version_coleccion(administrador_id, RECETAS)
+    guardadas = dict(
+        db.session.query(ListaCompraMenu.menu_id, ListaCompraMenu.ingredientes).filter(
+            ListaCompraMenu.menu_id.in_(ids_menus), ListaCompraMenu.version == version
+        )
+    )
+
+    listas = {}
+    vencidas = []
+    for menu_id in ids_menus:
+        if menu_id in guardadas:
+            listas[menu_id] = json.loads(guardadas[menu_id])
+        else:
+            vencidas.append(menu_id)
+    if not vencidas:
+        return listas, []
+
+    calculadas = calcular_listas_menus(_solicitudes_menus(vencidas))
+    filas = []
+    for menu_id in vencidas:
+        ingredientes = calculadas[menu_id]
+        listas[menu_id] = ingredientes
+        if ingredientes is not None:
+            filas.append(
+                {"menu_id": menu_id, "version": version, "ingredientes": json.dumps(ingredientes)}
+            )
+    return listas, filas
+
+
+# Guarda las listas recalculadas en una lectura, cada una en su propia
+# transacción para no confirmar la sesión de la solicitud. Si otra solicitud
+# guardó la misma lista primero (o el menú se borró) se descarta la propia.
+def guardar_listas_compra(filas):
+    tabla = ListaCompraMenu.__table__
+    for fila in filas:
+        try:
+            with db.engine.begin() as conexion:
+                actualizadas = conexion.execute(
+                    tabla.update()
+                    .where(tabla.c.menu_id == fila["menu_id"])
+                    .values(version=fila["version"], ingredientes=fila["ingredientes"])
+                ).rowcount
+                if not actualizadas:
+                    conexion.execute(tabla.insert(), fila)
+        except IntegrityError:
+            pass
+
+
+# Suma las listas de varios menús en una sola con el formato de
+# ingredientes_receta.
+def combinar_listas(listas):
+    combinada = {}
+    for lista in listas:
+        for nombre, datos in lista.items():
+            acumulado = combinada.get(nombre)
+            if acumulado is None:
+                combinada[nombre] = dict(datos, recetas=list(datos["recetas"]))
+            else:
+                acumulado["recetas"].extend(datos["recetas"])
+                acumulado["cantidad"] += datos["cantidad"]
+                acumulado["costo"] += datos["costo"]
+    return combinada
+
+
+# Compra consolidada de todos los restaurantes del administrador para los
+# menús activos entre desde y hasta (exclusivo). Una consulta trae cada
+# ingrediente de cada receta de cada menú; numpy calcula las unidades de cada
+# fila (como calcular_ingredientes_compra) y agrupa por ingrediente y luego
+# por sitio (proveedor). Las recetas sin porción positiva se omiten, porque
+# no se puede calcular cuántas unidades comprar.
+def calcular_compra_consolidada(administrador_id, desde, hasta):
+    filas = (
+        db.session.query(
+            Menu.id,
+            Menu.restaurante_id,
+            RecetaIngrediente.ingrediente,
+            MenuReceta.numero_personas,
+            # Sin la conversión a Decimal de Numeric, que domina el tiempo
+            # cuando hay miles de filas
+            type_coerce(RecetaIngrediente.cantidad, Float),
+            type_coerce(Receta.porcion, Float),
+            type_coerce(Ingrediente.costo, Float),
+        )
+        .select_from(Menu)
+        .join(Restaurante, Restaurante.id == Menu.restaurante_id)
+        .join(MenuReceta, MenuReceta.menu == Menu.id)
+        .join(Receta, Receta.id == MenuReceta.receta)
+        .join(RecetaIngrediente, RecetaIngrediente.receta == Receta.id)
+        .join(Ingrediente, Ingrediente.id == RecetaIngrediente.ingrediente)
+        .filter(
+            Restaurante.administrador_id == administrador_id,
+            Menu.fecha_inicio < hasta,
+            Menu.fecha_fin >= desde,
+            Receta.porcion > 0,
+        )
+        .all()
+    )
+    if not filas:
+        return {"menus": 0, "restaurantes": 0, "proveedores": []}
+
+    import numpy as np
+
+    columnas = list(zip(*filas))
+    ids_ingredientes, grupos = np.unique(
+        np.array(columnas[2], dtype=np.int64), return_inverse=True
+    )
+    unidades = np.ceil(_vector(columnas[3]) * _vector(columnas[4]) / _vector(columnas[5]))
+    cantidades = np.bincount(grupos, weights=unidades, minlength=len(ids_ingredientes))
+    costos = np.bincount(
+        grupos, weights=unidades * _vector(columnas[6]), minlength=len(ids_ingredientes)
+    )
+
+    datos = {
+        ingrediente_id: (nombre, unidad, sitio)
+        for ingrediente_id, nombre, unidad, sitio in db.session.query(
+            Ingrediente.id, Ingrediente.nombre, Ingrediente.unidad, Ingrediente.sitio
+        ).filter(Ingrediente.id.in_(ids_ingredientes.tolist()))
+    }
+    sitios, sitio_de_ingrediente = np.unique(
+        np.array([datos[ingrediente_id][2] or "" for ingrediente_id in ids_ingredientes.tolist()]),
+        return_inverse=True,
+    )
+    costos_sitio = np.bincount(sitio_de_ingrediente, weights=costos, minlength=len(sitios))
+
+    proveedores = [
+        {"sitio": str(sitio), "costo": float(costo), "ingredientes": []}
+        for sitio, costo in zip(sitios, costos_sitio)
+    ]
+    for indice in np.lexsort((ids_ingredientes, sitio_de_ingrediente)).tolist():
+        nombre, unidad, _ = datos[int(ids_ingredientes[indice])]
+        proveedores[sitio_de_ingrediente[indice]]["ingredientes"].append(
+            {
+                "id": int(ids_ingredientes[indice]),
+                "nombre": nombre,
+                "unidad": unidad,
+                "cantidad": int(cantidades[indice]),
+                "costo": float(costos[indice]),
+            }
+        )
+
+    return {
+        "menus": len(set(columnas[0])),
+        "restaurantes": len(set(columnas[1])),
+        "proveedores": proveedores,
+    }
@@ -0,0 +1,90 @@
+from marshmallow import Schema, fields, missing
+
+# Tipos de campo que se traducen a una expresión en línea. Sólo se usan las
+# clases exactas: una subclase puede cambiar la serialización.
+_CONVERSIONES = {fields.String: "str", fields.Float: "float", fields.Integer: "int"}
+
+_HOOKS_DUMP = {"pre_dump", "post_dump"}
+
+
+def _compilable(schema):
+    return type(schema).get_attribute is Schema.get_attribute and not any(
+        metodos for llave, metodos in schema._hooks.items() if llave[0] in _HOOKS_DUMP
+    )
+
+
+def _nested_compilable(campo):
+    return (
+        type(campo) is fields.Nested
+        and isinstance(campo.schema, Schema)
+        and not campo.many
+        and not campo.schema.many
+        and _compilable(campo.schema)
+    )
+
+
+# Expresión que convierte "valor" igual que campo._serialize, o None si el
+# campo debe serializarse con campo.serialize.
+def _expresion(campo, espacio, indice):
+    conversion = _CONVERSIONES.get(type(campo))
+    if conversion and not getattr(campo, "as_string", False):
+        return "None if valor is None else {}(valor)".format(conversion)
+
+    if type(campo) is fields.DateTime:
+        formato = campo.format or campo.DEFAULT_FORMAT
+        funcion = campo.SERIALIZATION_FUNCS.get(formato)
+        if funcion is None:
+            espacio["_formato_{}".format(indice)] = formato
+            return "None if valor is None else valor.strftime(_formato_{})".format(indice)
+        espacio["_fecha_{}".format(indice)] = funcion
+        return "None if valor is None else _fecha_{}(valor)".format(indice)
+
+    if type(campo) is fields.List and _nested_compilable(campo.inner):
+        espacio["_anidado_{}".format(indice)] = compilar_serializador(campo.inner.schema)
+        return (
+            "None if valor is None else "
+            "[None if elemento is None else _anidado_{}(elemento) for elemento in valor]"
+        ).format(indice)
+
+    if _nested_compilable(campo):
+        espacio["_anidado_{}".format(indice)] = compilar_serializador(campo.schema)
+        return "None if valor is None else _anidado_{}(valor)".format(indice)
+
+    return None
+
+
+# Genera una función objeto -> dict equivalente a schema.dump(objeto) para
+# los campos de dump del schema, en el mismo orden. Sirve para instancias del
+# modelo y para filas de consultas por columnas (acceso por atributo). Los
+# campos sin traducción directa (Related, Inferred, ...) se delegan en
+# marshmallow; si el schema tiene hooks de dump se usa schema.dump.
+def compilar_serializador(schema):
+    if not _compilable(schema):
+        return schema.dump
+
+    espacio = {"_faltante": missing, "_obtener": schema.get_attribute}
+    lineas = ["def serializar(objeto):", "    resultado = {}"]
+    for indice, (nombre, campo) in enumerate(schema.dump_fields.items()):
+        atributo = campo.attribute or nombre
+        llave = campo.data_key if campo.data_key is not None else nombre
+        expresion = _expresion(campo, espacio, indice)
+
+        if expresion is not None and atributo.isidentifier():
+            lineas.append("    valor = objeto.{}".format(atributo))
+            lineas.append("    resultado[{!r}] = {}".format(llave, expresion))
+        else:
+            espacio["_campo_{}".format(indice)] = campo
+            lineas.append(
+                "    valor = _campo_{}.serialize({!r}, objeto, accessor=_obtener)".format(
+                    indice, atributo
+                )
+            )
+            lineas.append("    if valor is not _faltante:")
+            lineas.append("        resultado[{!r}] = valor".format(llave))
+    lineas.append("    return resultado")
+
+    codigo = compile(
+        "\n".join(lineas), "<serializador {}>".format(type(schema).__name__), "exec"
+    )
+    exec(codigo, espacio)
+    return espacio["serializar"]
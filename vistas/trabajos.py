@@ -0,0 +1,251 @@
+import json
+import logging
+import os
+import socket
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor, wait
+from datetime import datetime, timedelta
+
+from flask import current_app
+
+from modelos import db, Trabajo
+from .importacion import (
+    crear_recetas_lote,
+    importar_ingredientes,
+    validar_ingredientes,
+    validar_recetas_lote,
+)
+from .reportes import reporte_compra, validar_reporte_compra
+
+logger = logging.getLogger("metricas.trabajos")
+
+PENDIENTE = "pendiente"
+EJECUTANDO = "ejecutando"
+TERMINADO = "terminado"
+FALLIDO = "fallido"
+
+HILOS_POR_DEFECTO = 2
+EXPIRACION_POR_DEFECTO = 3600
+
+# Identifica al proceso que guarda un trabajo en su pool. El token distingue
+# a este proceso de uno anterior con el mismo host y pid (un contenedor
+# reiniciado suele repetir ambos).
+_TOKEN_PROCESO = uuid.uuid4().hex[:8]
+
+# Cada tipo recibe el mismo cuerpo que su endpoint síncrono (/reporte,
+# /ingredientes/importar, /recetas/<id>/lote) y retorna (respuesta, código).
+TIPOS = {
+    "reporte_compra": lambda parametros, administrador_id: reporte_compra(
+        parametros["recetas"]
+    ),
+    "importar_ingredientes": importar_ingredientes,
+    "recetas_lote": crear_recetas_lote,
+}
+
+# Las mismas validaciones de los endpoints síncronos, para rechazar con 400
+# al enviar el trabajo. Cada una retorna (respuesta, código) o None.
+VALIDACIONES = {
+    "reporte_compra": validar_reporte_compra,
+    "importar_ingredientes": validar_ingredientes,
+    "recetas_lote": validar_recetas_lote,
+}
+
+# El detalle de la excepción sólo va al log
+ERROR_TRABAJO = "Error interno al ejecutar el trabajo"
+
+
+# Pool de hilos del proceso para los trabajos. El pool se crea con el primer
+# trabajo para no abrir hilos al importar la aplicación; cada hilo usa su
+# propio contexto de aplicación y su propia sesión.
+class ColaTrabajos:
+    def __init__(self, app):
+        self.app = app
+        self._ejecutor = None
+        self._pendientes = set()
+        self._bloqueo = threading.Lock()
+        self._recuperados = False
+
+    def enviar(self, trabajo_id):
+        with self._bloqueo:
+            if self._ejecutor is None:
+                self._ejecutor = ThreadPoolExecutor(
+                    max_workers=self.app.config["TRABAJOS_HILOS"],
+                    thread_name_prefix="trabajos",
+                )
+            futuro = self._ejecutor.submit(self._ejecutar, trabajo_id)
+            self._pendientes.add(futuro)
+        futuro.add_done_callback(self._pendientes.discard)
+        return futuro
+
+    # La primera vez que el proceso usa la cola recupera los trabajos que
+    # quedaron de procesos que ya terminaron (ver recuperar_trabajos).
+    def recuperar_una_vez(self):
+        with self._bloqueo:
+            if self._recuperados:
+                return
+            self._recuperados = True
+        for trabajo_id in recuperar_trabajos():
+            self.enviar(trabajo_id)
+
+    # Espera a que terminen los trabajos enviados (pruebas, apagado)
+    def esperar(self, timeout=None):
+        return wait(list(self._pendientes), timeout=timeout)
+
+    def _ejecutar(self, trabajo_id):
+        with self.app.app_context():
+            try:
+                ejecutar_trabajo(trabajo_id)
+            finally:
+                db.session.remove()
+
+
+def registrar_trabajos(app):
+    app.config.setdefault("TRABAJOS_HILOS", HILOS_POR_DEFECTO)
+    app.config.setdefault("TRABAJOS_EXPIRACION", EXPIRACION_POR_DEFECTO)
+    app.extensions["trabajos"] = ColaTrabajos(app)
+
+
+def _expiracion(desde):
+    return desde + timedelta(seconds=current_app.config["TRABAJOS_EXPIRACION"])
+
+
+def proceso_actual():
+    return "{}:{}:{}".format(socket.gethostname(), os.getpid(), _TOKEN_PROCESO)
+
+
+# Un trabajo quedó huérfano si el proceso que lo tenía en su pool terminó.
+# Sólo se puede saber para procesos de este mismo host; los de otros hosts
+# se dan por vivos y se limpian al vencer. Los trabajos sin proceso son de
+# antes de que se guardara.
+def _proceso_terminado(proceso):
+    if not proceso:
+        return True
+
+    host, _, resto = proceso.partition(":")
+    pid, _, token = resto.partition(":")
+    if host != socket.gethostname() or not pid.isdigit():
+        return False
+    if int(pid) == os.getpid():
+        return token != _TOKEN_PROCESO
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return True
+    except PermissionError:
+        pass
+    return False
+
+
+# Los trabajos pendientes de un proceso que terminó se toman para este
+# proceso y se retornan sus ids para volver a enviarlos; los que estaban
+# ejecutándose se marcan como fallidos, porque pudieron dejar la mitad del
+# trabajo hecho.
+def recuperar_trabajos():
+    ahora = datetime.now()
+    candidatos = (
+        db.session.query(Trabajo.id, Trabajo.estado, Trabajo.proceso)
+        .filter(Trabajo.estado.in_((PENDIENTE, EJECUTANDO)), Trabajo.expira >= ahora)
+        .all()
+    )
+
+    reenviar = []
+    for trabajo_id, estado, proceso in candidatos:
+        if not _proceso_terminado(proceso):
+            continue
+
+        # Se compara el proceso anterior para que, si otro worker lo
+        # recupera al mismo tiempo, sólo uno lo tome.
+        condicion = Trabajo.query.filter(
+            Trabajo.id == trabajo_id,
+            Trabajo.estado == estado,
+            Trabajo.proceso.is_(None) if proceso is None else Trabajo.proceso == proceso,
+        )
+        if estado == PENDIENTE:
+            if condicion.update({Trabajo.proceso: proceso_actual()}, synchronize_session=False):
+                reenviar.append(trabajo_id)
+        elif condicion.update(
+            {
+                Trabajo.estado: FALLIDO,
+                Trabajo.error: "El proceso que ejecutaba el trabajo terminó",
+                Trabajo.terminado: ahora,
+                Trabajo.expira: _expiracion(ahora),
+            },
+            synchronize_session=False,
+        ):
+            logger.warning("Trabajo %s huérfano marcado como fallido", trabajo_id)
+    db.session.commit()
+    return reenviar
+
+
+# Guarda el trabajo y lo envía al pool después del commit, para que el hilo
+# lo encuentre. Aprovecha para borrar los trabajos vencidos.
+def crear_trabajo(tipo, parametros, administrador_id):
+    ahora = datetime.now()
+    Trabajo.query.filter(Trabajo.expira < ahora).delete(synchronize_session=False)
+
+    trabajo = Trabajo(
+        id=uuid.uuid4().hex,
+        tipo=tipo,
+        estado=PENDIENTE,
+        administrador_id=administrador_id,
+        parametros=json.dumps(parametros),
+        creado=ahora,
+        expira=_expiracion(ahora),
+        proceso=proceso_actual(),
+    )
+    db.session.add(trabajo)
+    db.session.commit()
+
+    cola = current_app.extensions["trabajos"]
+    cola.recuperar_una_vez()
+    cola.enviar(trabajo.id)
+    return trabajo
+
+
+def ejecutar_trabajo(trabajo_id):
+    # Se toma con un UPDATE condicional para que un trabajo recuperado por
+    # dos procesos se ejecute una sola vez
+    tomado = Trabajo.query.filter_by(id=trabajo_id, estado=PENDIENTE).update(
+        {Trabajo.estado: EJECUTANDO, Trabajo.proceso: proceso_actual()},
+        synchronize_session=False,
+    )
+    db.session.commit()
+    if not tomado:
+        return
+
+    trabajo = Trabajo.query.get(trabajo_id)
+
+    try:
+        respuesta, codigo = TIPOS[trabajo.tipo](
+            json.loads(trabajo.parametros), trabajo.administrador_id
+        )
+    except Exception:
+        logger.exception("Falló el trabajo %s (%s)", trabajo_id, trabajo.tipo)
+        db.session.rollback()
+        trabajo = Trabajo.query.get(trabajo_id)
+        trabajo.estado = FALLIDO
+        trabajo.error = ERROR_TRABAJO
+    else:
+        trabajo.estado = TERMINADO
+        trabajo.codigo = codigo
+        trabajo.resultado = json.dumps(respuesta)
+
+    trabajo.terminado = datetime.now()
+    trabajo.expira = _expiracion(trabajo.terminado)
+    db.session.commit()
+
+
+# Trabajo del administrador que no ha vencido, o None. Un proceso recién
+# iniciado que sólo recibe consultas también recupera los huérfanos, para
+# que su estado no quede pendiente hasta vencer.
+def obtener_trabajo(trabajo_id, administrador_id):
+    current_app.extensions["trabajos"].recuperar_una_vez()
+    trabajo = Trabajo.query.get(trabajo_id)
+    if (
+        trabajo is None
+        or trabajo.administrador_id != administrador_id
+        or trabajo.expira < datetime.now()
+    ):
+        return None
+    return trabajo
@@ -0,0 +1,148 @@
+import hashlib
+
+from flask import Response, request
+from sqlalchemy.exc import IntegrityError
+from werkzeug.http import quote_etag
+
+from compresion import etag_base
+from modelos import db, VersionColeccion
+from .autorizacion import obtener_llamador
+from .cache import en_cache, invalidar_al_confirmar
+
+CHEFS = "chefs"
+INGREDIENTES = "ingredientes"
+MENUS = "menus"
+RECETAS = "recetas"
+RESTAURANTES = "restaurantes"
+
+# Colecciones cuya respuesta incluye datos de otra: las recetas traen los
+# ingredientes y costos, los restaurantes los ids de chefs y menús.
+DEPENDIENTES = {
+    INGREDIENTES: (RECETAS,),
+    CHEFS: (RESTAURANTES,),
+    MENUS: (RESTAURANTES,),
+}
+
+
+def _afectadas(colecciones):
+    afectadas = []
+    for coleccion in colecciones:
+        for afectada in (coleccion,) + DEPENDIENTES.get(coleccion, ()):
+            if afectada not in afectadas:
+                afectadas.append(afectada)
+    return afectadas
+
+
+def _incrementar(administrador_id, coleccion):
+    return (
+        VersionColeccion.query.filter_by(
+            administrador_id=administrador_id, coleccion=coleccion
+        ).update(
+            {VersionColeccion.version: VersionColeccion.version + 1},
+            synchronize_session=False,
+        )
+    )
+
+
+# Incrementa la versión de las colecciones del administrador (y de las que
+# dependen de ellas) dentro de la transacción en curso y deja pendiente la
+# invalidación de su cache; quien llama hace el commit junto con la escritura.
+def registrar_cambio(administrador_id, *colecciones):
+    if administrador_id is None:
+        return
+
+    afectadas = _afectadas(colecciones)
+    invalidar_al_confirmar(administrador_id, afectadas)
+    for coleccion in afectadas:
+        if _incrementar(administrador_id, coleccion):
+            continue
+        try:
+            with db.session.begin_nested():
+                db.session.execute(
+                    VersionColeccion.__table__.insert(),
+                    {"administrador_id": administrador_id, "coleccion": coleccion, "version": 1},
+                )
+        except IntegrityError:
+            # Otra transacción creó la fila primero
+            _incrementar(administrador_id, coleccion)
+
+
+def version_coleccion(administrador_id, coleccion):
+    version = (
+        db.session.query(VersionColeccion.version)
+        .filter_by(administrador_id=administrador_id, coleccion=coleccion)
+        .scalar()
+    )
+    return version or 0
+
+
+# ETag fuerte de un listado: depende de la versión de la colección y de todo
+# lo que cambia la respuesta para una misma versión (ruta con parámetros,
+# usuario y tipo aceptado).
+def etag_coleccion(administrador_id, coleccion, version=None):
+    if version is None:
+        version = version_coleccion(administrador_id, coleccion)
+    crudo = "|".join(
+        [
+            coleccion,
+            str(administrador_id),
+            str(version),
+            request.full_path,
+            str(obtener_llamador().id),
+            request.headers.get("Accept", ""),
+        ]
+    )
+    return hashlib.sha256(crudo.encode("utf-8")).hexdigest()[:32]
+
+
+def _con_etag(resultado, etag):
+    if isinstance(resultado, Response):
+        if resultado.status_code == 200:
+            resultado.set_etag(etag)
+        return resultado
+
+    if isinstance(resultado, tuple):
+        datos, codigo, encabezados = (resultado + (None,))[:3]
+        if codigo != 200:
+            return resultado
+        return datos, codigo, dict(encabezados or {}, ETag=quote_etag(etag))
+
+    return resultado, 200, {"ETag": quote_etag(etag)}
+
+
+# ETag de If-None-Match que corresponde a etag, sin importar la codificación
+# con la que se envió la respuesta (ver compresion.etag_codificado).
+def _etag_vigente(etag):
+    if request.if_none_match.star_tag:
+        return etag
+    for etiqueta in request.if_none_match.as_set():
+        if etag_base(etiqueta) == etag:
+            return etiqueta
+    return None
+
+
+# Responde 304 si el cliente ya tiene la versión actual del listado; si no,
+# genera la respuesta con generar() y le agrega el ETag. Sólo se consulta la
+# tabla de versiones para decidir.
+def listado_condicional(administrador_id, coleccion, generar, version=None):
+    etag = etag_coleccion(administrador_id, coleccion, version)
+    vigente = _etag_vigente(etag)
+    if vigente is not None:
+        respuesta = Response(status=304)
+        respuesta.set_etag(vigente)
+        return respuesta
+
+    return _con_etag(generar(), etag)
+
+
+# listado_condicional con la respuesta en la cache del inquilino. La versión
+# se lee una vez y se usa para el ETag y para la llave de la cache, así el
+# cuerpo cacheado siempre corresponde al ETag con el que se entrega.
+def listado_cacheado(administrador_id, coleccion, generar, variante=""):
+    version = version_coleccion(administrador_id, coleccion)
+    return listado_condicional(
+        administrador_id,
+        coleccion,
+        lambda: en_cache(administrador_id, coleccion, generar, variante, version),
+        version,
+    )
@@ -1,12 +1,13 @@
 from flask import request
-from flask_jwt_extended import jwt_required, create_access_token, get_jwt_identity
+from flask_jwt_extended import jwt_required, create_access_token
 from flask_restful import Resource
 from marshmallow import ValidationError
+from sqlalchemy import func
+from sqlalchemy.orm import joinedload, selectinload
 from collections import Counter
 import hashlib
 import json
-from datetime import datetime
-import math
+from datetime import datetime, timedelta
 
 from modelos import (
     db,
@@ -28,6 +29,48 @@ from modelos import (
     MenuSchema,
     MenuReceta,
     MenuRecetaSchema,
+    ListaCompraMenu,
+    TrabajoSchema,
+)
+from .autorizacion import administrador_de_usuario, claims_usuario, obtener_llamador
+from .cache import cache_actual, en_cache
+from .busqueda import (
+    LIMITE_BUSQUEDA,
+    TIPOS_BUSQUEDA,
+    consulta_busqueda,
+    serializar_resultado,
+    terminos_busqueda,
+)
+from .listados import listar, paginar, respuesta_paginada
+from .importacion import crear_recetas_lote, importar_ingredientes, leer_csv
+from .intervalos import hay_superposicion
+from .costos import leer_totales_recetas, materializar_totales, propagar_cambio_ingrediente
+from .reportes import (
+    calcular_compra_consolidada,
+    combinar_listas,
+    guardar_listas_compra,
+    listas_compra_menus,
+    reporte_compra,
+    validar_reporte_compra,
+)
+from .serializadores import compilar_serializador
+from .trabajos import (
+    FALLIDO,
+    TERMINADO,
+    TIPOS,
+    VALIDACIONES,
+    crear_trabajo,
+    obtener_trabajo,
+)
+from .versiones import (
+    CHEFS,
+    INGREDIENTES,
+    MENUS,
+    RECETAS,
+    RESTAURANTES,
+    listado_cacheado,
+    listado_condicional,
+    registrar_cambio,
 )
 
 
@@ -39,9 +82,23 @@ menu_receta_schema = MenuRecetaSchema()
 receta_ingrediente_schema = RecetaIngredienteSchema()
 receta_schema = RecetaSchema()
 restaurante_schema = RestauranteSchema()
+trabajo_schema = TrabajoSchema()
 usuario_schema = UsuarioSchema()
 restaurante_schema = RestauranteSchema()
 
+# Versiones compiladas de schema.dump para los listados
+serializar_chef = compilar_serializador(chef_schema)
+serializar_ingrediente = compilar_serializador(ingrediente_schema)
+serializar_menu = compilar_serializador(menu_schema)
+serializar_receta_base = compilar_serializador(receta_schema)
+# Sin las relaciones dinámicas chefs y menus, que se consultan por lote
+serializar_restaurante_base = compilar_serializador(
+    RestauranteSchema(exclude=("chefs", "menus"))
+)
+# Orden de las llaves de RestauranteSchema().dump, para que el JSON por lotes
+# sea idéntico byte a byte
+CAMPOS_RESTAURANTE = tuple(RestauranteSchema().dump_fields)
+
 class VistaSignIn(Resource):
     def post(self):
         usuario = Usuario.query.filter(
@@ -93,10 +150,12 @@ class VistaLogIn(Resource):
         if usuario is None:
             return "El usuario no existe", 404
         else:
-            administrador = Administrador.query.get(usuario.id)
-            rol = "admin" if administrador else "chef"
+            claims = claims_usuario(usuario.id)
+            rol = claims["rol"] or "chef"
 
-            token_de_acceso = create_access_token(identity=usuario.id)
+            token_de_acceso = create_access_token(
+                identity=usuario.id, additional_claims=claims
+            )
             return {
                 "mensaje": "Inicio de sesión exitoso",
                 "token": token_de_acceso,
@@ -107,52 +166,42 @@ class VistaLogIn(Resource):
 class VistaUsuario(Resource):
     @jwt_required()
     def get(self):
-        id_usuario = get_jwt_identity()
-        administrador = Administrador.query.get(id_usuario)
-        if administrador:
-            return {"nombre": administrador.usuario}
-        else:
-            chef = Chef.query.get(id_usuario)
+        llamador = obtener_llamador()
+        if llamador.es_administrador:
+            administrador = Administrador.query.get(llamador.id)
+            if administrador:
+                return {"nombre": administrador.usuario}
+        elif llamador.es_chef:
+            chef = Chef.query.get(llamador.id)
             if chef:
                 return {"nombre": chef.nombre}
-            else:
-                return {"mensaje": "Acceso denegado"}, 403
+
+        return {"mensaje": "Acceso denegado"}, 403
 
 class VistaIngredientes(Resource):
-    def _get_administrador(self, id_usuario):
-        administrador = None
-        if not Administrador.query.get(id_usuario):
-            chef = Chef.query.get(id_usuario)
-            if not chef:
-                return None
-            else:
-                id_usuario = chef.restaurante.administrador_id
-                
-        administrador = Administrador.query.get(id_usuario)
-        return administrador
-    
-    def _create_ingrediente(self, data, administrador):
+    def _create_ingrediente(self, data, administrador_id):
         nuevo_ingrediente = Ingrediente(
             nombre=data["nombre"],
             unidad=data["unidad"],
             costo=float(data["costo"]),
             calorias=float(data["calorias"]),
             sitio=data["sitio"],
-            administrador_id=administrador.id,
+            administrador_id=administrador_id,
         )
 
         db.session.add(nuevo_ingrediente)
+        registrar_cambio(administrador_id, INGREDIENTES)
         db.session.commit()
         return nuevo_ingrediente
     
-    def _validate_data(self, data, id_usuario):
+    def _validate_data(self, data, administrador_id):
         try:
             ingrediente_schema.load(data, session=db.session)
         except ValidationError as err:
             return {"mensaje": "Datos inválidos", "errores": err.messages}, 400
 
         ingrediente_existente = (
-            Ingrediente.query.filter_by(administrador_id=id_usuario)
+            Ingrediente.query.filter_by(administrador_id=administrador_id)
             .filter_by(nombre=data["nombre"])
             .first()
         )
@@ -162,38 +211,57 @@ class VistaIngredientes(Resource):
 
     @jwt_required()
     def get(self):
-        id_usuario = get_jwt_identity()
-
-        if not Administrador.query.get(id_usuario):
-            chef = Chef.query.get(id_usuario)
-            if not chef:
-                return {"mensaje": "Acceso denegado"}, 403
-            else:
-                id_usuario = chef.restaurante.administrador_id
+        administrador_id = obtener_llamador().administrador_id
+        if not administrador_id:
+            return {"mensaje": "Acceso denegado"}, 403
 
-        ingredientes = Ingrediente.query.filter_by(
-            administrador_id=str(id_usuario)
-        ).all()
-        return [ingrediente_schema.dump(ingrediente) for ingrediente in ingredientes]
+        return listado_cacheado(
+            administrador_id,
+            INGREDIENTES,
+            lambda: listar(
+                Ingrediente.query.filter_by(administrador_id=str(administrador_id)),
+                [Ingrediente.id],
+                serializar_ingrediente,
+            ),
+        )
 
     @jwt_required()
     def post(self):
-        id_usuario = get_jwt_identity()
-        administrador = self._get_administrador(id_usuario)
+        administrador_id = obtener_llamador().administrador_id
 
-        if not administrador:
+        if not administrador_id:
             return {"mensaje": "Acceso denegado"}, 403
 
         data = request.get_json()
-        validation_result = self._validate_data(data, id_usuario)
+        validation_result = self._validate_data(data, administrador_id)
         
         if validation_result:
             return validation_result
 
-        nuevo_ingrediente = self._create_ingrediente(data, administrador)
+        nuevo_ingrediente = self._create_ingrediente(data, administrador_id)
         return ingrediente_schema.dump(nuevo_ingrediente)
 
 
+class VistaImportarIngredientes(Resource):
+    @jwt_required()
+    def post(self):
+        administrador_id = obtener_llamador().administrador_id
+        if not administrador_id:
+            return {"mensaje": "Acceso denegado"}, 403
+
+        if "archivo" in request.files:
+            contenido = request.files["archivo"].read()
+        elif request.mimetype == "text/csv":
+            contenido = request.get_data()
+        else:
+            return importar_ingredientes(request.get_json(), administrador_id)
+
+        filas = leer_csv(contenido)
+        if filas is None:
+            return {"mensaje": "El archivo debe ser un CSV codificado en UTF-8"}, 400
+        return importar_ingredientes(filas, administrador_id)
+
+
 class VistaIngrediente(Resource):
     @jwt_required()
     def get(self, id_ingrediente):
@@ -202,11 +270,21 @@ class VistaIngrediente(Resource):
     @jwt_required()
     def put(self, id_ingrediente):
         ingrediente = Ingrediente.query.get_or_404(id_ingrediente)
+        costo_anterior = float(ingrediente.costo or 0)
+        calorias_anteriores = float(ingrediente.calorias or 0)
+
         ingrediente.nombre = request.json["nombre"]
         ingrediente.unidad = request.json["unidad"]
         ingrediente.costo = float(request.json["costo"])
         ingrediente.calorias = float(request.json["calorias"])
         ingrediente.sitio = request.json["sitio"]
+
+        propagar_cambio_ingrediente(
+            id_ingrediente,
+            ingrediente.costo - costo_anterior,
+            ingrediente.calorias - calorias_anteriores,
+        )
+        registrar_cambio(ingrediente.administrador_id, INGREDIENTES)
         db.session.commit()
         return ingrediente_schema.dump(ingrediente)
 
@@ -218,30 +296,90 @@ class VistaIngrediente(Resource):
         ).all()
         if not recetas_ingrediente:
             db.session.delete(ingrediente)
+            registrar_cambio(ingrediente.administrador_id, INGREDIENTES)
             db.session.commit()
             return "", 204
         else:
             return "El ingrediente se está usando en diferentes recetas", 409
 
 
+# Serializa la receta con los datos de cada ingrediente incluidos. El
+# diccionario ingredientes_serializados funciona como índice por id para que
+# cada ingrediente se serialice una sola vez por respuesta.
+def serializar_receta(receta, ingredientes_serializados):
+    resultado = serializar_receta_base(receta)
+    for receta_ingrediente, datos in zip(receta.ingredientes, resultado["ingredientes"]):
+        ingrediente = receta_ingrediente.datos_ingrediente
+        if ingrediente is None:
+            continue
+
+        if ingrediente.id not in ingredientes_serializados:
+            ingrediente_serializado = serializar_ingrediente(ingrediente)
+            ingrediente_serializado["costo"] = float(ingrediente_serializado["costo"])
+            ingredientes_serializados[ingrediente.id] = ingrediente_serializado
+        datos["ingrediente"] = ingredientes_serializados[ingrediente.id]
+
+    return resultado
+
+
+# Compara los ingredientes enviados con los actuales de la receta, indexados
+# por id, en una sola pasada. Los enviados con id "" son nuevos, los que
+# traen un id existente se actualizan y los actuales que no se enviaron se
+# borran. Retorna (nuevos, actualizados, ids_borrados) o None si algún id no
+# pertenece a la receta.
+def diferenciar_ingredientes_receta(id_receta, actuales, enviados):
+    pendientes = {fila.id: fila for fila in actuales}
+    nuevos = []
+    actualizados = []
+    for enviado in enviados:
+        datos = {
+            "cantidad": enviado["cantidad"],
+            "ingrediente": int(enviado["idIngrediente"]),
+        }
+        if enviado["id"] == "":
+            nuevos.append(dict(datos, receta=id_receta))
+            continue
+
+        actual = pendientes.pop(int(enviado["id"]), None)
+        if actual is None:
+            return None
+        if (actual.cantidad, actual.ingrediente) != (
+            datos["cantidad"],
+            datos["ingrediente"],
+        ):
+            actualizados.append(dict(datos, id=actual.id))
+
+    return nuevos, actualizados, list(pendientes)
+
+
+# Las recetas que crea un chef quedan con su id, pero la versión de RECETAS
+# que leen el listado y las listas de compra de los menús es la del
+# administrador dueño de los datos.
+def _registrar_cambio_recetas(id_usuario):
+    registrar_cambio(administrador_de_usuario(id_usuario), RECETAS)
+
+
 class VistaRecetas(Resource):
     @jwt_required()
     def get(self, id_usuario):
-        if not Administrador.query.get(id_usuario):
-            chef = Chef.query.get(id_usuario)
-            if not chef:
-                return {"mensaje": "Acceso denegado"}, 403
-            else:
-                id_usuario = chef.restaurante.administrador_id
-
-        recetas = Receta.query.filter_by(usuario=str(id_usuario)).all()
-        resultados = [receta_schema.dump(receta) for receta in recetas]
-        ingredientes = Ingrediente.query.all()
-        for receta in resultados:
-            for receta_ingrediente in receta["ingredientes"]:
-                self.actualizar_ingredientes_util(receta_ingrediente, ingredientes)
+        id_usuario = administrador_de_usuario(id_usuario)
+        if not id_usuario:
+            return {"mensaje": "Acceso denegado"}, 403
 
-        return resultados
+        ingredientes_serializados = {}
+        return listado_condicional(
+            id_usuario,
+            RECETAS,
+            lambda: listar(
+                Receta.query.filter_by(usuario=str(id_usuario)).options(
+                    selectinload(Receta.ingredientes).joinedload(
+                        RecetaIngrediente.datos_ingrediente
+                    )
+                ),
+                [Receta.id],
+                lambda receta: serializar_receta(receta, ingredientes_serializados),
+            ),
+        )
 
     @jwt_required()
     def post(self, id_usuario):
@@ -260,72 +398,74 @@ class VistaRecetas(Resource):
             )
             nueva_receta.ingredientes.append(nueva_receta_ingrediente)
         db.session.add(nueva_receta)
+        db.session.flush()
+        materializar_totales(Receta.id == nueva_receta.id)
+        _registrar_cambio_recetas(nueva_receta.usuario)
         db.session.commit()
         return ingrediente_schema.dump(nueva_receta)
 
-    def actualizar_ingredientes_util(self, receta_ingrediente, ingredientes):
-        for ingrediente in ingredientes:
-            if str(ingrediente.id) == receta_ingrediente["ingrediente"]:
-                receta_ingrediente["ingrediente"] = ingrediente_schema.dump(ingrediente)
-                receta_ingrediente["ingrediente"]["costo"] = float(
-                    receta_ingrediente["ingrediente"]["costo"]
-                )
+
+class VistaRecetasLote(Resource):
+    @jwt_required()
+    def post(self, id_usuario):
+        administrador_id = administrador_de_usuario(id_usuario)
+        if not administrador_id:
+            return {"mensaje": "Acceso denegado"}, 403
+
+        return crear_recetas_lote(request.get_json(), administrador_id)
 
 
 class VistaReceta(Resource):
     @jwt_required()
     def get(self, id_receta):
-        receta = Receta.query.get_or_404(id_receta)
-        ingredientes = Ingrediente.query.all()
-        resultados = receta_schema.dump(Receta.query.get_or_404(id_receta))
-        receta_ingredientes = resultados["ingredientes"]
-        for receta_ingrediente in receta_ingredientes:
-            for ingrediente in ingredientes:
-                if str(ingrediente.id) == receta_ingrediente["ingrediente"]:
-                    receta_ingrediente["ingrediente"] = ingrediente_schema.dump(
-                        ingrediente
-                    )
-                    receta_ingrediente["ingrediente"]["costo"] = float(
-                        receta_ingrediente["ingrediente"]["costo"]
-                    )
-
-        return resultados
+        receta = (
+            Receta.query.options(
+                joinedload(Receta.ingredientes).joinedload(
+                    RecetaIngrediente.datos_ingrediente
+                )
+            )
+            .filter_by(id=id_receta)
+            .first_or_404()
+        )
+        return serializar_receta(receta, {})
 
     @jwt_required()
     def put(self, id_receta):
         receta = Receta.query.get_or_404(id_receta)
+        actuales = db.session.query(
+            RecetaIngrediente.id, RecetaIngrediente.cantidad, RecetaIngrediente.ingrediente
+        ).filter(RecetaIngrediente.receta == receta.id)
+        try:
+            diferencia = diferenciar_ingredientes_receta(
+                receta.id, actuales, request.json["ingredientes"]
+            )
+        except (KeyError, TypeError, ValueError):
+            return {"mensaje": "Ingredientes inválidos"}, 400
+        if diferencia is None:
+            return {"mensaje": "La receta no tiene alguno de los ingredientes enviados"}, 400
+        nuevos, actualizados, ids_borrados = diferencia
+
         receta.nombre = request.json["nombre"]
         receta.preparacion = request.json["preparacion"]
         receta.duracion = float(request.json["duracion"])
         receta.porcion = float(request.json["porcion"])
+        db.session.flush()
 
-        # Verificar los ingredientes que se borraron
-        for receta_ingrediente in receta.ingredientes:
-            borrar = self.borrar_ingrediente_util(
-                request.json["ingredientes"], receta_ingrediente
-            )
-
-            if borrar == True:
-                db.session.delete(receta_ingrediente)
-
-        db.session.commit()
-
-        for receta_ingrediente_editar in request.json["ingredientes"]:
-            if receta_ingrediente_editar["id"] == "":
-                # Es un nuevo ingrediente de la receta porque no tiene código
-                nueva_receta_ingrediente = RecetaIngrediente(
-                    cantidad=receta_ingrediente_editar["cantidad"],
-                    ingrediente=int(receta_ingrediente_editar["idIngrediente"]),
-                )
-                receta.ingredientes.append(nueva_receta_ingrediente)
-            else:
-                # Se actualiza el ingrediente de la receta
-                receta_ingrediente = self.actualizar_ingrediente_util(
-                    receta.ingredientes, receta_ingrediente_editar
+        # Todos los cambios de ingredientes van en la misma transacción
+        if ids_borrados:
+            db.session.execute(
+                RecetaIngrediente.__table__.delete().where(
+                    RecetaIngrediente.id.in_(ids_borrados)
                 )
-                db.session.add(receta_ingrediente)
-
-        db.session.add(receta)
+            )
+        if actualizados:
+            db.session.bulk_update_mappings(RecetaIngrediente, actualizados)
+        if nuevos:
+            db.session.bulk_insert_mappings(RecetaIngrediente, nuevos)
+        db.session.expire(receta, ["ingredientes"])
+
+        materializar_totales(Receta.id == receta.id)
+        _registrar_cambio_recetas(receta.usuario)
         db.session.commit()
         return ingrediente_schema.dump(receta)
 
@@ -333,6 +473,7 @@ class VistaReceta(Resource):
     def delete(self, id_receta):
         receta = Receta.query.get_or_404(id_receta)
         db.session.delete(receta)
+        _registrar_cambio_recetas(receta.usuario)
         db.session.commit()
         return "", 204
     
@@ -354,37 +495,32 @@ class VistaReceta(Resource):
         db.session.commit()
         return "", 204
 
-    def borrar_ingrediente_util(self, receta_ingredientes, receta_ingrediente):
-        borrar = True
-        for receta_ingrediente_editar in receta_ingredientes:
-            if receta_ingrediente_editar["id"] != "":
-                if int(receta_ingrediente_editar["id"]) == receta_ingrediente.id:
-                    borrar = False
 
-        return borrar
+class VistaCostosRecetas(Resource):
+    @jwt_required()
+    def get(self, id_usuario):
+        id_usuario = administrador_de_usuario(id_usuario)
+        if not id_usuario:
+            return {"mensaje": "Acceso denegado"}, 403
 
-    def actualizar_ingrediente_util(
-        self, receta_ingredientes, receta_ingrediente_editar
-    ):
-        receta_ingrediente_retornar = None
-        for receta_ingrediente in receta_ingredientes:
-            if int(receta_ingrediente_editar["id"]) == receta_ingrediente.id:
-                receta_ingrediente.cantidad = receta_ingrediente_editar["cantidad"]
-                receta_ingrediente.ingrediente = receta_ingrediente_editar[
-                    "idIngrediente"
-                ]
-                receta_ingrediente_retornar = receta_ingrediente
+        totales = leer_totales_recetas(Receta.usuario == id_usuario)
+        return list(totales.values())
 
-        return receta_ingrediente_retornar
+
+class VistaCostosReceta(Resource):
+    @jwt_required()
+    def get(self, id_receta):
+        totales = leer_totales_recetas(Receta.id == id_receta)
+        if id_receta not in totales:
+            return {"mensaje": "La receta no existe"}, 404
+        return totales[id_receta]
 
 
 class VistaChef(Resource):
     @jwt_required()
     def post(self):
-        administrador_id = get_jwt_identity()
-
-        administrador = Administrador.query.get(administrador_id)
-        if not administrador:
+        llamador = obtener_llamador()
+        if not llamador.es_administrador:
             return {"mensaje": "Acceso denegado"}, 403
 
         data = request.get_json()
@@ -420,6 +556,7 @@ class VistaChef(Resource):
         )
 
         db.session.add(nuevo_chef)
+        registrar_cambio(restaurante.administrador_id, CHEFS)
         db.session.commit()
 
         return {"message": "Chef creado exitosamente"}, 201
@@ -428,10 +565,8 @@ class VistaChef(Resource):
 class VistaRestaurante(Resource):
     @jwt_required()
     def post(self):
-        administrador_id = get_jwt_identity()
-
-        administrador = Administrador.query.get(administrador_id)
-        if not administrador:
+        llamador = obtener_llamador()
+        if not llamador.es_administrador:
             return {"mensaje": "Acceso denegado"}, 403
 
         data = request.get_json()
@@ -456,10 +591,11 @@ class VistaRestaurante(Resource):
             tipo_comida=data.get("tipo_comida", ""),
             aplicaciones_asociadas=data.get("aplicaciones_asociadas", ""),
             opciones_servicio=data.get("opciones_servicio", ""),
-            administrador_id=administrador_id,
+            administrador_id=llamador.id,
         )
 
         db.session.add(nuevo_restaurante)
+        registrar_cambio(llamador.id, RESTAURANTES)
         db.session.commit()
 
         return {
@@ -471,10 +607,8 @@ class VistaRestaurante(Resource):
 class VistaRestauranteEspecifico(Resource):
     @jwt_required()
     def put(self, id_restaurante):
-        administrador_id = get_jwt_identity()
-
-        administrador = Administrador.query.get(administrador_id)
-        if not administrador:
+        llamador = obtener_llamador()
+        if not llamador.es_administrador:
             return {"mensaje": "Acceso denegado"}, 403
 
         restaurante = Restaurante.query.get_or_404(id_restaurante)
@@ -493,6 +627,7 @@ class VistaRestauranteEspecifico(Resource):
         except ValidationError as err:
             return {"mensaje": "Datos inválidos", "errores": err.messages}, 400
 
+        registrar_cambio(restaurante.administrador_id, RESTAURANTES)
         db.session.commit()
         return {
             "mensaje": "Restaurante actualizado exitosamente",
@@ -508,39 +643,95 @@ class VistaRestauranteEspecifico(Resource):
             return {"mensaje": "Restaurante no encontrado"}, 404
 
 
+def _ids_por_restaurante(modelo, ids_restaurantes):
+    agrupados = {id_restaurante: [] for id_restaurante in ids_restaurantes}
+    filas = (
+        db.session.query(modelo.restaurante_id, modelo.id)
+        .filter(modelo.restaurante_id.in_(ids_restaurantes))
+        .order_by(modelo.id)
+    )
+    for id_restaurante, id_relacionado in filas:
+        agrupados[id_restaurante].append(id_relacionado)
+    return agrupados
+
+
+def _conteos_por_restaurante(modelo, ids_restaurantes):
+    return dict(
+        db.session.query(modelo.restaurante_id, func.count(modelo.id))
+        .filter(modelo.restaurante_id.in_(ids_restaurantes))
+        .group_by(modelo.restaurante_id)
+    )
+
+
+# Serializa un lote de restaurantes con una consulta para los chefs y otra
+# para los menús de todo el lote. Con ?expandir=conteos se envían sólo las
+# cantidades (conteo_chefs, conteo_menus) en lugar de las listas de ids.
+def serializar_restaurantes(restaurantes):
+    ids_restaurantes = [restaurante.id for restaurante in restaurantes]
+    if request.args.get("expandir") == "conteos":
+        chefs = _conteos_por_restaurante(Chef, ids_restaurantes)
+        menus = _conteos_por_restaurante(Menu, ids_restaurantes)
+        return [
+            dict(
+                serializar_restaurante_base(restaurante),
+                conteo_chefs=chefs.get(restaurante.id, 0),
+                conteo_menus=menus.get(restaurante.id, 0),
+            )
+            for restaurante in restaurantes
+        ]
+
+    chefs = _ids_por_restaurante(Chef, ids_restaurantes)
+    menus = _ids_por_restaurante(Menu, ids_restaurantes)
+    serializados = []
+    for restaurante in restaurantes:
+        fila = serializar_restaurante_base(restaurante)
+        fila["chefs"] = chefs[restaurante.id]
+        fila["menus"] = menus[restaurante.id]
+        serializados.append({campo: fila[campo] for campo in CAMPOS_RESTAURANTE})
+    return serializados
+
+
 class VistaRestaurantes(Resource):
     @jwt_required()
     def get(self, id_usuario):
-        administrador_id = get_jwt_identity()
-
-        administrador = Administrador.query.get(administrador_id)
-        if not administrador:
+        llamador = obtener_llamador()
+        if not llamador.es_administrador:
             return {"mensaje": "Acceso denegado"}, 403
 
-        restaurantes = (
-            Restaurante.query.filter_by(administrador_id=str(id_usuario))
-            .order_by(Restaurante.nombre)
-            .all()
+        return listado_cacheado(
+            id_usuario,
+            RESTAURANTES,
+            lambda: listar(
+                Restaurante.query.filter_by(administrador_id=str(id_usuario)),
+                [Restaurante.nombre, Restaurante.id],
+                serializar_restaurantes,
+                por_lotes=True,
+            ),
         )
-
-        return [restaurante_schema.dump(restaurante) for restaurante in restaurantes]
     
 class VistaChefs(Resource):
     @jwt_required()
     def get(self, id_restaurante):
-        administrador_id = get_jwt_identity()
-
-        administrador = Administrador.query.get(administrador_id)
-        if not administrador:
+        llamador = obtener_llamador()
+        if not llamador.es_administrador:
             return {"mensaje": "Acceso denegado"}, 403
 
-        chefs = (
-            Chef.query.filter_by(restaurante_id=str(id_restaurante))
-            .order_by(Chef.nombre)
-            .all()
+        # Los chefs se cachean con el administrador dueño del restaurante,
+        # que es el inquilino al que VistaChef.post invalida.
+        administrador_id = (
+            db.session.query(Restaurante.administrador_id)
+            .filter_by(id=id_restaurante)
+            .scalar()
+        )
+        return en_cache(
+            administrador_id,
+            CHEFS,
+            lambda: listar(
+                Chef.query.filter_by(restaurante_id=str(id_restaurante)),
+                [Chef.nombre, Chef.id],
+                serializar_chef,
+            ),
         )
-        resultados = [chef_schema.dump(chef) for chef in chefs]
-        return resultados
     
 class VistaMenu(Resource):   
     def _validacion_fechas(self, data, restaurante_id):     
@@ -557,13 +748,7 @@ class VistaMenu(Resource):
         if fecha_inicio < fecha_actual or fecha_fin < fecha_actual:
          return {"mensaje": "Las fechas deben ser mayores que la fecha actual"}, 400    
 
-        menus_superpuestos = Menu.query.filter(
-            Menu.restaurante_id == restaurante_id,
-            Menu.fecha_fin >= fecha_inicio,
-            Menu.fecha_inicio <= fecha_fin
-        ).all()
-
-        if menus_superpuestos:
+        if hay_superposicion(restaurante_id, fecha_inicio, fecha_fin):
             return {"mensaje": "Ya existe un menú con fechas superpuestas en este restaurante"}, 400  
 
     def _validacion_menu(self, data):
@@ -604,9 +789,8 @@ class VistaMenu(Resource):
 
     @jwt_required()
     def post(self):
-        usuario_id = get_jwt_identity()
-        usuario = Usuario.query.get(usuario_id)
-        if not usuario:
+        llamador = obtener_llamador()
+        if not llamador.rol:
             return {"mensaje": "Acceso denegado"}, 403
         
         data = request.get_json()
@@ -618,9 +802,8 @@ class VistaMenu(Resource):
         fecha_fin = datetime.strptime(data.get("fecha_fin"), "%Y-%m-%d %H:%M")
 
         restaurante_id = data.get("restaurante")
-        chef = Chef.query.get(usuario_id)
-        if chef:
-            restaurante_id = chef.restaurante_id
+        if llamador.es_chef:
+            restaurante_id = llamador.restaurante_id
         
         if not restaurante_id:
             return {"mensaje": "El restaurante no se seleccionó"}, 400
@@ -641,7 +824,7 @@ class VistaMenu(Resource):
             fecha_inicio = fecha_inicio,
             fecha_fin = fecha_fin,
             descripcion = data.get("descripcion"),
-            usuario_id = usuario.id,
+            usuario_id = llamador.id,
             restaurante_id = restaurante_id
         )
         
@@ -653,6 +836,17 @@ class VistaMenu(Resource):
             nuevo_menu.recetas.append(nuevo_menu_receta)
 
         db.session.add(nuevo_menu)
+        administrador_id = (
+            db.session.query(Restaurante.administrador_id)
+            .filter_by(id=restaurante_id)
+            .scalar()
+        )
+        registrar_cambio(administrador_id, MENUS)
+        # La lista de compra se calcula al guardar para que los reportes del
+        # menú sólo la lean mientras sus recetas no cambien.
+        db.session.flush()
+        _, filas = listas_compra_menus([nuevo_menu.id], administrador_id)
+        db.session.add_all([ListaCompraMenu(**fila) for fila in filas])
         db.session.commit()
         return {"mensaje": "Menu creado exitosamente"}, 201
                
@@ -660,86 +854,250 @@ class VistaMenu(Resource):
 class VistaMenus(Resource):
     @jwt_required()
     def get(self, id_restaurante):
-        id_usuario = get_jwt_identity()
+        llamador = obtener_llamador()
 
-        if not Administrador.query.get(id_usuario):
+        if not llamador.es_administrador:
             return {"mensaje": "Acceso denegado"}, 403
 
-        restaurante = Restaurante.query.get(id_restaurante)
-        if not restaurante:
-            return {"mensaje": "El restaurante no existe"}, 404
-        elif restaurante.administrador_id != id_usuario:
-            return {"mensaje": "Acceso denegado al restaurante"}, 403
-
-        menus = (
-            Menu.query.filter_by(restaurante_id=str(id_restaurante))
-            .order_by(Menu.fecha_inicio)
-            .all()
-        )
-        resultados = [menu_schema.dump(menu) for menu in menus]
-        return resultados
+        def listar_menus():
+            restaurante = Restaurante.query.get(id_restaurante)
+            if not restaurante:
+                return {"mensaje": "El restaurante no existe"}, 404
+            elif restaurante.administrador_id != llamador.id:
+                return {"mensaje": "Acceso denegado al restaurante"}, 403
+
+            return listar(
+                Menu.query.filter_by(restaurante_id=str(id_restaurante)),
+                [Menu.fecha_inicio, Menu.id],
+                serializar_menu,
+            )
+
+        # El ETag sólo se entrega cuando el restaurante es del administrador,
+        # así que un If-None-Match que coincide ya pasó esa verificación.
+        return listado_cacheado(llamador.id, MENUS, listar_menus)
     
 
 class VistaMenusChef(Resource):
     @jwt_required()
     def get(self):
-        id_usuario = get_jwt_identity()
-
-        chef = Chef.query.get(id_usuario)
-        if not chef:
+        llamador = obtener_llamador()
+        if not llamador.es_chef:
             return {"mensaje": "Acceso denegado"}, 403
 
-        menus = (
-            Menu.query.filter_by(restaurante_id=str(chef.restaurante_id))
-            .order_by(Menu.fecha_inicio)
-            .all()
+        return listado_cacheado(
+            llamador.administrador_id,
+            MENUS,
+            lambda: listar(
+                Menu.query.filter_by(restaurante_id=str(llamador.restaurante_id)),
+                [Menu.fecha_inicio, Menu.id],
+                serializar_menu,
+            ),
+            variante=llamador.restaurante_id,
         )
-        resultados = [menu_schema.dump(menu) for menu in menus]
-        return resultados
+
+class VistaEstadisticasCache(Resource):
+    @jwt_required()
+    def get(self):
+        if not obtener_llamador().es_administrador:
+            return {"mensaje": "Acceso denegado"}, 403
+
+        cache = cache_actual()
+        if cache is None:
+            return {"backend": None}
+
+        estadisticas = dict(cache.estadisticas.como_dict(), backend=cache.nombre)
+        if hasattr(cache, "__len__"):
+            estadisticas["entradas"] = len(cache)
+        return estadisticas
+
 
 class VistaReporteCompra(Resource):
     @jwt_required()
     def post(self):
-        usuario_id = get_jwt_identity()
-        usuario = Usuario.query.get(usuario_id)
-        if not usuario:
+        if not obtener_llamador().rol:
             return {"mensaje": "Acceso denegado"}, 403
 
         data = request.get_json()
+        error = validar_reporte_compra(data)
+        if error:
+            return error
+
+        return reporte_compra(data["recetas"])
+
+
+def _acceso_restaurante(llamador, restaurante_id, administrador_id):
+    if llamador.es_administrador:
+        return administrador_id == llamador.id
+    return llamador.es_chef and llamador.restaurante_id == restaurante_id
 
-        ingredientes_receta = {}
-        for receta_respuesta in data["recetas"]:
-            receta_id = receta_respuesta.get("receta")
-            receta = Receta.query.filter_by(id=receta_id).first()
-
-            if not receta:
-                return {"mensaje": "Al menos una receta seleccionada no existe"}, 400
-
-            numero_personas = receta_respuesta.get("numero_personas")
-
-            for receta_ingrediente in receta.ingredientes:
-                ingrediente = Ingrediente.query.get(receta_ingrediente.ingrediente)
-                ingrediente_nombre = ingrediente.nombre
-                porcion_float = float(receta.porcion)
-                unidades = math.ceil((float(receta_ingrediente.cantidad) * numero_personas) / porcion_float)
-                
-                if ingrediente_nombre not in ingredientes_receta:
-                    ingredientes_receta[ingrediente_nombre] = {
-                    "sitio": ingrediente.sitio,
-                    "cantidad": unidades,
-                    "recetas": [receta.nombre],
-                    "costo": float(ingrediente.costo) * unidades
-                    }
-                else:
-                    ingredientes_receta[ingrediente_nombre]["recetas"].append(receta.nombre)   
-                    ingredientes_receta[ingrediente_nombre]["cantidad"] += int(unidades)
-                    costo =  float(ingrediente.costo) * unidades
-                    ingredientes_receta[ingrediente_nombre]["costo"] += costo
+
+class VistaReporteMenu(Resource):
+    @jwt_required()
+    def get(self, id_menu):
+        llamador = obtener_llamador()
+        menu = Menu.query.get_or_404(id_menu)
+        administrador_id = (
+            db.session.query(Restaurante.administrador_id)
+            .filter_by(id=menu.restaurante_id)
+            .scalar()
+        )
+        if not _acceso_restaurante(llamador, menu.restaurante_id, administrador_id):
+            return {"mensaje": "Acceso denegado"}, 403
+
+        listas, filas = listas_compra_menus([menu.id], administrador_id)
+        guardar_listas_compra(filas)
+        ingredientes_receta = listas[menu.id]
+        if ingredientes_receta is None:
+            return {"mensaje": "Al menos una receta del menú no existe"}, 400
 
         return {"mensaje": "Cálculo correcto", "ingredientes_receta": ingredientes_receta}, 200
 
 
+# Rango de los parámetros desde y hasta (AAAA-MM-DD, ambos incluidos) como
+# [desde, hasta + 1 día), o None si faltan o no son fechas.
+def _rango_fechas():
+    try:
+        desde = datetime.strptime(request.args["desde"], "%Y-%m-%d")
+        hasta = datetime.strptime(request.args["hasta"], "%Y-%m-%d")
+    except (KeyError, ValueError):
+        return None
+    return desde, hasta + timedelta(days=1)
+
+
+ERROR_RANGO_FECHAS = {"mensaje": "Las fechas desde y hasta son obligatorias (AAAA-MM-DD)"}, 400
+
+
+# Compra de todos los menús activos entre desde y hasta de los restaurantes
+# del administrador, o de uno solo con ?restaurante=<id>. El chef sólo ve
+# los de su restaurante.
+class VistaReporteMenus(Resource):
+    @jwt_required()
+    def get(self):
+        llamador = obtener_llamador()
+        if not llamador.rol:
+            return {"mensaje": "Acceso denegado"}, 403
+
+        rango = _rango_fechas()
+        if rango is None:
+            return ERROR_RANGO_FECHAS
+        desde, hasta = rango
+
+        restaurante_id = request.args.get("restaurante", type=int)
+        if llamador.es_chef:
+            restaurante_id = llamador.restaurante_id
+
+        query = (
+            db.session.query(Menu.id)
+            .join(Restaurante, Restaurante.id == Menu.restaurante_id)
+            .filter(
+                Restaurante.administrador_id == llamador.administrador_id,
+                Menu.fecha_inicio < hasta,
+                Menu.fecha_fin >= desde,
+            )
+            .order_by(Menu.id)
+        )
+        if restaurante_id is not None:
+            query = query.filter(Menu.restaurante_id == restaurante_id)
+        ids_menus = [menu_id for menu_id, in query]
+
+        listas, filas = listas_compra_menus(ids_menus, llamador.administrador_id)
+        guardar_listas_compra(filas)
+        if any(lista is None for lista in listas.values()):
+            return {"mensaje": "Al menos una receta de los menús no existe"}, 400
+
+        return {
+            "mensaje": "Cálculo correcto",
+            "menus": ids_menus,
+            "ingredientes_receta": combinar_listas(listas[menu_id] for menu_id in ids_menus),
+        }, 200
+
+
+# Compra consolidada de todos los restaurantes del administrador para los
+# menús activos entre desde y hasta, agrupada por sitio (proveedor) y por
+# ingrediente.
+class VistaReporteProveedores(Resource):
+    @jwt_required()
+    def get(self):
+        llamador = obtener_llamador()
+        if not llamador.es_administrador:
+            return {"mensaje": "Acceso denegado"}, 403
+
+        rango = _rango_fechas()
+        if rango is None:
+            return ERROR_RANGO_FECHAS
+
+        return dict(
+            calcular_compra_consolidada(llamador.id, *rango), mensaje="Cálculo correcto"
+        ), 200
 
 
+# Envía una operación pesada al pool de trabajos: {"tipo", "parametros"},
+# donde parametros es el cuerpo del endpoint síncrono correspondiente.
+class VistaTrabajos(Resource):
+    @jwt_required()
+    def post(self):
+        llamador = obtener_llamador()
+        if not llamador.administrador_id:
+            return {"mensaje": "Acceso denegado"}, 403
+
+        data = request.get_json()
+        if not isinstance(data, dict) or data.get("tipo") not in TIPOS:
+            return {"mensaje": "Tipo de trabajo inválido", "tipos": sorted(TIPOS)}, 400
+
+        error = VALIDACIONES[data["tipo"]](data.get("parametros"))
+        if error:
+            return error
+
+        trabajo = crear_trabajo(data["tipo"], data.get("parametros"), llamador.administrador_id)
+        return (
+            trabajo_schema.dump(trabajo),
+            202,
+            {"Location": "/trabajo/{}".format(trabajo.id)},
+        )
+
+
+class VistaTrabajo(Resource):
+    @jwt_required()
+    def get(self, id_trabajo):
+        trabajo = obtener_trabajo(id_trabajo, obtener_llamador().administrador_id)
+        if trabajo is None:
+            return {"mensaje": "Trabajo no encontrado"}, 404
+
+        return trabajo_schema.dump(trabajo)
+
+
+class VistaResultadoTrabajo(Resource):
+    @jwt_required()
+    def get(self, id_trabajo):
+        trabajo = obtener_trabajo(id_trabajo, obtener_llamador().administrador_id)
+        if trabajo is None:
+            return {"mensaje": "Trabajo no encontrado"}, 404
+
+        if trabajo.estado == TERMINADO:
+            return json.loads(trabajo.resultado), trabajo.codigo
+        if trabajo.estado == FALLIDO:
+            return {"mensaje": "El trabajo falló", "error": trabajo.error}, 500
+        return {"mensaje": "El trabajo no ha terminado", "estado": trabajo.estado}, 202
+
+
+# Búsqueda de texto en las recetas e ingredientes del administrador:
+# ?q=<texto>[&tipo=receta|ingrediente], ordenada por relevancia y paginada
+# con limit/cursor como los listados (20 resultados por defecto).
+class VistaBuscar(Resource):
+    @jwt_required()
+    def get(self):
+        administrador_id = obtener_llamador().administrador_id
+        if not administrador_id:
+            return {"mensaje": "Acceso denegado"}, 403
+
+        terminos = terminos_busqueda(request.args.get("q"))
+        if not terminos:
+            return {"mensaje": "Falta el texto a buscar (q)"}, 400
 
+        tipo = request.args.get("tipo")
+        if tipo is not None and tipo not in TIPOS_BUSQUEDA:
+            return {"mensaje": "Tipo inválido", "tipos": list(TIPOS_BUSQUEDA)}, 400
 
+        query, columnas = consulta_busqueda(administrador_id, terminos, tipo)
+        filas, siguiente_cursor = paginar(query, columnas, LIMITE_BUSQUEDA)
+        return respuesta_paginada([serializar_resultado(fila) for fila in filas], siguiente_cursor)